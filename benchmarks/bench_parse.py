@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: fast-path parser vs. the original try_add_ip_or_range.
+
+Usage: python -m benchmarks.bench_parse [--tokens 1000000] [--seed 1]
+
+The token mix resembles the output of the regex/HTML extractors on
+text-heavy pages: mostly words, plus IPv4/IPv6 networks and near misses.
+"""
+import argparse
+import random
+import time
+from ipaddress import AddressValueError, IPv4Network, IPv6Network
+
+from trusted_lists.netset import NetworkSet
+from trusted_lists.parse import add_networks
+
+
+def legacy_try_add_ip_or_range(network_s, ipv4_networks, ipv6_networks):
+    """try_add_ip_or_range as it was before trusted_lists.parse."""
+    if not network_s or not network_s.strip():
+        return
+    network_s = network_s.strip()
+    try:
+        ipv4_networks.append(IPv4Network(network_s))
+    except (AddressValueError, ValueError):
+        try:
+            ipv6_networks.append(IPv6Network(network_s))
+        except (AddressValueError, ValueError):
+            pass
+
+
+WORDS = ["the", "IP", "ranges", "below", "webhooks", "Note:", "https://example.com/docs",
+         "2024", "v2", "address", "(CIDR)", "and", "1.2.3", "10.0.0.1/8"]
+
+
+def make_tokens(count, seed):
+    rng = random.Random(seed)
+    tokens = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.6:
+            tokens.append(rng.choice(WORDS))
+        elif kind < 0.85:
+            prefixlen = rng.randint(16, 32)
+            address = rng.getrandbits(32) >> (32 - prefixlen) << (32 - prefixlen)
+            tokens.append(f"{IPv4Network((address, prefixlen))}")
+        else:
+            tokens.append(f"2001:db8:{rng.getrandbits(16):x}::/48")
+    return tokens
+
+
+def timed(func, tokens):
+    start = time.perf_counter()
+    func(tokens)
+    return time.perf_counter() - start
+
+
+def run_legacy(tokens):
+    ipv4, ipv6 = [], []
+    for token in tokens:
+        legacy_try_add_ip_or_range(token, ipv4, ipv6)
+    return ipv4, ipv6
+
+
+def run_fast(tokens):
+    ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+    add_networks(tokens, ipv4, ipv6)
+    return ipv4, ipv6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tokens', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    tokens = make_tokens(args.tokens, args.seed)
+    legacy_v4, legacy_v6 = run_legacy(tokens[:1000])
+    fast_v4, fast_v6 = run_fast(tokens[:1000])
+    assert NetworkSet(4, legacy_v4) == fast_v4 and NetworkSet(6, legacy_v6) == fast_v6
+
+    legacy = timed(run_legacy, tokens)
+    fast = timed(run_fast, tokens)
+    for name, seconds in (("legacy", legacy), ("fast", fast)):
+        print(f"{name:>7}: {seconds:7.3f}s  {len(tokens) / seconds:12,.0f} tokens/s")
+    print(f"speedup: {legacy / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""Benchmark suite: every extractor and the writers on synthetic feeds.
+
+Usage:
+    python -m benchmarks.suite run [--sizes 1k,10k,100k] [--output baseline.json]
+    python -m benchmarks.suite compare baseline.json [--threshold 0.25]
+
+Feeds are generated deterministically (``--seed``) at each size: text/plain
+lines, googlebot-style JSON ``prefixes`` objects, HTML ``li`` lists and prose
+pages for the regex extractor.  Each case is timed (best of ``--repeat``)
+and then run once more under tracemalloc to record its peak memory.
+
+``compare`` re-runs the cases and sizes stored in a baseline file and exits
+with status 1 when any of them got slower, or needs more memory, by more
+than the threshold (a fraction: 0.25 = 25%); differences under 5ms or
+64KiB are ignored as noise.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from ipaddress import IPv4Network
+
+from generate import (
+    extract_from_response,
+    extract_json_value_keys,
+    extract_with_regex,
+    try_add_ip_or_range,
+    write_ipset_files,
+)
+from trusted_lists.fetch import BodyStream
+from trusted_lists.netset import NetworkSet
+
+DEFAULT_SIZES = "1k,10k,100k"
+DEFAULT_THRESHOLD = 0.25
+# Differences below these are timer/allocator noise, whatever the ratio
+NOISE = {"seconds": 0.005, "peak_bytes": 64 * 1024}
+REGEX = r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}/\d{1,2}|[0-9a-fA-F:]+::/\d{1,3})'
+PROSE = ["Our", "crawlers", "use", "the", "following", "ranges", "(updated", "daily):",
+         "please", "allow", "traffic", "from", "see", "https://example.com/docs", "and"]
+
+
+def parse_size(value):
+    """'10k' -> 10000, '1m' -> 1000000."""
+    value = value.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(value[-1:], 1)
+    return int(value.rstrip("km")) * multiplier
+
+
+def format_size(count):
+    for suffix, unit in (("m", 1000000), ("k", 1000)):
+        if count >= unit and count % unit == 0:
+            return f"{count // unit}{suffix}"
+    return str(count)
+
+
+def make_networks(count, seed):
+    """Random CIDR strings, about 10% of them IPv6."""
+    rng = random.Random(seed)
+    networks = []
+    for _ in range(count):
+        if rng.random() < 0.9:
+            prefixlen = rng.randint(16, 32)
+            address = rng.getrandbits(32) >> (32 - prefixlen) << (32 - prefixlen)
+            networks.append(str(IPv4Network((address, prefixlen))))
+        else:
+            networks.append(f"2001:db8:{rng.getrandbits(16):x}::/48")
+    return networks
+
+
+class FakeResponse:
+    """The part of requests.Response that extract_from_response reads."""
+
+    def __init__(self, text, content_type):
+        self.text = text
+        self.headers = {'content-type': content_type}
+
+
+class FakeStreamResponse:
+    """A streamed response delivering its body in network-sized chunks."""
+
+    def __init__(self, content, content_type):
+        self.content = content
+        self.headers = {'content-type': content_type}
+        self.encoding = 'utf-8'
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+def _response_networks(list_config, response, body=None):
+    ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+    extract_from_response(list_config, response, ipv4, ipv6, body)
+    return len(ipv4) + len(ipv6)
+
+
+def prepare_text(networks, seed):
+    return "\n".join(networks) + "\n"
+
+
+def run_try_add(text):
+    ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+    for line in text.splitlines():
+        try_add_ip_or_range(line, ipv4, ipv6)
+    return len(ipv4) + len(ipv6)
+
+
+def run_text_plain(text):
+    return _response_networks({}, FakeResponse(text, 'text/plain; charset=utf-8'))
+
+
+def prepare_text_bytes(networks, seed):
+    return prepare_text(networks, seed).encode()
+
+
+def run_text_plain_stream(content):
+    response = FakeStreamResponse(content, 'text/plain; charset=utf-8')
+    return _response_networks({}, response, BodyStream(response))
+
+
+def prepare_json(networks, seed):
+    # Parsed up front: the case measures extraction, not json.loads
+    data = {"creationTime": "2024-01-01T00:00:00", "prefixes": [
+        {"ipv6Prefix": network} if ":" in network else {"ipv4Prefix": network}
+        for network in networks
+    ]}
+    return json.loads(json.dumps(data))["prefixes"]
+
+
+def run_json_value_keys(items):
+    ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+    extract_json_value_keys(items, ["ipv4Prefix", "ipv6Prefix"], ipv4, ipv6)
+    return len(ipv4) + len(ipv6)
+
+
+def prepare_html(networks, seed):
+    items = "".join(f"<li>{network}</li>\n" for network in networks)
+    return f"<html><body><h1>IP ranges</h1>\n<ul>\n{items}</ul></body></html>\n"
+
+
+def run_html(html):
+    return _response_networks({'html_selector': 'li'}, FakeResponse(html, 'text/html'))
+
+
+def run_html_lxml(html):
+    return _response_networks({'html_selector': 'li', 'html_engine': 'lxml'},
+                              FakeResponse(html, 'text/html'))
+
+
+def prepare_regex(networks, seed):
+    rng = random.Random(seed)
+    lines = []
+    for network in networks:
+        words = rng.sample(PROSE, rng.randint(3, 8))
+        words.insert(rng.randint(0, len(words)), network)
+        lines.append(" ".join(words))
+    return "\n".join(lines) + "\n"
+
+
+def run_regex(text):
+    ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+    extract_with_regex(text, REGEX, ipv4, ipv6)
+    return len(ipv4) + len(ipv6)
+
+
+def run_regex_named(text):
+    ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+    extract_with_regex(text, 'any-cidr', ipv4, ipv6)
+    return len(ipv4) + len(ipv6)
+
+
+def prepare_write(networks, seed):
+    ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+    for network in networks:
+        try_add_ip_or_range(network, ipv4, ipv6)
+    return ipv4
+
+
+def run_write(ipv4):
+    write_ipset_files("bench-v4", ipv4, "inet", "Benchmark list", {'url': 'https://example.com/'})
+    return os.path.getsize("./build/bench-v4.txt")
+
+
+# name -> (prepare(networks, seed), run(prepared))
+CASES = {
+    "try_add_ip_or_range": (prepare_text, run_try_add),
+    "text_plain": (prepare_text, run_text_plain),
+    "text_plain_stream": (prepare_text_bytes, run_text_plain_stream),
+    "extract_with_regex": (prepare_regex, run_regex),
+    "extract_with_regex_named": (prepare_regex, run_regex_named),
+    "extract_json_value_keys": (prepare_json, run_json_value_keys),
+    "html_selector": (prepare_html, run_html),
+    "html_selector_lxml": (prepare_html, run_html_lxml),
+    "write_ipset_files": (prepare_write, run_write),
+}
+
+
+def measure(run, prepared, repeat):
+    """Return (best wall time in seconds, peak traced memory in bytes)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(prepared)
+            best = min(best, time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            run(prepared)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+@contextlib.contextmanager
+def build_dir():
+    """Run in a scratch directory with a ./build for write_ipset_files."""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "build"))
+        os.chdir(tmp)
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
+
+
+def run_suite(cases, sizes, repeat=3, seed=1, log=None):
+    """Run each case at each size; return a list of result dicts."""
+    results = []
+    with build_dir():
+        for size in sizes:
+            networks = make_networks(size, seed)
+            for name in cases:
+                prepare, run = CASES[name]
+                seconds, peak = measure(run, prepare(networks, seed), repeat)
+                result = {"case": name, "size": size, "seconds": round(seconds, 6),
+                          "peak_bytes": peak}
+                results.append(result)
+                if log:
+                    print(f"{name:>24} {format_size(size):>5}: {seconds:9.4f}s "
+                          f"{peak / 2**20:9.1f} MiB", file=log)
+    return results
+
+
+def compare(baseline, current, threshold):
+    """Return a description of every case that regressed beyond ``threshold``."""
+    previous = {(r["case"], r["size"]): r for r in baseline}
+    regressions = []
+    for result in current:
+        before = previous.get((result["case"], result["size"]))
+        if before is None:
+            continue
+        for key, unit in (("seconds", "s"), ("peak_bytes", "B")):
+            limit = max(before[key] * (1 + threshold), before[key] + NOISE[key])
+            if before[key] and result[key] > limit:
+                regressions.append(
+                    f"{result['case']} {format_size(result['size'])}: {key} "
+                    f"{before[key]}{unit} -> {result[key]}{unit} "
+                    f"(+{result[key] / before[key] - 1:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the suite and write a baseline')
+    run_parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                            help=f'Comma-separated feed sizes (default {DEFAULT_SIZES})')
+    run_parser.add_argument('--cases', default=",".join(CASES),
+                            help='Comma-separated cases (default: all)')
+    run_parser.add_argument('-o', '--output', help='Write results as JSON to this file')
+
+    compare_parser = subparsers.add_parser('compare', help='Re-run a baseline and compare')
+    compare_parser.add_argument('baseline', help='Baseline JSON written by "run"')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help=f'Allowed slowdown fraction (default {DEFAULT_THRESHOLD})')
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument('--repeat', type=int, default=3)
+        sub.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        cases = [name.strip() for name in args.cases.split(",") if name.strip()]
+        unknown = sorted(set(cases) - set(CASES))
+        if unknown:
+            parser.error(f"unknown case(s): {', '.join(unknown)}")
+        sizes = [parse_size(size) for size in args.sizes.split(",")]
+        results = run_suite(cases, sizes, args.repeat, args.seed, log=sys.stdout)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                           "seed": args.seed, "results": results}, f, indent=2)
+                f.write("\n")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    cases = list(dict.fromkeys(r["case"] for r in baseline["results"] if r["case"] in CASES))
+    sizes = sorted({r["size"] for r in baseline["results"]})
+    current = run_suite(cases, sizes, args.repeat, baseline.get("seed", args.seed),
+                        log=sys.stdout)
+    regressions = compare(baseline["results"], current, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
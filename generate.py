@@ -1,90 +1,162 @@
 #!/usr/bin/env python3
-import re
-from xml.etree.ElementTree import Element
-
-import requests
-import yaml
-from bs4 import BeautifulSoup
-from ipaddress import IPv4Network, AddressValueError, IPv6Network
-from lxml import etree
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from trusted_lists.aggregate import (
+    aggregate_networks,
+    format_histogram,
+    merge_intervals,
+    prefix_histogram,
+    reduce_prefix_lengths,
+)
+from trusted_lists.binindex import write_combined_index, write_index
+from trusted_lists.cache import DEFAULT_CACHE_PATH, ValidatorCache
+from trusted_lists.corpus import DEFAULT_CORPUS_DIR, RecordingSession, ReplaySession
+from trusted_lists.delta import DeltaWriter, read_entries
+from trusted_lists.fetch import (
+    DEFAULT_WORKERS,
+    BodyStream,
+    Deadline,
+    FetchError,
+    create_session,
+    fetch_all,
+    is_streamed,
+    max_body_size,
+)
+from trusted_lists.html import DEFAULT_ENGINE, ENGINES, engine_for, page_lines, select_texts
+from trusted_lists.index import TrustedIndex
+from trusted_lists.ipset import DEFAULT_HEADROOM, set_options, write_ipset_restore
+from trusted_lists.jsonstream import iter_json_items
+from trusted_lists.metrics import RunMetrics, activate, get_metrics
+from trusted_lists.netset import NetworkSet
+from trusted_lists.nft import write_nft
+from trusted_lists.nginx import write_combined_geo, write_geo, write_realip
+from trusted_lists.parse import add_networks
+from trusted_lists.patterns import iter_matches
+from trusted_lists.scheduler import (
+    DEFAULT_JITTER,
+    DEFAULT_REFRESH,
+    Scheduler,
+    changed_outputs,
+    output_digests,
+)
+from trusted_lists.writers import write_outputs
 
 
 def try_add_ip_or_range(network_s, ipv4_networks, ipv6_networks):
-    """Try to parse and add an IP or network range to the appropriate list."""
-    if not network_s or not network_s.strip():
-        return
-    network_s = network_s.strip()
-    try:
-        ipv4_networks.append(IPv4Network(network_s))
-    except (AddressValueError, ValueError):
-        try:
-            ipv6_networks.append(IPv6Network(network_s))
-        except (AddressValueError, ValueError):
-            pass
+    """Try to parse and add an IP or network range to the appropriate container.
+
+    The containers are NetworkSet instances (plain lists work too).
+    """
+    add_networks((network_s,), ipv4_networks, ipv6_networks)
 
 
 def extract_with_regex(text, pattern, ipv4_networks, ipv6_networks):
-    """Extract IPs using a regex pattern."""
-    compiled = re.compile(pattern)
-    matches = compiled.findall(text)
-    for match in matches:
-        try_add_ip_or_range(match, ipv4_networks, ipv6_networks)
+    """Extract IPs using a regex pattern (or the name of a built-in one)."""
+    add_networks(iter_matches(text, pattern), ipv4_networks, ipv6_networks)
 
 
 def extract_json_value_keys(items, keys, ipv4_networks, ipv6_networks):
     """Extract IPs from nested JSON objects using specified keys."""
-    for item in items:
-        if isinstance(item, dict):
-            for key in keys:
-                if key in item and item[key]:
-                    try_add_ip_or_range(item[key], ipv4_networks, ipv6_networks)
+    add_networks(
+        (item[key] for item in items if isinstance(item, dict)
+         for key in keys if key in item and item[key]),
+        ipv4_networks, ipv6_networks
+    )
 
 
 def write_ipset_files(output_name, networks, family, description, list_config):
-    """Write TXT, XML, and YML files for an ipset.
+    """Write TXT, XML, YML, binary index (IDX), nginx, nft and ipset files for an ipset.
+
+    The entries added and removed since the previous TXT are written to
+    ``<name>.added`` and ``<name>.removed`` for incremental updates.
 
     Args:
         output_name: The final output filename (without extension)
-        networks: List of network objects (IPv4Network or IPv6Network)
+        networks: NetworkSet, or an iterable of IPv4Network/IPv6Network objects
         family: "inet" for IPv4, "inet6" for IPv6
         description: Description text for the ipset
         list_config: Original config dict from trusted.yml
+
+    Unless the list sets ``aggregate: false``, networks are collapsed into
+    the minimal equivalent set of CIDRs first. The ipset hashsize and maxelem
+    are sized for the final entry count plus ``ipset_headroom`` (a fraction).
+    ``ipset_reduce`` (a percentage of entry growth) trades extra entries for
+    fewer distinct prefix lengths, which hash:net probes on every lookup.
+    Lists with ``nginx_realip: true`` also get ``set_real_ip_from`` directives.
     """
+    if not isinstance(networks, NetworkSet):
+        networks = NetworkSet.for_family(family, networks)
     if not networks:
         return
 
-    # Deduplicate and sort
-    networks = sorted(set(networks))
+    if list_config.get('aggregate', True):
+        count = len(networks)
+        networks = aggregate_networks(networks)
+        print(f"  Aggregated {output_name}: {count} -> {len(networks)} networks")
+
+    if list_config.get('ipset_reduce') is not None:
+        before = prefix_histogram(networks)
+        networks, after = reduce_prefix_lengths(networks, list_config['ipset_reduce'])
+        print(f"  Reduced {output_name}: {sum(before.values())} -> {sum(after.values())} "
+              f"networks, {len(before)} -> {len(after)} prefix lengths")
+        print(f"    before: {format_histogram(before)}")
+        print(f"    after:  {format_histogram(after)}")
 
     print(f"  Writing {output_name}: {len(networks)} networks ({family})")
 
-    # Write TXT file
-    with open(f"./build/{output_name}.txt", 'w') as f:
-        for n in networks:
-            f.write(str(n) + "\n")
-
-    # Write XML file with proper family option
-    root: Element = etree.Element('ipset')
-    root.set('type', 'hash:net')
-    etree.SubElement(root, 'option').set('name', 'family')
-    root.find('option').set('value', family)
-    etree.SubElement(root, 'description').text = description
-    for n in networks:
-        etree.SubElement(root, 'entry').text = str(n)
-    root.getroottree().write(
-        f'./build/{output_name}.xml',
-        xml_declaration=True,
-        encoding="utf-8",
-        pretty_print=True
-    )
+    metrics = get_metrics()
+    # Ranges that are not CIDR blocks become several entries
+    entry_count = sum(1 for _ in networks.prefixes())
+    options = set_options(entry_count, list_config.get('ipset_headroom', DEFAULT_HEADROOM))
+    previous = read_entries(f"./build/{output_name}.txt")
+    first_build = previous is None
+    delta = DeltaWriter(f"./build/{output_name}", previous)
 
-    # Write YML file
+    # Write TXT, XML and YML files in one streaming pass, taking the delta on the way
     list_data = list_config.copy()
     list_data['name'] = output_name
     list_data['family'] = family
-    list_data['items'] = [str(n) for n in networks]
-    with open(f'./build/{output_name}.yml', 'w') as f:
-        yaml.dump(list_data, f)
+    list_data.update(options)
+    list_data.pop('items', None)
+    write_outputs(f"./build/{output_name}", delta.track(networks.cidrs()), family, description,
+                  list_data, options)
+
+    # Write changes since the previous build
+    start = time.perf_counter()
+    added, removed = delta.close()
+    if not first_build:
+        print(f"  Changed {output_name}: +{added} -{removed}")
+    metrics.record_write(output_name, "delta", time.perf_counter() - start, added + removed)
+    intervals = list(merge_intervals(networks.intervals()))
+
+    # Write memory-mappable binary index
+    start = time.perf_counter()
+    write_index(f'./build/{output_name}.idx', [(output_name, networks.version, intervals)])
+    metrics.record_write(output_name, "idx", time.perf_counter() - start, len(networks))
+
+    # Write nginx geo block (and real IP directives for CDNs)
+    start = time.perf_counter()
+    write_geo(f'./build/{output_name}.geo.conf', output_name, networks.version, intervals,
+              description)
+    if list_config.get('nginx_realip'):
+        write_realip(f'./build/{output_name}.realip.conf', networks.cidrs(), description)
+    metrics.record_write(output_name, "nginx", time.perf_counter() - start, len(networks))
+
+    # Write nft and ipset restore batches, each loaded in one kernel transaction
+    start = time.perf_counter()
+    write_nft(f'./build/{output_name}.nft', output_name, networks.version, intervals,
+              description)
+    metrics.record_write(output_name, "nft", time.perf_counter() - start, len(networks))
+    start = time.perf_counter()
+    write_ipset_restore(f'./build/{output_name}.ipset', output_name, family, networks.cidrs(),
+                        options)
+    metrics.record_write(output_name, "ipset", time.perf_counter() - start, len(networks))
 
 
 def get_output_name(list_name, family, has_both_families):
@@ -106,147 +178,570 @@ def get_output_name(list_name, family, has_both_families):
     return list_name
 
 
-with open("trusted.yml", "r") as stream:
+def read_static_file(static_path, ipv4_networks, ipv6_networks):
+    """Read a manually maintained list, skipping comments and empty lines.
+
+    Returns False if the file does not exist.
+    """
+    print(f"  Reading from static file: {static_path}")
     try:
-        trusted_lists = yaml.safe_load(stream)
-        for list_name, list_config in trusted_lists.items():
-            print(f"Processing: {list_name}")
-            print(f"Config: {list_config}")
-            ipv4_networks = []
-            ipv6_networks = []
+        with open(static_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                # Skip comments and empty lines
+                if not line or line.startswith('#'):
+                    continue
+                try_add_ip_or_range(line, ipv4_networks, ipv6_networks)
+    except FileNotFoundError:
+        print(f"  WARNING: Static file not found: {static_path}")
+        return False
+    return True
+
+
+def get_json_selectors(list_config):
+    """Return the json_selector setting of a list as a list of dot paths."""
+    json_selector = list_config.get('json_selector', [])
+    if not isinstance(json_selector, list):
+        return [json_selector]
+    return json_selector
 
+
+def extract_from_response(list_config, list_content_r, ipv4_networks, ipv6_networks,
+                          body=None, html_engine=DEFAULT_ENGINE):
+    """Extract networks from a downloaded source according to its config.
+
+    ``body`` is the BodyStream of a streamed response; JSON is then parsed
+    incrementally as it downloads (``json_stream: true``), and text/plain
+    line by line. HTML is parsed with ``html_engine`` unless the list sets
+    its own ``html_engine``.
+    """
+    content_type = list_content_r.headers['content-type'].split(';').pop(0).strip()
+    html_engine = engine_for(list_config, html_engine)
+
+    # Regex extraction
+    if 'regex' in list_config:
+        if 'html_selector' in list_config:
+            # One scan over the element texts joined by newlines. The built-in
+            # patterns never match a newline, but a custom one that can (\s, [^,])
+            # may match across two elements.
+            text = "\n".join(select_texts(list_content_r.text, list_config['html_selector'],
+                                          html_engine))
+            extract_with_regex(text, list_config['regex'], ipv4_networks, ipv6_networks)
+        else:
+            extract_with_regex(list_content_r.text, list_config['regex'],
+                               ipv4_networks, ipv6_networks)
+        print(f"Extracted {len(ipv4_networks)} IPv4 + {len(ipv6_networks)} IPv6 via regex")
+
+    elif content_type == 'text/plain':
+        if body is not None:
+            lines = body.iter_lines()
+        else:
+            lines = list_content_r.text.splitlines()
+        add_networks(lines, ipv4_networks, ipv6_networks)
+
+    elif content_type == 'application/json' and body is not None:
+        items = iter_json_items(body.iter_text(), get_json_selectors(list_config))
+        if 'json_value_keys' in list_config:
+            extract_json_value_keys(items, list_config['json_value_keys'],
+                                    ipv4_networks, ipv6_networks)
+        elif 'html_selector' in list_config:
+            for item in items:
+                add_networks(select_texts(item, list_config['html_selector'], html_engine),
+                             ipv4_networks, ipv6_networks)
+        else:
+            add_networks(items, ipv4_networks, ipv6_networks)
+
+    elif content_type == 'application/json':
+        data = list_content_r.json()
+        for json_selector in get_json_selectors(list_config):
+            json_parent_tree = json_selector.split('.')
+            target_element = data.copy()
+            for elem in json_parent_tree:
+                target_element = target_element[elem]
+
+            if 'json_value_keys' in list_config:
+                extract_json_value_keys(
+                    target_element,
+                    list_config['json_value_keys'],
+                    ipv4_networks, ipv6_networks
+                )
+            elif 'html_selector' in list_config:
+                add_networks(select_texts(target_element, list_config['html_selector'],
+                                          html_engine),
+                             ipv4_networks, ipv6_networks)
+            else:
+                add_networks(target_element, ipv4_networks, ipv6_networks)
+
+    elif content_type == 'text/html':
+        if 'html_selector' in list_config:
+            list_items = select_texts(list_content_r.text, list_config['html_selector'],
+                                      html_engine)
+        else:
+            list_items = page_lines(list_content_r.text, html_engine)
+        add_networks(list_items, ipv4_networks, ipv6_networks)
+
+
+def write_list(list_name, list_config, ipv4_networks, ipv6_networks):
+    """Write the output files for one list and return the output names written."""
+    # Get description
+    description = list_config.get('description',
+                                  f"{list_name.capitalize()} FirewallD IP Set")
+
+    # Determine if source has both address families
+    has_both_families = bool(ipv4_networks) and bool(ipv6_networks)
+
+    # Check if list name already specifies a version
+    has_version_suffix = list_name.endswith("-v4") or list_name.endswith("-v6")
+
+    outputs = []
+    if has_version_suffix:
+        # List already specifies version in config, write as-is
+        if list_name.endswith("-v4") and ipv4_networks:
+            write_ipset_files(list_name, ipv4_networks, "inet",
+                              description, list_config)
+            outputs.append(list_name)
+        elif list_name.endswith("-v6") and ipv6_networks:
+            write_ipset_files(list_name, ipv6_networks, "inet6",
+                              description, list_config)
+            outputs.append(list_name)
+    else:
+        # Determine output names based on whether both families exist
+        if ipv4_networks:
+            v4_name = get_output_name(list_name, "inet", has_both_families)
+            v4_desc = f"{description} (inet)" if has_both_families else description
+            write_ipset_files(v4_name, ipv4_networks, "inet",
+                              v4_desc, list_config)
+            outputs.append(v4_name)
+        if ipv6_networks:
+            v6_name = get_output_name(list_name, "inet6", has_both_families)
+            v6_desc = f"{description} (inet6)" if has_both_families else description
+            write_ipset_files(v6_name, ipv6_networks, "inet6",
+                              v6_desc, list_config)
+            outputs.append(v6_name)
+
+    total = len(ipv4_networks) + len(ipv6_networks)
+    print(f"Total networks for {list_name}: {total}")
+    return outputs
+
+
+def process_list(list_name, list_config, list_content_r=None, body=None,
+                 html_engine=DEFAULT_ENGINE, unchanged=None):
+    """Parse one list (from a response or its static file) and write outputs.
+
+    Returns the output names written, or None if the list was skipped.
+    ``unchanged`` is called once parsing consumed a streamed body; if it
+    returns output names, those previous outputs are kept and returned.
+    """
+    print(f"Processing: {list_name}")
+    print(f"Config: {list_config}")
+    ipv4_networks = NetworkSet(4)
+    ipv6_networks = NetworkSet(6)
+    metrics = get_metrics()
+    metrics.begin_source(list_name)
+    try:
+        with metrics.stage(list_name, 'parse'):
             # Handle static file sources (manually maintained)
             if 'static_file' in list_config:
-                static_path = list_config['static_file']
-                print(f"  Reading from static file: {static_path}")
-                try:
-                    with open(static_path, 'r') as f:
-                        for line in f:
-                            line = line.strip()
-                            # Skip comments and empty lines
-                            if not line or line.startswith('#'):
-                                continue
-                            try_add_ip_or_range(line, ipv4_networks, ipv6_networks)
-                except FileNotFoundError:
-                    print(f"  WARNING: Static file not found: {static_path}")
-                    continue
+                if not read_static_file(list_config['static_file'],
+                                        ipv4_networks, ipv6_networks):
+                    return None
             else:
-                # Choose headers based on config
-                if list_config.get('simple_headers'):
-                    headers = {
-                        'user-agent': 'Mozilla/5.0 (compatible; trusted-lists/1.0)',
-                    }
-                else:
-                    headers = {
-                        'accept': 'text/html,application/xhtml+xml,application/xml;'
-                                  'q=0.9,image/avif,image/webp,image/apng,*/*;'
-                                  'q=0.8,application/signed-exchange;v=b3;q=0.9',
-                        'user-agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
-                                      '(KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
-                    }
-                if 'paypal.com' in list_config['url']:
-                    headers['cookie'] = 'enforce_policy=ccpa; LANG=en_US%3BUS; tsrce=smarthelpnodeweb'
-
-                list_content_r = requests.get(list_config['url'], headers=headers)
-                content_type = list_content_r.headers['content-type'].split(';').pop(0).strip()
-
-                # Regex extraction
-                if 'regex' in list_config:
-                    if 'html_selector' in list_config:
-                        soup = BeautifulSoup(list_content_r.text, 'html.parser')
-                        html_elems = soup.select(list_config['html_selector'])
-                        for elem in html_elems:
-                            extract_with_regex(elem.get_text(), list_config['regex'],
-                                               ipv4_networks, ipv6_networks)
-                    else:
-                        extract_with_regex(list_content_r.text, list_config['regex'],
-                                           ipv4_networks, ipv6_networks)
-                    print(f"Extracted {len(ipv4_networks)} IPv4 + {len(ipv6_networks)} IPv6 via regex")
-
-                elif content_type == 'text/plain':
-                    list_items = list_content_r.text.splitlines()
-                    for item in list_items:
-                        try_add_ip_or_range(item, ipv4_networks, ipv6_networks)
-
-                elif content_type == 'application/json':
-                    data = list_content_r.json()
-                    json_selectors = []
-                    if 'json_selector' in list_config:
-                        if not isinstance(list_config['json_selector'], list):
-                            json_selectors.append(list_config['json_selector'])
-                        else:
-                            json_selectors = list_config['json_selector']
-
-                    for json_selector in json_selectors:
-                        json_parent_tree = json_selector.split('.')
-                        target_element = data.copy()
-                        for elem in json_parent_tree:
-                            target_element = target_element[elem]
-
-                        if 'json_value_keys' in list_config:
-                            extract_json_value_keys(
-                                target_element,
-                                list_config['json_value_keys'],
-                                ipv4_networks, ipv6_networks
-                            )
-                        elif 'html_selector' in list_config:
-                            soup = BeautifulSoup(target_element, 'html.parser')
-                            list_items = soup.select(list_config['html_selector'])
-                            for item in list_items:
-                                try_add_ip_or_range(item.text, ipv4_networks, ipv6_networks)
-                        else:
-                            for item in target_element:
-                                try_add_ip_or_range(item, ipv4_networks, ipv6_networks)
-
-                elif content_type == 'text/html':
-                    soup = BeautifulSoup(list_content_r.text, 'html.parser')
-                    list_items = []
-                    if 'html_selector' in list_config:
-                        html_elems = soup.select(list_config['html_selector'])
-                        for elem in html_elems:
-                            list_items.append(elem.text)
-                    else:
-                        list_items = soup.text.splitlines()
-                    for item in list_items:
-                        try_add_ip_or_range(item, ipv4_networks, ipv6_networks)
-
-            # Get description
-            description = list_config.get('description',
-                                          f"{list_name.capitalize()} FirewallD IP Set")
-
-            # Deduplicate before checking
-            ipv4_networks = list(set(ipv4_networks))
-            ipv6_networks = list(set(ipv6_networks))
-
-            # Determine if source has both address families
-            has_both_families = bool(ipv4_networks) and bool(ipv6_networks)
-
-            # Check if list name already specifies a version
-            has_version_suffix = list_name.endswith("-v4") or list_name.endswith("-v6")
-
-            if has_version_suffix:
-                # List already specifies version in config, write as-is
-                if list_name.endswith("-v4"):
-                    write_ipset_files(list_name, ipv4_networks, "inet",
-                                      description, list_config)
-                else:
-                    write_ipset_files(list_name, ipv6_networks, "inet6",
-                                      description, list_config)
-            else:
-                # Determine output names based on whether both families exist
-                if ipv4_networks:
-                    v4_name = get_output_name(list_name, "inet", has_both_families)
-                    v4_desc = f"{description} (inet)" if has_both_families else description
-                    write_ipset_files(v4_name, ipv4_networks, "inet",
-                                      v4_desc, list_config)
-                if ipv6_networks:
-                    v6_name = get_output_name(list_name, "inet6", has_both_families)
-                    v6_desc = f"{description} (inet6)" if has_both_families else description
-                    write_ipset_files(v6_name, ipv6_networks, "inet6",
-                                      v6_desc, list_config)
-
-            total = len(ipv4_networks) + len(ipv6_networks)
-            print(f"Total networks for {list_name}: {total}")
+                extract_from_response(list_config, list_content_r,
+                                      ipv4_networks, ipv6_networks, body, html_engine)
+
+        previous = unchanged() if unchanged is not None else None
+        if previous is not None:
+            print(f"Unchanged: {list_name} (reusing previous build)")
+            return previous
+        return write_list(list_name, list_config, ipv4_networks, ipv6_networks)
+    finally:
+        metrics.end_source()
+
+
+def streamed_unchanged(cache, url, list_name, trusted_lists, response, body):
+    """Return a check whether a fully streamed body is the one of the previous build."""
+    def unchanged():
+        if body.started and cache.is_unchanged(url, [list_name], trusted_lists, response,
+                                               digest=body.hexdigest()):
+            return cache.previous_outputs(url, list_name)
+        return None
+    return unchanged
+
+
+def keep_last_good(list_names, error):
+    """Report lists whose source failed; their previous build outputs stay as they are."""
+    if isinstance(error, FetchError):
+        reason = error.reason
+    else:
+        reason = f"{type(error).__name__}: {error}"
+    for list_name in list_names:
+        print(f"Failed: {list_name} ({reason}), keeping its last good build", file=sys.stderr)
+    get_metrics().record_failure(list_names, reason)
+
+
+def build(trusted_lists, workers=DEFAULT_WORKERS, cache=None, html_engine=DEFAULT_ENGINE,
+          deadline=None, session=None):
+    """Fetch all sources concurrently and process each as soon as it arrives.
+
+    With a ValidatorCache, sources that are unchanged upstream are not parsed
+    again and their previous build outputs are kept as they are. Sources
+    that fail to download or parse, or are not done within ``deadline``
+    seconds, also keep their previous (last good) outputs; their names are
+    returned. ``session`` replaces the pooled HTTP session, e.g. to record
+    or replay responses (see trusted_lists.corpus).
+    """
+    failed = []
+    for list_name, list_config in trusted_lists.items():
+        if 'static_file' in list_config:
+            try:
+                process_list(list_name, list_config)
+            except Exception as exc:
+                keep_last_good([list_name], exc)
+                failed.append(list_name)
+
+    deadline = Deadline(deadline)
+    for list_names, list_content_r in fetch_all(trusted_lists, workers, session, cache,
+                                                deadline):
+        if isinstance(list_content_r, FetchError):
+            keep_last_good(list_names, list_content_r)
+            failed.extend(list_names)
+            continue
+        url = trusted_lists[list_names[0]]['url']
+        streamed = is_streamed(trusted_lists[list_names[0]])
+        with list_content_r:
+            if cache is not None and cache.is_unchanged(url, list_names, trusted_lists,
+                                                        list_content_r,
+                                                        check_body=not streamed):
+                for list_name in list_names:
+                    print(f"Unchanged: {list_name} (reusing previous build)")
+                if list_content_r.status_code == 200 and not streamed:
+                    cache.refresh(url, list_content_r)
+                continue
+            body = unchanged = None
+            if streamed:
+                body = BodyStream(list_content_r, deadline=deadline, max_size=max_body_size(
+                    [trusted_lists[list_name] for list_name in list_names]))
+                if len(list_names) > 1:
+                    # One body cannot be consumed by several lists; they parse it as a
+                    # whole, read within the smallest max_body_size of the group
+                    try:
+                        body.read()
+                    except FetchError as exc:
+                        keep_last_good(list_names, exc)
+                        failed.extend(list_names)
+                        continue
+                    body = None
+                elif cache is not None:
+                    unchanged = streamed_unchanged(cache, url, list_names[0], trusted_lists,
+                                                   list_content_r, body)
+            outputs_by_list = {}
+            for list_name in list_names:
+                try:
+                    outputs_by_list[list_name] = process_list(
+                        list_name, trusted_lists[list_name], list_content_r, body, html_engine,
+                        unchanged)
+                except Exception as exc:
+                    # Outputs are only written once a body was parsed completely, and one
+                    # broken source must not abort the run (or the daemon)
+                    keep_last_good([list_name], exc)
+                    failed.append(list_name)
+            if not outputs_by_list:
+                continue
+            if body is not None and body.started:
+                get_metrics().record_bytes(list_names, body.size)
+            elif streamed:
+                get_metrics().record_bytes(list_names, len(list_content_r.content))
+            if cache is not None and list_content_r.status_code == 200:
+                digest = body.hexdigest() if body is not None and body.started else None
+                cache.update(url, list_content_r, outputs_by_list, trusted_lists, digest)
+
+    if cache is not None:
+        cache.save()
+
+    write_combined_index()
+    write_combined_geo()
+    return failed
+
+
+def load_config(path="trusted.yml"):
+    """Load the trusted.yml list definitions."""
+    import yaml
+
+    with open(path, "r") as stream:
+        return yaml.safe_load(stream)
+
+
+def load_lists(args):
+    """Load the lists selected by ``--config``/``--only``, or None after an error."""
+    import yaml
 
+    try:
+        trusted_lists = load_config(args.config)
     except yaml.YAMLError as exc:
         print(exc)
+        return None
+    if args.only:
+        only = split_names(args.only)
+        unknown = [name for name in only if name not in trusted_lists]
+        if unknown:
+            print(f"Unknown list(s) in --only: {', '.join(unknown)}", file=sys.stderr)
+            return None
+        trusted_lists = {name: config for name, config in trusted_lists.items()
+                         if name in only}
+    return trusted_lists
+
+
+def cmd_build(args):
+    trusted_lists = load_lists(args)
+    if trusted_lists is None:
+        return 1
+    session = None
+    if args.record:
+        session = RecordingSession(create_session(args.workers), args.record)
+    elif args.replay:
+        session = ReplaySession(args.replay)
+    # Recorded responses must be full bodies, and replays parse every list
+    no_cache = args.no_cache or session is not None
+    cache = None if no_cache else ValidatorCache(args.cache)
+    metrics = None
+    if args.metrics_json or args.metrics_prom:
+        metrics = RunMetrics()
+        previous = activate(metrics)
+    try:
+        build(trusted_lists, args.workers, cache, args.html_engine, args.deadline, session)
+    finally:
+        if metrics is not None:
+            activate(previous)
+            metrics.finish()
+            if args.metrics_json:
+                metrics.write_json(args.metrics_json)
+            if args.metrics_prom:
+                metrics.write_prometheus(args.metrics_prom)
+    return 0
+
+
+def daemon_cycle(trusted_lists, scheduler, now, **build_options):
+    """Rebuild the lists due at ``now`` and schedule their next rebuild.
+
+    Returns the names of the outputs whose content changed.
+    """
+    due = scheduler.due(now)
+    if not due:
+        return []
+    before = output_digests()
+    failed = build({name: trusted_lists[name] for name in due}, **build_options)
+    for list_name in due:
+        scheduler.schedule(list_name, now, failed=list_name in failed)
+    return changed_outputs(before, output_digests())
+
+
+def run_publish_hook(command, changed):
+    """Run the publish hook with the changed outputs in $TRUSTED_LISTS_CHANGED."""
+    print(f"Publishing: {', '.join(changed)}")
+    env = dict(os.environ, TRUSTED_LISTS_CHANGED=",".join(changed))
+    result = subprocess.run(command, shell=True, env=env)
+    if result.returncode:
+        print(f"Publish hook failed with status {result.returncode}", file=sys.stderr)
+    return result.returncode == 0
+
+
+def cmd_daemon(args):
+    trusted_lists = load_lists(args)
+    if trusted_lists is None:
+        return 1
+    try:
+        scheduler = Scheduler(trusted_lists, args.refresh, args.jitter)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: stop.set())
+
+    # One session and validator cache for the life of the daemon: connections
+    # stay open between cycles and unchanged upstreams answer 304
+    session = create_session(args.workers)
+    cache = ValidatorCache(args.cache)
+    unpublished = set()
+    while not stop.is_set():
+        unpublished.update(daemon_cycle(
+            trusted_lists, scheduler, time.monotonic(), workers=args.workers, cache=cache,
+            html_engine=args.html_engine, deadline=args.deadline, session=session))
+        if unpublished and args.publish_hook:
+            # A failed hook is retried with the next changes
+            if run_publish_hook(args.publish_hook, sorted(unpublished)):
+                unpublished.clear()
+        else:
+            unpublished.clear()
+        stop.wait(max(0.0, scheduler.next_due() - time.monotonic()))
+    session.close()
+    return 0
+
+
+def cmd_lookup(args):
+    index = TrustedIndex.from_build_dir(args.build_dir)
+    if args.ips:
+        lines = index.lookup_lines(args.ips)
+    else:
+        lines = index.lookup_lines(sys.stdin)
+    found = False
+    write = sys.stdout.write
+    for line in lines:
+        if not found and not line.endswith("\t\n"):
+            found = True
+        write(line)
+    return 0 if found else 1
+
+
+def cmd_render_specs(args):
+    from trusted_lists.specs import render_specs
+
+    packages = render_specs(args.build_dir, args.output_dir, args.version, args.template)
+    for package in packages:
+        print(package)
+    return 0
+
+
+def cmd_annotate(args):
+    from trusted_lists.annotate import run
+    run(args.files, args.build_dir, args.jobs, field=args.field,
+        match=split_names(args.match), exclude=split_names(args.exclude),
+        batch_size=args.batch_size)
+    return 0
+
+
+def split_names(value):
+    """Split a comma-separated command line option into a list."""
+    return [name for name in (value or "").split(",") if name]
+
+
+COMMANDS = ('build', 'daemon', 'lookup', 'annotate', 'render-specs')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate trusted IP sets from upstream sources")
+    subparsers = parser.add_subparsers(dest='command')
+
+    build_parser = subparsers.add_parser(
+        'build', help="fetch sources and write build outputs (default)")
+    build_parser.add_argument('-c', '--config', default="trusted.yml",
+                              help="list definitions file (default: %(default)s)")
+    build_parser.add_argument('--only', metavar='LISTS',
+                              help="build only these comma-separated lists, "
+                                   "e.g. googlebot,bingbot")
+    build_parser.add_argument('-j', '--workers', type=int, default=DEFAULT_WORKERS,
+                              help="number of concurrent downloads (default: %(default)s)")
+    build_parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                              help="HTTP validator cache file (default: %(default)s)")
+    build_parser.add_argument('--no-cache', action='store_true',
+                              help="ignore cached validators and rebuild every list")
+    build_parser.add_argument('--html-engine', choices=ENGINES, default=DEFAULT_ENGINE,
+                              help="HTML parser for lists without their own html_engine "
+                                   "(default: %(default)s)")
+    build_parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                              help="wall-clock budget for all downloads; sources not done "
+                                   "in time keep their last good outputs")
+    corpus_group = build_parser.add_mutually_exclusive_group()
+    corpus_group.add_argument('--record', nargs='?', const=DEFAULT_CORPUS_DIR, metavar='DIR',
+                              help="save every upstream response into DIR "
+                                   f"(default: {DEFAULT_CORPUS_DIR}); implies --no-cache")
+    corpus_group.add_argument('--replay', nargs='?', const=DEFAULT_CORPUS_DIR, metavar='DIR',
+                              help="answer requests from responses saved with --record, "
+                                   "without network access; implies --no-cache")
+    build_parser.add_argument('--metrics-json', metavar='PATH',
+                              help="write a JSON report of per-source fetch/parse/write metrics")
+    build_parser.add_argument('--metrics-prom', metavar='PATH',
+                              help="write the metrics as a node_exporter textfile "
+                                   "(e.g. /var/lib/node_exporter/trusted_lists.prom)")
+    build_parser.set_defaults(func=cmd_build)
+
+    daemon_parser = subparsers.add_parser(
+        'daemon', help="keep rebuilding each list on its own refresh interval",
+        description="Run until SIGINT/SIGTERM, rebuilding every list when its 'refresh' "
+                    "interval from trusted.yml (with jitter) has passed. The publish hook "
+                    "runs only when the content of an output changed.")
+    daemon_parser.add_argument('-c', '--config', default="trusted.yml",
+                               help="list definitions file (default: %(default)s)")
+    daemon_parser.add_argument('--only', metavar='LISTS',
+                               help="schedule only these comma-separated lists")
+    daemon_parser.add_argument('-j', '--workers', type=int, default=DEFAULT_WORKERS,
+                               help="number of concurrent downloads (default: %(default)s)")
+    daemon_parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                               help="HTTP validator cache file (default: %(default)s)")
+    daemon_parser.add_argument('--html-engine', choices=ENGINES, default=DEFAULT_ENGINE,
+                               help="HTML parser for lists without their own html_engine "
+                                    "(default: %(default)s)")
+    daemon_parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                               help="wall-clock budget for the downloads of each cycle")
+    daemon_parser.add_argument('--refresh', default=DEFAULT_REFRESH,
+                               help="interval of lists without 'refresh', e.g. 30m or 6h "
+                                    "(default: %(default)s seconds)")
+    daemon_parser.add_argument('--jitter', type=float, default=DEFAULT_JITTER,
+                               help="random spread of intervals, as a fraction "
+                                    "(default: %(default)s)")
+    daemon_parser.add_argument('--publish-hook', metavar='COMMAND',
+                               help="shell command run after a cycle that changed outputs, "
+                                    "with their names in $TRUSTED_LISTS_CHANGED")
+    daemon_parser.set_defaults(func=cmd_daemon)
+
+    lookup_parser = subparsers.add_parser(
+        'lookup', help="show which built lists contain an IP",
+        description="Print 'ip<TAB>list1,list2' for each IP given as argument, "
+                    "or for each line read from stdin when none are given.")
+    lookup_parser.add_argument('ips', nargs='*', metavar='IP')
+    lookup_parser.add_argument('--build-dir', default="build",
+                               help="directory with <name>.txt lists (default: %(default)s)")
+    lookup_parser.set_defaults(func=cmd_lookup)
+
+    annotate_parser = subparsers.add_parser(
+        'annotate', help="annotate or filter access logs by list membership",
+        description="Append the lists containing each line's client IP (TAB-separated, "
+                    "'-' if none), or with --match/--exclude only pass lines through "
+                    "whose lists match. Reads plain or .gz files, or stdin.")
+    annotate_parser.add_argument('files', nargs='*', metavar='FILE',
+                                 help="log files ('-' or none for stdin)")
+    annotate_parser.add_argument('--build-dir', default="build",
+                                 help="directory with <name>.txt lists (default: %(default)s)")
+    annotate_parser.add_argument('-f', '--field', type=int, default=0,
+                                 help="whitespace-separated field holding the client IP, "
+                                      "0-based (default: %(default)s)")
+    annotate_parser.add_argument('-m', '--match', metavar='LISTS',
+                                 help="keep lines whose IP is in one of these comma-separated "
+                                      "lists (shell patterns allowed, e.g. 'googlebot*')")
+    annotate_parser.add_argument('-x', '--exclude', metavar='LISTS',
+                                 help="drop lines whose IP is in one of these lists")
+    annotate_parser.add_argument('-j', '--jobs', type=int, default=1,
+                                 help="annotate several files in parallel processes")
+    annotate_parser.add_argument('--batch-size', type=int, default=10000,
+                                 help="lines processed per batch (default: %(default)s)")
+    annotate_parser.set_defaults(func=cmd_annotate)
+
+    specs_parser = subparsers.add_parser(
+        'render-specs', help="render the RPM specs of changed lists",
+        description="Render src/ipset.spec.j2 for each built list whose XML or spec "
+                    "changed, copy its sources next to the spec and print the names "
+                    "of the packages that need a rebuild.")
+    specs_parser.add_argument('--build-dir', default="build",
+                              help="directory with <name>.xml and <name>.yml "
+                                   "(default: %(default)s)")
+    specs_parser.add_argument('-o', '--output-dir', default=".",
+                              help="directory of the published specs and XMLs "
+                                   "(default: %(default)s)")
+    specs_parser.add_argument('--version',
+                              help="version of rebuilt packages (default: today's UTC date)")
+    specs_parser.add_argument('--template', default="src/ipset.spec.j2",
+                              help="spec template (default: %(default)s)")
+    specs_parser.set_defaults(func=cmd_render_specs)
+
+    if argv is None:
+        argv = sys.argv[1:]
+    # Running without a subcommand builds, as generate.py always did
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ('-h', '--help')):
+        argv = ['build'] + list(argv)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
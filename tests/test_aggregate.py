@@ -0,0 +1,107 @@
+"""Tests for CIDR aggregation."""
+import os
+import sys
+from ipaddress import IPv4Network, IPv6Network
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import write_ipset_files
+from trusted_lists.aggregate import (
+    aggregate_networks,
+    merge_intervals,
+    prefix_histogram,
+    reduce_prefix_lengths,
+)
+from trusted_lists.netset import NetworkSet
+
+
+def aggregate(networks):
+    version = networks[0].version
+    return list(aggregate_networks(NetworkSet(version, networks)))
+
+
+class TestAggregateNetworks:
+    def test_adjacent_networks_merged(self):
+        networks = [IPv4Network("10.0.0.0/25"), IPv4Network("10.0.0.128/25")]
+        assert aggregate(networks) == [IPv4Network("10.0.0.0/24")]
+
+    def test_contained_network_dropped(self):
+        networks = [IPv4Network("10.0.0.0/8"), IPv4Network("10.1.2.0/24")]
+        assert aggregate(networks) == [IPv4Network("10.0.0.0/8")]
+
+    def test_unaligned_neighbours_not_merged(self):
+        networks = [IPv4Network("10.0.1.0/24"), IPv4Network("10.0.2.0/24")]
+        assert aggregate(networks) == networks
+
+    def test_ipv6(self):
+        networks = [IPv6Network("2001:db8::/33"), IPv6Network("2001:db8:8000::/33")]
+        assert aggregate(networks) == [IPv6Network("2001:db8::/32")]
+
+    def test_merge_intervals(self):
+        intervals = [(0, 5), (3, 9), (10, 12), (20, 30)]
+        assert list(merge_intervals(intervals)) == [(0, 12), (20, 30)]
+
+
+class TestReducePrefixLengths:
+    networks = [IPv4Network("10.0.0.0/23"), IPv4Network("10.0.4.0/24"),
+                IPv4Network("10.0.6.0/24"), IPv4Network("10.0.8.0/25")]
+
+    def reduce(self, percent):
+        return reduce_prefix_lengths(NetworkSet(4, self.networks), percent)
+
+    def test_histogram(self):
+        assert prefix_histogram(NetworkSet(4, self.networks)) == {23: 1, 24: 2, 25: 1}
+
+    def test_no_budget_keeps_entries(self):
+        reduced, histogram = self.reduce(0)
+        assert list(reduced) == self.networks
+        assert histogram == {23: 1, 24: 2, 25: 1}
+
+    def test_cheapest_length_split_first(self):
+        # Splitting the /23 costs 1 entry, splitting both /24s would cost 2
+        reduced, histogram = self.reduce(25)
+        assert histogram == {24: 4, 25: 1}
+        assert list(reduced)[:2] == [IPv4Network("10.0.0.0/24"), IPv4Network("10.0.1.0/24")]
+
+    def test_single_length_within_budget(self):
+        reduced, histogram = self.reduce(200)
+        assert histogram == {25: 9}
+        assert prefix_histogram(reduced) == histogram
+        assert (list(merge_intervals(reduced.intervals()))
+                == list(merge_intervals(NetworkSet(4, self.networks).intervals())))
+
+    def test_negative_budget(self):
+        with pytest.raises(ValueError):
+            self.reduce(-1)
+
+
+class TestWriteAggregation:
+    def test_aggregated_by_default(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("build")
+        networks = [IPv4Network("10.0.0.0/25"), IPv4Network("10.0.0.128/25")]
+        write_ipset_files("test", networks, "inet", "Test", {"url": "http://example.com"})
+        with open("build/test.txt") as f:
+            assert f.read() == "10.0.0.0/24\n"
+
+    def test_opt_out(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("build")
+        networks = [IPv4Network("10.0.0.0/25"), IPv4Network("10.0.0.128/25")]
+        write_ipset_files("test", networks, "inet", "Test",
+                          {"url": "http://example.com", "aggregate": False})
+        with open("build/test.txt") as f:
+            assert f.read() == "10.0.0.0/25\n10.0.0.128/25\n"
+
+    def test_ipset_reduce(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("build")
+        networks = [IPv4Network("10.0.0.0/23"), IPv4Network("10.0.4.0/24")]
+        write_ipset_files("test", networks, "inet", "Test", {"ipset_reduce": 50})
+        with open("build/test.txt") as f:
+            assert f.read() == "10.0.0.0/24\n10.0.1.0/24\n10.0.4.0/24\n"
+        assert "before: /23:1 /24:1\n    after:  /24:3\n" in capsys.readouterr().out
@@ -0,0 +1,78 @@
+"""Tests for the streaming access-log annotator."""
+import gzip
+import io
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from trusted_lists.annotate import LogAnnotator, annotate_logs
+from trusted_lists.index import TrustedIndex
+
+LOG = (
+    b'66.249.66.1 - - [17/Oct/2026:10:00:00 +0000] "GET / HTTP/1.1" 200 1 "-" "Googlebot"\n'
+    b'1.2.3.4 - - [17/Oct/2026:10:00:01 +0000] "GET / HTTP/1.1" 200 1 "-" "Googlebot"\n'
+    b'104.16.0.1 - - [17/Oct/2026:10:00:02 +0000] "POST /hook HTTP/1.1" 200 1 "-" "\xff"\n'
+    b'\n'
+)
+
+
+def make_build(tmp_path):
+    build_dir = tmp_path / "build"
+    build_dir.mkdir()
+    (build_dir / "googlebot-v4.txt").write_text("66.249.64.0/19\n")
+    (build_dir / "cloudflare-v4.txt").write_text("104.16.0.0/13\n")
+    return str(build_dir)
+
+
+def annotate(tmp_path, **options):
+    annotator = LogAnnotator(TrustedIndex.from_build_dir(make_build(tmp_path)),
+                             batch_size=2, **options)
+    out = io.BytesIO()
+    annotator.process(io.BytesIO(LOG), out)
+    return out.getvalue().splitlines(), annotator
+
+
+class TestLogAnnotator:
+    def test_annotate(self, tmp_path):
+        lines, annotator = annotate(tmp_path)
+        assert lines[0].endswith(b'"Googlebot"\tgooglebot-v4')
+        assert lines[1].endswith(b'\t-')
+        assert lines[2].endswith(b'"\xff"\tcloudflare-v4')
+        assert lines[3] == b'\t-'
+        assert annotator.lines_in == annotator.lines_out == 4
+
+    def test_match(self, tmp_path):
+        lines, annotator = annotate(tmp_path, match=["googlebot*"])
+        assert len(lines) == 1 and lines[0].startswith(b"66.249.66.1 ")
+        assert annotator.lines_out == 1
+
+    def test_exclude(self, tmp_path):
+        lines, _ = annotate(tmp_path, exclude=["cloudflare-v4"])
+        assert [line.split()[0] for line in lines if line] == [b"66.249.66.1", b"1.2.3.4"]
+
+    def test_field(self, tmp_path):
+        annotator = LogAnnotator(TrustedIndex.from_build_dir(make_build(tmp_path)), field=1)
+        assert annotator.process_batch([b"host 66.249.66.1 x\n"]) == [
+            b"host 66.249.66.1 x\tgooglebot-v4\n"]
+
+
+class TestAnnotateLogs:
+    def test_gzip_and_parallel_jobs(self, tmp_path):
+        build_dir = make_build(tmp_path)
+        plain = tmp_path / "access.log"
+        plain.write_bytes(LOG)
+        compressed = tmp_path / "access.log.gz"
+        with gzip.open(compressed, "wb") as f:
+            f.write(LOG)
+
+        serial = io.BytesIO()
+        counts = annotate_logs([str(plain), str(compressed)], serial, build_dir)
+        parallel = io.BytesIO()
+        parallel_counts = annotate_logs([str(plain), str(compressed)], parallel, build_dir,
+                                        jobs=2, match=["*"])
+        assert counts == (8, 8)
+        assert parallel_counts == (8, 4)
+        assert parallel.getvalue() == (LOG.splitlines(keepends=True)[0] +
+                                       LOG.splitlines(keepends=True)[2]) * 2
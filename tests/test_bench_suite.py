@@ -0,0 +1,56 @@
+"""Tests for the benchmark suite harness (not for the timings themselves)."""
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.suite import CASES, compare, format_size, main, parse_size, run_suite
+
+
+class TestSizes:
+    def test_round_trip(self):
+        for text in ("500", "1k", "10k", "100k", "1m"):
+            assert format_size(parse_size(text)) == text
+
+
+class TestRunSuite:
+    def test_every_case_extracts_all_networks(self, tmp_path, monkeypatch):
+        """Each case runs on a tiny feed, and leaves the working directory alone."""
+        monkeypatch.chdir(tmp_path)
+        results = run_suite(list(CASES), [50], repeat=1)
+        assert [r["case"] for r in results] == list(CASES)
+        assert all(r["seconds"] >= 0 and r["peak_bytes"] > 0 for r in results)
+        assert not (tmp_path / "build").exists()
+
+    def test_cli_writes_baseline_and_compares(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        args = ["--cases", "text_plain,extract_json_value_keys", "--sizes", "100"]
+        assert main(["run", *args, "--repeat", "1", "-o", "baseline.json"]) == 0
+        assert main(["compare", "baseline.json", "--repeat", "1", "--threshold", "100"]) == 0
+
+
+class TestCompare:
+    BASE = [{"case": "text_plain", "size": 1000, "seconds": 1.0, "peak_bytes": 10**6}]
+
+    def test_within_threshold(self):
+        current = [{"case": "text_plain", "size": 1000, "seconds": 1.2, "peak_bytes": 10**6}]
+        assert compare(self.BASE, current, 0.25) == []
+
+    def test_slower(self):
+        current = [{"case": "text_plain", "size": 1000, "seconds": 1.5, "peak_bytes": 10**6}]
+        (regression,) = compare(self.BASE, current, 0.25)
+        assert regression.startswith("text_plain 1k: seconds")
+
+    def test_more_memory(self):
+        current = [{"case": "text_plain", "size": 1000, "seconds": 1.0, "peak_bytes": 2 * 10**6}]
+        assert len(compare(self.BASE, current, 0.25)) == 1
+
+    def test_noise_ignored(self):
+        base = [{"case": "text_plain", "size": 1000, "seconds": 0.001, "peak_bytes": 1000}]
+        current = [{"case": "text_plain", "size": 1000, "seconds": 0.003, "peak_bytes": 3000}]
+        assert compare(base, current, 0.25) == []
+
+    def test_new_cases_ignored(self):
+        current = [{"case": "html_selector", "size": 1000, "seconds": 9.0, "peak_bytes": 1}]
+        assert compare(self.BASE, current, 0.25) == []
@@ -0,0 +1,71 @@
+"""Tests for the memory-mappable binary index."""
+import os
+import sys
+from ipaddress import IPv4Network, IPv6Network
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import write_ipset_files
+from trusted_lists.binindex import MappedIndex, write_combined_index, write_index
+
+
+class TestIndexFile:
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / "test.idx")
+        v6 = [(0x20010db8 << 96, (0x20010db8 << 96) | (2 ** 96 - 1))]
+        write_index(path, [("a", 4, [(10, 20), (30, 40)]), ("b-v6", 6, v6)])
+        with MappedIndex(path) as index:
+            assert [(s.name, s.version, s.count) for s in index.sections] == [
+                ("a", 4, 2), ("b-v6", 6, 1)]
+            assert list(index.sections[0].intervals()) == [(10, 20), (30, 40)]
+            assert list(index.sections[1].intervals()) == v6
+            assert index.sections[0].offset % 8 == 0
+
+    def test_containment(self, tmp_path):
+        path = str(tmp_path / "test.idx")
+        write_index(path, [("a", 4, [(10, 20), (30, 40)])])
+        with MappedIndex(path) as index:
+            section = index.sections[0]
+            assert [n for n in range(0, 45) if n in section] == \
+                list(range(10, 21)) + list(range(30, 41))
+
+    def test_long_names(self, tmp_path):
+        path = str(tmp_path / "test.idx")
+        name = "a-list-name-well-beyond-thirty-two-bytes-v6"
+        write_index(path, [(name, 6, [(1, 2)]), ("b", 4, [(3, 4)])])
+        with MappedIndex(path) as index:
+            assert [s.name for s in index.sections] == [name, "b"]
+            assert list(index.sections[1].intervals()) == [(3, 4)]
+            assert index.sections[1].offset % 8 == 0
+
+    def test_bad_magic(self, tmp_path):
+        path = tmp_path / "bad.idx"
+        path.write_bytes(b"XXXX" + b"\0" * 16)
+        with pytest.raises(ValueError):
+            MappedIndex(str(path))
+
+
+class TestBuildIndexes:
+    def test_write_ipset_files_and_combined(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("build")
+        config = {"url": "http://example.com"}
+        write_ipset_files("alpha", [IPv4Network("10.0.0.0/24"), IPv4Network("10.0.1.0/24")],
+                          "inet", "Alpha", config)
+        write_ipset_files("beta-v6", [IPv6Network("2001:db8::/32")], "inet6", "Beta", config)
+        with MappedIndex("build/alpha.idx") as index:
+            assert list(index.sections[0].intervals()) == [(0x0a000000, 0x0a0001ff)]
+
+        assert write_combined_index("build") == os.path.join("build", "trusted-lists.idx")
+        with MappedIndex("build/trusted-lists.idx") as index:
+            assert index.lists_containing("10.0.1.7") == ["alpha"]
+            assert index.lists_containing("2001:db8::1") == ["beta-v6"]
+            assert index.lists_containing("10.0.2.1") == []
+        # Re-combining ignores the previous combined file
+        write_combined_index("build")
+        with MappedIndex("build/trusted-lists.idx") as index:
+            assert len(index.sections) == 2
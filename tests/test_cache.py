@@ -0,0 +1,74 @@
+"""Tests for the HTTP validator cache."""
+import os
+import sys
+from pathlib import Path
+
+import responses
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import build
+from trusted_lists.cache import ValidatorCache
+
+URL = "http://example.com/ips.txt"
+LISTS = {"example": {"url": URL}}
+
+
+def run_build(tmp_path):
+    cache = ValidatorCache(str(tmp_path / "state" / "http-cache.yml"))
+    build(LISTS, workers=1, cache=cache)
+    return cache
+
+
+class TestValidatorCache:
+    @responses.activate
+    def test_second_run_is_conditional_and_skips_on_304(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("build")
+        responses.add(responses.GET, URL, body="1.2.3.0/24\n", content_type="text/plain",
+                      headers={"ETag": '"v1"'})
+        cache = run_build(tmp_path)
+        assert cache.entries[URL]["etag"] == '"v1"'
+        assert cache.entries[URL]["lists"]["example"]["outputs"] == ["example"]
+
+        responses.replace(responses.GET, URL, status=304)
+        os.utime("build/example.txt", (0, 0))
+        run_build(tmp_path)
+        assert responses.calls[1].request.headers["if-none-match"] == '"v1"'
+        # Outputs were not rewritten
+        assert os.stat("build/example.txt").st_mtime == 0
+
+    @responses.activate
+    def test_identical_body_is_skipped(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("build")
+        responses.add(responses.GET, URL, body="1.2.3.0/24\n", content_type="text/plain")
+        run_build(tmp_path)
+        os.utime("build/example.txt", (0, 0))
+        run_build(tmp_path)
+        assert "if-none-match" not in responses.calls[1].request.headers
+        assert os.stat("build/example.txt").st_mtime == 0
+
+    @responses.activate
+    def test_missing_outputs_force_full_fetch(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("build")
+        responses.add(responses.GET, URL, body="1.2.3.0/24\n", content_type="text/plain",
+                      headers={"ETag": '"v1"'})
+        run_build(tmp_path)
+        os.remove("build/example.xml")
+        run_build(tmp_path)
+        assert "if-none-match" not in responses.calls[1].request.headers
+        assert os.path.exists("build/example.xml")
+
+    @responses.activate
+    def test_config_change_invalidates(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("build")
+        responses.add(responses.GET, URL, body="1.2.3.0/24\n", content_type="text/plain",
+                      headers={"ETag": '"v1"'})
+        run_build(tmp_path)
+        cache = ValidatorCache(str(tmp_path / "state" / "http-cache.yml"))
+        changed = {"example": {"url": URL, "description": "Changed"}}
+        assert not cache.is_reusable(URL, ["example"], changed)
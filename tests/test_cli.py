@@ -0,0 +1,71 @@
+"""Tests for the command line entry point and its lazy imports."""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import yaml
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import main
+
+REPO_DIR = Path(__file__).parent.parent
+HEAVY_MODULES = ('requests', 'bs4', 'lxml', 'yaml')
+
+
+def loaded_modules(code, cwd):
+    """Run ``code`` in a fresh interpreter and return which heavy modules it imported."""
+    env = dict(os.environ, PYTHONPATH=str(REPO_DIR))
+    check = f"{code}\nimport sys\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", check], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    return set(filter(None, result.stdout.rstrip("\n").split("\n")[-1].split(",")))
+
+
+def write_config(tmp_path):
+    (tmp_path / "static").mkdir()
+    (tmp_path / "static" / "a.txt").write_text("# comment\n192.0.2.0/24\n")
+    (tmp_path / "static" / "b.txt").write_text("198.51.100.0/24\n")
+    (tmp_path / "build").mkdir()
+    config = {
+        "a": {"static_file": "static/a.txt"},
+        "b": {"static_file": "static/b.txt"},
+        "remote": {"url": "https://example.invalid/ips.txt"},
+    }
+    with open(tmp_path / "trusted.yml", "w") as f:
+        yaml.dump(config, f)
+
+
+class TestImport:
+    def test_import_loads_no_heavy_dependencies(self):
+        assert loaded_modules("import generate", REPO_DIR) == set()
+
+    def test_static_list_build_needs_no_http_or_html(self, tmp_path):
+        write_config(tmp_path)
+        code = "import generate\ngenerate.main(['build', '--only', 'a', '--no-cache'])"
+        assert loaded_modules(code, tmp_path) == {'lxml', 'yaml'}
+
+
+class TestOnly:
+    def test_builds_selected_lists(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        write_config(tmp_path)
+        assert main(["build", "--only", "a,b", "--no-cache"]) == 0
+        assert (tmp_path / "build" / "a.txt").read_text() == "192.0.2.0/24\n"
+        assert (tmp_path / "build" / "b.txt").exists()
+        assert not (tmp_path / "build" / "remote.txt").exists()
+
+    def test_unknown_list(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.chdir(tmp_path)
+        write_config(tmp_path)
+        assert main(["build", "--only", "a,nope"]) == 1
+        assert "nope" in capsys.readouterr().err
+        assert not (tmp_path / "build" / "a.txt").exists()
+
+    def test_build_is_default_command(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        write_config(tmp_path)
+        assert main(["--only", "b", "--no-cache"]) == 0
+        assert (tmp_path / "build" / "b.txt").exists()
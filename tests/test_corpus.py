@@ -0,0 +1,108 @@
+"""Tests for recording and replaying upstream responses."""
+import gzip
+import json
+import sys
+from pathlib import Path
+
+import pytest
+import responses
+import yaml
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import main
+from trusted_lists.corpus import ReplaySession, request_key
+from trusted_lists.fetch import FetchError
+
+LISTS = {
+    "plain": {"url": "https://example.com/ips.txt"},
+    "feed": {"url": "https://example.com/ranges.json", "json_stream": True,
+             "json_selector": "prefixes", "json_value_keys": ["ip_prefix"]},
+    "page": {"url": "https://example.com/ips.html", "html_selector": "li"},
+}
+
+
+def add_upstream(upstream):
+    upstream.add(responses.GET, LISTS["plain"]["url"], body="192.0.2.0/24\n",
+                  content_type="text/plain")
+    upstream.add(responses.GET, LISTS["feed"]["url"],
+                  json={"prefixes": [{"ip_prefix": "3.5.140.0/22"},
+                                     {"ip_prefix": "2600:1f14::/35"}]})
+    upstream.add(responses.GET, LISTS["page"]["url"],
+                  body="<ul><li>203.0.113.0/24</li></ul>", content_type="text/html")
+
+
+def build_outputs(tmp_path):
+    return {path.name: path.read_bytes() for path in sorted((tmp_path / "build").iterdir())
+            if path.suffix in (".txt", ".xml", ".nft")}
+
+
+class TestRecordReplay:
+    def test_replay_reproduces_recorded_build(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        with open(tmp_path / "trusted.yml", "w") as f:
+            yaml.dump(LISTS, f)
+
+        with responses.RequestsMock() as upstream:
+            add_upstream(upstream)
+            assert main(["build", "--record", "corpus"]) == 0
+            assert len(upstream.calls) == 3
+        recorded = build_outputs(tmp_path)
+        assert recorded["feed-v4.txt"] == b"3.5.140.0/22\n"
+        assert len(list((tmp_path / "corpus").glob("*.http.gz"))) == 3
+
+        for path in (tmp_path / "build").iterdir():
+            path.unlink()
+        # No responses registered: any real request would fail
+        with responses.RequestsMock() as network:
+            assert main(["build", "--replay", "corpus"]) == 0
+            assert len(network.calls) == 0
+        assert build_outputs(tmp_path) == recorded
+
+    def test_recorded_file_format(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        with open(tmp_path / "trusted.yml", "w") as f:
+            yaml.dump({"plain": LISTS["plain"]}, f)
+        with responses.RequestsMock(assert_all_requests_are_fired=False) as upstream:
+            add_upstream(upstream)
+            main(["build", "--record", "corpus"])
+        [path] = (tmp_path / "corpus").glob("*.http.gz")
+        with gzip.open(path, "rb") as f:
+            meta = json.loads(f.readline())
+            assert f.read() == b"192.0.2.0/24\n"
+        assert meta["status"] == 200
+        assert meta["headers"]["Content-Type"] == "text/plain"
+
+    def test_corrupt_recording_fails_only_its_list(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        with open(tmp_path / "trusted.yml", "w") as f:
+            yaml.dump(LISTS, f)
+        with responses.RequestsMock() as upstream:
+            add_upstream(upstream)
+            assert main(["build", "--record", "corpus"]) == 0
+        for path in (tmp_path / "corpus").glob("*.http.gz"):
+            with gzip.open(path, "rb") as f:
+                if json.loads(f.readline())["url"] == LISTS["plain"]["url"]:
+                    path.write_bytes(path.read_bytes()[:20])
+        (tmp_path / "build" / "page.txt").unlink()
+
+        main(["build", "--replay", "corpus"])
+        assert "Failed: plain (unreadable recorded response" in capsys.readouterr().err
+        assert (tmp_path / "build" / "plain.txt").read_text() == "192.0.2.0/24\n"
+        assert (tmp_path / "build" / "page.txt").read_text() == "203.0.113.0/24\n"
+
+class TestReplaySession:
+    def test_missing_response(self, tmp_path):
+        session = ReplaySession(str(tmp_path))
+        with pytest.raises(FetchError, match="no recorded response"):
+            session.get("https://example.com/missing.txt", headers={})
+
+    def test_key_ignores_conditional_headers(self):
+        url = "https://example.com/ips.txt"
+        assert (request_key(url, {"User-Agent": "x"})
+                == request_key(url, {"user-agent": "x", "If-None-Match": '"abc"'}))
+        assert request_key(url, {"user-agent": "x"}) != request_key(url, {"user-agent": "y"})
@@ -0,0 +1,125 @@
+"""Tests for delta artifacts and the spec scriptlet applying them."""
+import os
+import subprocess
+import sys
+from ipaddress import ip_network
+from pathlib import Path
+
+import jinja2
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import write_ipset_files
+from trusted_lists.delta import DeltaWriter, entries_digest, read_entries, write_delta
+
+SPEC_TEMPLATE = Path(__file__).parent.parent / "src" / "ipset.spec.j2"
+
+FIREWALL_CMD = """#!/bin/sh
+echo "$*" >> "$FIREWALL_LOG"
+case "$*" in
+    --state) exit 0 ;;
+    *--get-entries*) cat "$FIREWALL_ENTRIES" ;;
+    *--add-entries-from-file*) [ -z "$FIREWALL_FAIL_ADD" ] ;;
+esac
+"""
+
+
+class TestWriteDelta:
+    def test_added_and_removed(self, tmp_path):
+        base = tmp_path / "a"
+        counts = write_delta(str(base), ["1.0.0.0/24", "2.0.0.0/24"], ["2.0.0.0/24", "3.0.0.0/24"])
+        assert counts == (1, 1)
+        added = (tmp_path / "a.added").read_text().splitlines()
+        removed = (tmp_path / "a.removed").read_text().splitlines()
+        assert added[2:] == ["3.0.0.0/24"]
+        assert removed[2:] == ["1.0.0.0/24"]
+        assert added[:2] == removed[:2] == [
+            f"# base sha256:{entries_digest(['1.0.0.0/24', '2.0.0.0/24'])}",
+            f"# target sha256:{entries_digest(['2.0.0.0/24', '3.0.0.0/24'])}",
+        ]
+
+    def test_first_build(self, tmp_path):
+        write_delta(str(tmp_path / "a"), None, ["1.0.0.0/24"])
+        assert (tmp_path / "a.added").read_text().startswith("# base sha256:none\n")
+
+    def test_tracks_streamed_entries(self, tmp_path):
+        delta = DeltaWriter(str(tmp_path / "a"), {"1.0.0.0/24", "2.0.0.0/24"})
+        entries = delta.track(iter(["2.0.0.0/24", "3.0.0.0/24"]))
+        assert next(entries) == "2.0.0.0/24"
+        assert list(entries) == ["3.0.0.0/24"]
+        assert delta.close() == (1, 1)
+        assert (tmp_path / "a.added").read_text().endswith("\n3.0.0.0/24\n")
+        assert (tmp_path / "a.removed").read_text().endswith("\n1.0.0.0/24\n")
+
+    def test_digest_matches_sort_and_sha256sum(self):
+        entries = ["9.0.0.0/8", "10.0.0.0/8", "2001:db8::/32"]
+        result = subprocess.run("LC_ALL=C sort | sha256sum", shell=True, check=True, text=True,
+                                input="".join(f"{e}\n" for e in entries), capture_output=True)
+        assert result.stdout.split()[0] == entries_digest(entries)
+
+    def test_read_entries(self, tmp_path):
+        assert read_entries(tmp_path / "missing.txt") is None
+        (tmp_path / "a.txt").write_text("1.0.0.0/24\n\n")
+        assert read_entries(tmp_path / "a.txt") == {"1.0.0.0/24"}
+
+
+class TestWriteIpsetFiles:
+    def test_delta_against_previous_txt(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        (tmp_path / "build" / "acl.txt").write_text("10.0.0.0/24\n10.0.1.0/24\n")
+        write_ipset_files("acl", [ip_network("10.0.0.0/24"), ip_network("10.0.5.0/24")],
+                          "inet", "ACL", {})
+        assert (tmp_path / "build" / "acl.added").read_text().endswith("\n10.0.5.0/24\n")
+        assert (tmp_path / "build" / "acl.removed").read_text().endswith("\n10.0.1.0/24\n")
+
+
+class TestPostScriptlet:
+    @pytest.fixture
+    def host(self, tmp_path):
+        """A fake host: firewall-cmd stub, running ipset entries and installed delta."""
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir()
+        stub = bin_dir / "firewall-cmd"
+        stub.write_text(FIREWALL_CMD)
+        stub.chmod(0o755)
+        datadir = tmp_path / "share"
+        (datadir / "firewalld-ipset-acl").mkdir(parents=True)
+        write_delta(str(datadir / "firewalld-ipset-acl" / "acl"), ["1.0.0.0/24", "2.0.0.0/24"],
+                    ["2.0.0.0/24", "3.0.0.0/24"])
+        spec = jinja2.Template(SPEC_TEMPLATE.read_text()).render(name="acl", version=1)
+        script = spec.split("\n%post\n", 1)[1].split("\n%changelog", 1)[0]
+        script = (script.replace("%{_datadir}", str(datadir))
+                  .replace("%{name}", "firewalld-ipset-acl").replace("%{ipset_name}", "acl")
+                  .replace("/usr/bin/firewall-cmd", str(stub)))
+        env = dict(os.environ, PATH=f"{bin_dir}:{os.environ['PATH']}",
+                   FIREWALL_LOG=str(tmp_path / "log"), FIREWALL_ENTRIES=str(tmp_path / "entries"))
+
+        def run(running_entries, upgrade=True, **extra_env):
+            (tmp_path / "entries").write_text(" ".join(running_entries) + "\n")
+            (tmp_path / "log").write_text("")
+            subprocess.run(["sh", "-c", script, "post", "2" if upgrade else "1"],
+                           env=dict(env, **extra_env), check=True)
+            return (tmp_path / "log").read_text().splitlines()
+
+        return run
+
+    def test_upgrade_applies_delta(self, host):
+        calls = host(["2.0.0.0/24", "1.0.0.0/24"])
+        assert calls[-2].startswith("--quiet --ipset=acl --remove-entries-from-file=")
+        assert calls[-1].startswith("--quiet --ipset=acl --add-entries-from-file=")
+        assert not any("--reload" in call for call in calls)
+
+    def test_drifted_ipset_reloads(self, host):
+        calls = host(["1.0.0.0/24"])
+        assert calls[-1] == "--reload --quiet"
+        assert not any("entries-from-file" in call for call in calls)
+
+    def test_first_install_reloads(self, host):
+        assert host(["1.0.0.0/24", "2.0.0.0/24"], upgrade=False) == ["--reload --quiet"]
+
+    def test_failed_delta_reloads(self, host):
+        calls = host(["1.0.0.0/24", "2.0.0.0/24"], FIREWALL_FAIL_ADD="1")
+        assert calls[-1] == "--reload --quiet"
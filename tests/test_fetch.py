@@ -0,0 +1,340 @@
+"""Tests for concurrent source fetching."""
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+import responses
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import build
+from trusted_lists.fetch import (
+    BACKOFF_CAP,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_RETRIES,
+    BodyStream,
+    Deadline,
+    FetchError,
+    backoff_delay,
+    build_headers,
+    fetch_all,
+    group_requests,
+    request_policy,
+)
+
+
+class TestBuildHeaders:
+    def test_simple_headers(self):
+        headers = build_headers({"url": "http://example.com", "simple_headers": True})
+        assert "accept" not in headers
+        assert "trusted-lists" in headers["user-agent"]
+
+    def test_paypal_cookie(self):
+        headers = build_headers({"url": "https://www.paypal.com/smarthelp/x"})
+        assert "cookie" in headers
+
+
+class TestGroupRequests:
+    def test_same_url_is_fetched_once(self):
+        lists = {
+            "a": {"url": "http://example.com/ips.txt"},
+            "b": {"url": "http://example.com/ips.txt"},
+            "c": {"url": "http://example.com/other.txt"},
+        }
+        groups = group_requests(lists)
+        assert sorted(groups.values()) == [["a", "b"], ["c"]]
+
+    def test_different_headers_not_merged(self):
+        lists = {
+            "a": {"url": "http://example.com/ips.txt"},
+            "b": {"url": "http://example.com/ips.txt", "simple_headers": True},
+        }
+        assert len(group_requests(lists)) == 2
+
+    def test_lists_without_parser_are_streamed(self):
+        lists = {
+            "plain": {"url": "http://example.com/ips.txt"},
+            "plain2": {"url": "http://example.com/ips.txt"},
+            "page": {"url": "http://example.com/ips.html", "html_selector": "li"},
+        }
+        streams = {tuple(names): key[2] for key, names in group_requests(lists).items()}
+        assert streams == {("plain", "plain2"): True, ("page",): None}
+
+    def test_static_files_skipped(self):
+        lists = {"w": {"static_file": "static/wordfence.txt"}}
+        assert group_requests(lists) == {}
+
+
+class TestFetchAll:
+    @responses.activate
+    def test_fetch_all_yields_every_group(self):
+        responses.add(responses.GET, "http://example.com/a.txt", body="1.2.3.4\n",
+                      content_type="text/plain")
+        responses.add(responses.GET, "http://example.com/b.txt", body="5.6.7.8\n",
+                      content_type="text/plain")
+        lists = {
+            "a": {"url": "http://example.com/a.txt"},
+            "a2": {"url": "http://example.com/a.txt"},
+            "b": {"url": "http://example.com/b.txt"},
+        }
+        results = {tuple(names): r.text for names, r in fetch_all(lists, workers=4)}
+        assert results == {("a", "a2"): "1.2.3.4\n", ("b",): "5.6.7.8\n"}
+        assert len(responses.calls) == 2
+
+
+class TestRequestPolicy:
+    def test_defaults(self):
+        assert request_policy([{}]) == ((DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+                                        DEFAULT_RETRIES)
+
+    def test_most_patient_list_wins(self):
+        configs = [{"read_timeout": 5, "retries": 0}, {"connect_timeout": 3, "read_timeout": 60}]
+        assert request_policy(configs) == ((DEFAULT_CONNECT_TIMEOUT, 60), DEFAULT_RETRIES)
+
+    def test_backoff_is_bounded(self):
+        assert all(0 <= backoff_delay(attempt) <= BACKOFF_CAP for attempt in range(20))
+
+
+class TestRetries:
+    @pytest.fixture(autouse=True)
+    def no_sleep(self, monkeypatch):
+        monkeypatch.setattr("trusted_lists.fetch.time.sleep", lambda seconds: None)
+
+    @responses.activate
+    def test_transient_errors_are_retried(self):
+        url = "http://example.com/a.txt"
+        responses.add(responses.GET, url, body=requests.ConnectionError("reset"))
+        responses.add(responses.GET, url, status=503)
+        responses.add(responses.GET, url, body="1.2.3.4\n")
+        [(names, response)] = fetch_all({"a": {"url": url}})
+        assert response.text == "1.2.3.4\n"
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_retries_are_bounded(self):
+        url = "http://example.com/a.txt"
+        responses.add(responses.GET, url, status=502)
+        [(names, error)] = fetch_all({"a": {"url": url, "retries": 1}})
+        assert isinstance(error, FetchError)
+        assert names == error.list_names == ["a"]
+        assert "HTTP 502 (attempts: 2)" in error.reason
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_client_errors_are_not_retried(self):
+        responses.add(responses.GET, "http://example.com/a.txt", status=404)
+        [(names, response)] = fetch_all({"a": {"url": "http://example.com/a.txt"}})
+        assert response.status_code == 404
+        assert len(responses.calls) == 1
+
+
+class HangingSession:
+    """Session whose requests take longer than any test deadline."""
+
+    def __init__(self, seconds=0.3):
+        self.seconds = seconds
+        self.timeouts = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        self.timeouts.append(timeout)
+        time.sleep(self.seconds)
+        raise requests.ReadTimeout("timed out")
+
+
+class TricklingResponse:
+    """Response sending its body a few bytes at a time, each read under the timeout."""
+
+    status_code = 200
+    headers = {"content-type": "text/plain"}
+    encoding = None
+
+    def __init__(self):
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for _ in range(100):
+            time.sleep(0.05)
+            yield b"1.2.3.4\n"
+
+    def close(self):
+        self.closed = True
+
+
+class TricklingSession:
+    def __init__(self):
+        self.response = TricklingResponse()
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        return self.response
+
+
+class TestDeadline:
+    def test_unlimited(self):
+        assert Deadline().remaining() is None
+        assert Deadline().clip(30) == 30
+
+    def test_timeouts_clipped_to_deadline(self):
+        deadline = Deadline(5)
+        assert deadline.clip(30) <= 5
+        assert deadline.clip(1) == 1
+
+    def test_expired_deadline_still_gives_a_valid_timeout(self):
+        from urllib3 import Timeout
+
+        deadline = Deadline(0)
+        assert deadline.expired()
+        # What requests builds from the timeouts; it rejects 0
+        Timeout(connect=deadline.clip(10), read=deadline.clip(30))
+
+    def test_pending_sources_fail_at_deadline(self):
+        session = HangingSession()
+        lists = {"a": {"url": "http://example.com/a.txt"}}
+        start = time.monotonic()
+        results = list(fetch_all(lists, session=session, deadline=Deadline(0.05)))
+        assert results[0][0] == ["a"]
+        assert results[0][1].reason == "deadline exceeded"
+        assert time.monotonic() - start < 1
+        assert session.timeouts[0][1] <= 0.05
+
+    def test_build_does_not_wait_for_running_requests(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        session = HangingSession(seconds=3)
+        start = time.monotonic()
+        failed = build({"a": {"url": "http://example.com/a.txt"}}, deadline=0.5,
+                       session=session)
+        assert failed == ["a"]
+        assert time.monotonic() - start < 1.5
+
+    def test_trickling_body_stops_at_deadline(self):
+        session = TricklingSession()
+        lists = {"a": {"url": "http://example.com/a.html", "html_selector": "li"}}
+        start = time.monotonic()
+        [(names, error)] = fetch_all(lists, session=session, deadline=Deadline(0.3))
+        assert "deadline exceeded" in error.reason
+        assert time.monotonic() - start < 1
+        # The worker stops reading at its next chunk
+        time.sleep(0.2)
+        assert session.response.closed
+
+
+class TestBodyStream:
+    def test_read_error_becomes_fetch_error(self):
+        class BrokenResponse:
+            encoding = None
+            headers = {}
+
+            def iter_content(self, chunk_size):
+                yield b"1.2.3.4\n"
+                raise requests.ConnectionError("connection reset")
+
+        with pytest.raises(FetchError, match="connection reset"):
+            list(BodyStream(BrokenResponse()))
+
+
+class ChunkedResponse:
+    """Response whose body arrives in the given chunks."""
+
+    def __init__(self, chunks, headers=None, encoding=None):
+        self.chunks = chunks
+        self.headers = headers or {}
+        self.encoding = encoding
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+
+class TestStreamedLines:
+    def test_lines_split_across_chunks(self):
+        body = BodyStream(ChunkedResponse([b"1.2.3.0/2", b"4\r\n5.6.", b"7.8\n\n", b"9.9.9.9"]))
+        assert [line for line in body.iter_lines() if line] == [
+            "1.2.3.0/24", "5.6.7.8", "9.9.9.9"]
+        assert body.size == 28
+
+    def test_multibyte_character_across_chunks(self):
+        body = BodyStream(ChunkedResponse([b"# caf\xc3", b"\xa9\n1.2.3.4\n"]))
+        assert list(body.iter_lines()) == ["# caf\u00e9", "1.2.3.4"]
+
+    def test_announced_body_too_large(self):
+        response = ChunkedResponse([b"1.2.3.4\n"], headers={"content-length": "2048"})
+        with pytest.raises(FetchError, match="max_body_size"):
+            list(BodyStream(response, max_size=1024).iter_lines())
+
+    def test_streamed_body_too_large(self):
+        body = BodyStream(ChunkedResponse([b"1.2.3.4\n"] * 10), max_size=40)
+        with pytest.raises(FetchError, match="max_body_size"):
+            list(body.iter_lines())
+        assert body.size <= 40
+
+
+class TestBuildFallback:
+    @responses.activate
+    def test_failed_source_keeps_last_good_outputs(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        (tmp_path / "build" / "a.txt").write_text("192.0.2.0/24\n")
+        responses.add(responses.GET, "http://example.com/a.txt", status=500)
+        responses.add(responses.GET, "http://example.com/b.txt", body="198.51.100.0/24\n",
+                      content_type="text/plain")
+        lists = {
+            "a": {"url": "http://example.com/a.txt", "retries": 0},
+            "b": {"url": "http://example.com/b.txt"},
+        }
+        assert build(lists) == ["a"]
+        assert (tmp_path / "build" / "a.txt").read_text() == "192.0.2.0/24\n"
+        assert (tmp_path / "build" / "b.txt").read_text() == "198.51.100.0/24\n"
+        assert "Failed: a (HTTP 500 (attempts: 1)), keeping its last good build" in (
+            capsys.readouterr().err)
+
+    @responses.activate
+    def test_oversized_text_keeps_last_good_outputs(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        (tmp_path / "build" / "a.txt").write_text("192.0.2.0/24\n")
+        responses.add(responses.GET, "http://example.com/a.txt",
+                      body="198.51.100.0/24\n" * 100, content_type="text/plain")
+        lists = {"a": {"url": "http://example.com/a.txt", "max_body_size": 1000}}
+        assert build(lists) == ["a"]
+        assert (tmp_path / "build" / "a.txt").read_text() == "192.0.2.0/24\n"
+
+    @responses.activate
+    def test_oversized_shared_text_keeps_last_good_outputs(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        (tmp_path / "build" / "a.txt").write_text("192.0.2.0/24\n")
+        responses.add(responses.GET, "http://example.com/ips.txt",
+                      body="198.51.100.0/24\n" * 100, content_type="text/plain")
+        lists = {
+            "a": {"url": "http://example.com/ips.txt", "max_body_size": 1000},
+            "b": {"url": "http://example.com/ips.txt"},
+        }
+        assert build(lists) == ["a", "b"]
+        assert len(responses.calls) == 1
+        assert (tmp_path / "build" / "a.txt").read_text() == "192.0.2.0/24\n"
+        assert not (tmp_path / "build" / "b.txt").exists()
+
+        lists["a"]["max_body_size"] = 10000
+        assert build(lists) == []
+        assert (tmp_path / "build" / "a.txt").read_text() == "198.51.100.0/24\n"
+        assert (tmp_path / "build" / "b.txt").read_text() == "198.51.100.0/24\n"
+
+    def test_unexpected_worker_error_fails_its_lists(self):
+        class BrokenSession:
+            def get(self, url, headers=None, stream=False, timeout=None):
+                if url.endswith("a.txt"):
+                    raise KeyError("content-type")
+                response = ChunkedResponse([b"1.2.3.4\n"])
+                response.status_code = 200
+                return response
+
+        lists = {"a": {"url": "http://example.com/a.txt"},
+                 "b": {"url": "http://example.com/b.txt"}}
+        results = dict((names[0], result) for names, result in
+                       fetch_all(lists, session=BrokenSession()))
+        assert results["a"].reason == "KeyError: 'content-type'"
+        assert results["a"].list_names == ["a"]
+        assert results["b"].status_code == 200
@@ -0,0 +1,188 @@
+"""Tests for the HTML extraction engines, including bs4/lxml parity."""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import extract_from_response
+from trusted_lists.html import ENGINES, engine_for, page_lines, select_texts
+from trusted_lists.netset import NetworkSet
+from trusted_lists.parse import add_networks
+
+BUILD_DIR = Path(__file__).parent.parent / "build"
+
+NAV = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Docs</title>
+<script>window.dataLayer = [{"ip": "10.0.0.0/8"}];</script>
+<script>
+10.0.0.0/8
+</script>
+<style>li { color: red }</style></head>
+<body><nav><ul class="menu"><li><a href="/">Home</a></li>
+<li><script>
+172.16.0.0/12
+</script><style>
+192.168.0.0/16
+</style><template>
+100.64.0.0/10
+</template></li>
+<li class="open"><a href="/docs">Docs &amp; guides</a><ul><li><a href="/ip">IP ranges</a></li>
+</ul></li></ul></nav>
+<!-- <li>192.0.2.0/24</li> -->
+"""
+
+
+def build_networks(name):
+    return (BUILD_DIR / f"{name}.txt").read_text().split()
+
+
+class Response:
+    """Stands in for requests.Response in extract_from_response."""
+
+    def __init__(self, text, content_type):
+        self.text = text
+        self.headers = {'content-type': content_type}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def circleci_page():
+    items = "".join(f"<li>{network}</li>\n" for network in build_networks("circleci"))
+    return f"{NAV}<main><h2>IP ranges</h2><ul>\n{items}</ul></main></body></html>"
+
+
+def paypal_page():
+    items = "".join(f"<li>{network}</li>" for network in build_networks("paypal"))
+    fragment = f"<p>IP addresses for <b>webhooks</b>:</p><ul>{items}</ul><p>Updated</p>"
+    return json.dumps({"articleContent": {"articleContent": fragment}})
+
+
+def twitter_page():
+    rows = "".join(f"<tr>\n<td>{network}</td>\n<td>Twitter</td>\n</tr>\n"
+                   for network in build_networks("twitter"))
+    return f"{NAV}<table>\n{rows}</table></body></html>"
+
+
+def metabase_page():
+    return (f"{NAV}<p>Allow these addresses:</p>\n<p><code>18.207.81.126</code></p>\n"
+            "<p><code>3.211.20.157</code></p>\n<p><code>50.17.234.169</code></p>\n"
+            "</body></html>")
+
+
+# list name -> (trusted.yml config, response body, content type)
+SOURCES = {
+    "circleci": ({'html_selector': 'li'}, circleci_page, 'text/html; charset=utf-8'),
+    "paypal": ({'json_selector': 'articleContent.articleContent', 'html_selector': 'li'},
+               paypal_page, 'application/json'),
+    "twitter": ({}, twitter_page, 'text/html'),
+    "metabase": ({}, metabase_page, 'text/html'),
+}
+
+
+def extract(list_config, page, content_type, engine):
+    ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+    extract_from_response(list_config, Response(page, content_type), ipv4, ipv6,
+                          html_engine=engine)
+    return ipv4, ipv6
+
+
+class TestParity:
+    @pytest.mark.parametrize("name", sorted(SOURCES))
+    def test_sources_extract_identical_networks(self, name):
+        list_config, page, content_type = SOURCES[name]
+        results = [extract(list_config, page(), content_type, engine) for engine in ENGINES]
+        assert results[0] == results[1]
+        ipv4, ipv6 = results[0]
+        assert len(ipv4) > 0
+        if name != "metabase":
+            expected = NetworkSet(4)
+            add_networks(build_networks(name), expected, NetworkSet(6))
+            assert ipv4 == expected
+
+    def test_per_list_engine_overrides_default(self):
+        """lxml closes an unterminated <li>; html.parser nests the next one into it."""
+        page = "<ul><li>1.2.3.0/24<li>5.6.7.8</ul>"
+        ipv4, _ = extract({'html_selector': 'li'}, page, 'text/html', 'bs4')
+        assert list(ipv4.cidrs()) == ['5.6.7.8/32']
+        ipv4, _ = extract({'html_selector': 'li', 'html_engine': 'lxml'}, page, 'text/html',
+                          'bs4')
+        assert list(ipv4.cidrs()) == ['1.2.3.0/24', '5.6.7.8/32']
+
+
+class TestSelectTexts:
+    def test_nested_matches(self):
+        markup = "<ul><li>a<ul><li>b</li></ul></li><li>c</li></ul>"
+        for engine in ENGINES:
+            assert sorted(select_texts(markup, 'li', engine)) == ['ab', 'b', 'c']
+
+    def test_compiled_css_selector(self):
+        markup = '<ul class="ips"><li>1.2.3.4</li></ul><ul><li>nav</li></ul>'
+        for engine in ENGINES:
+            assert select_texts(markup, 'ul.ips > li', engine) == ['1.2.3.4']
+
+    def test_comments_are_not_text(self):
+        markup = "<ul><li>1.2.3.4<!-- 5.6.7.8 --></li></ul>"
+        for engine in ENGINES:
+            assert select_texts(markup, 'li', engine) == ['1.2.3.4']
+
+    def test_tag_selector_drops_parsed_elements(self, monkeypatch):
+        from lxml import etree
+
+        parses = []
+        iterparse = etree.iterparse
+
+        def recording_iterparse(*args, **kwargs):
+            parses.append(iterparse(*args, **kwargs))
+            return parses[-1]
+
+        monkeypatch.setattr(etree, "iterparse", recording_iterparse)
+        chrome = "".join(f'<div class="c{i}"><span>menu {i}</span></div>' for i in range(5000))
+        items = "".join(f"<li>10.0.{i}.0/24</li>" for i in range(10))
+        markup = f"<html><body>{chrome}<ul>{items}</ul>{chrome}</body></html>"
+        assert select_texts(markup, 'li', 'lxml') == [f"10.0.{i}.0/24" for i in range(10)]
+        [parse] = parses
+        assert sum(1 for _ in parse.root.iter()) < 10
+
+    def test_encoding_declaration(self):
+        markup = '<?xml version="1.0" encoding="iso-8859-1"?><ul><li>café</li></ul>'
+        assert select_texts(markup, 'li', 'lxml') == ['café']
+
+    def test_empty_document_falls_back(self):
+        assert select_texts("", 'li', 'lxml') == []
+        assert page_lines("", 'lxml') == []
+
+    def test_unsupported_selector_falls_back(self):
+        markup = "<ul><li>a</li><li>b</li></ul>"
+        assert select_texts(markup, 'li:-soup-contains("b")', 'lxml') == ['b']
+
+    def test_page_lines(self):
+        markup = "<p>1.2.3.4</p>\n<p>5.6.7.8</p>"
+        for engine in ENGINES:
+            assert page_lines(markup, engine) == ['1.2.3.4', '5.6.7.8']
+
+    def test_scripts_and_styles_are_not_text(self):
+        markup = ("<style>p { margin: 0 }</style><ul><li>1.2.3.4<script>x = 1;</script>"
+                  "<template>t</template>!</li></ul><script>y = 2;</script>")
+        for engine in ENGINES:
+            assert select_texts(markup, 'li', engine) == ['1.2.3.4!']
+            assert select_texts(markup, 'ul > li', engine) == ['1.2.3.4!']
+            assert select_texts(markup, 'script', engine) == ['x = 1;', 'y = 2;']
+            assert page_lines(markup, engine) == ['1.2.3.4!']
+
+
+class TestEngineFor:
+    def test_default(self):
+        assert engine_for({}) == 'bs4'
+        assert engine_for({}, 'lxml') == 'lxml'
+
+    def test_list_setting_wins(self):
+        assert engine_for({'html_engine': 'lxml'}, 'bs4') == 'lxml'
+
+    def test_unknown_engine(self):
+        with pytest.raises(ValueError):
+            engine_for({'html_engine': 'html5lib'})
@@ -0,0 +1,85 @@
+"""Tests for the lookup index and the lookup subcommand."""
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import main
+from trusted_lists.index import TrustedIndex, load_build_lists
+
+
+def write_lists(build_dir):
+    build_dir.mkdir()
+    (build_dir / "alpha.txt").write_text("10.0.0.0/8\n192.168.1.0/24\n")
+    (build_dir / "beta.txt").write_text("10.1.0.0/16\n192.168.2.0/24\n")
+    (build_dir / "gamma-v6.txt").write_text("2001:db8::/32\n")
+
+
+class TestTrustedIndex:
+    def test_containment(self, tmp_path):
+        write_lists(tmp_path / "build")
+        index = TrustedIndex.from_build_dir(str(tmp_path / "build"))
+        assert index.lookup("10.2.3.4") == "alpha"
+        assert index.lookup("10.1.255.255") == "alpha,beta"
+        assert index.lookup("10.2.0.0") == "alpha"
+        assert index.lookup("192.168.2.1") == "beta"
+        assert index.lookup("192.168.3.1") == ""
+        assert index.lookup("0.0.0.0") == ""
+        assert index.lookup("255.255.255.255") == ""
+        assert index.lookup("2001:db8::1") == "gamma-v6"
+        assert index.lookup("2001:db9::1") == ""
+        assert index.lookup("not-an-ip") is None
+
+    def test_network_containment(self, tmp_path):
+        write_lists(tmp_path / "build")
+        index = TrustedIndex.from_build_dir(str(tmp_path / "build"))
+        assert index.lookup("10.1.2.0/24") == "alpha,beta"
+        # Spans the alpha-only and alpha,beta segments
+        assert index.lookup("10.0.0.0/15") == "alpha"
+        assert index.lookup("10.0.0.0/8") == "alpha"
+        assert index.lookup("192.168.0.0/22") == ""
+        assert index.lookup("2001:db8:1::/48") == "gamma-v6"
+        assert index.lookup("2001:db8::/31") == ""
+
+    def test_network_wider_than_list(self, tmp_path):
+        build_dir = tmp_path / "build"
+        build_dir.mkdir()
+        (build_dir / "small.txt").write_text("10.0.0.0/24\n")
+        index = TrustedIndex.from_build_dir(str(build_dir))
+        assert index.lookup("10.0.0.0/8") == ""
+        assert index.lookup("10.0.0.0/25") == "small"
+
+    def test_adjacent_ranges_of_one_list(self, tmp_path):
+        build_dir = tmp_path / "build"
+        build_dir.mkdir()
+        (build_dir / "a.txt").write_text("10.0.0.0/25\n10.0.0.128/25\n")
+        index = TrustedIndex.from_build_dir(str(build_dir))
+        assert index.families[4].labels == ["", "a", ""]
+
+    def test_lookup_lines(self, tmp_path):
+        write_lists(tmp_path / "build")
+        index = TrustedIndex(load_build_lists(str(tmp_path / "build")))
+        lines = list(index.lookup_lines(["10.1.0.1\n", "\n", "01.2.3.4\n", "2001:db8::5\n"]))
+        assert lines == ["10.1.0.1\talpha,beta\n", "01.2.3.4\t\n", "2001:db8::5\tgamma-v6\n"]
+
+
+class TestLookupCommand:
+    def test_arguments(self, tmp_path, capsys):
+        write_lists(tmp_path / "build")
+        status = main(["lookup", "--build-dir", str(tmp_path / "build"), "10.1.0.1", "8.8.8.8"])
+        assert status == 0
+        assert capsys.readouterr().out == "10.1.0.1\talpha,beta\n8.8.8.8\t\n"
+
+    def test_network_wider_than_list(self, tmp_path, capsys):
+        build_dir = tmp_path / "build"
+        build_dir.mkdir()
+        (build_dir / "small.txt").write_text("10.0.0.0/24\n")
+        assert main(["lookup", "--build-dir", str(build_dir), "10.0.0.0/8"]) == 1
+        assert capsys.readouterr().out == "10.0.0.0/8\t\n"
+
+    def test_stdin_no_match(self, tmp_path, capsys, monkeypatch):
+        write_lists(tmp_path / "build")
+        monkeypatch.setattr(sys, "stdin", ["8.8.8.8\n"])
+        assert main(["lookup", "--build-dir", str(tmp_path / "build")]) == 1
+        assert capsys.readouterr().out == "8.8.8.8\t\n"
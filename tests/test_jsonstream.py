@@ -0,0 +1,90 @@
+"""Tests for incremental JSON extraction."""
+import json
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+import responses
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import build
+from trusted_lists.jsonstream import iter_json_items
+
+DOC = {
+    "syncToken": "1700000000",
+    "createDate": "2026-10-17-00-00-00",
+    "prefixes": [
+        {"ip_prefix": "3.5.140.0/22", "region": "ap-northeast-2", "service": "AMAZON"},
+        {"ip_prefix": "13.34.37.64/27", "region": "ap-southeast-4", "service": "AMAZON"},
+    ],
+    "ipv6_prefixes": [
+        {"ipv6_prefix": "2600:1f14::/35", "region": "us-west-2", "service": "EC2"},
+    ],
+    "nested": {"values": [1, -2.5e3, True, None, "x\"]}", [], {}]},
+}
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestIterJsonItems:
+    @pytest.mark.parametrize("indent", [None, 2])
+    @pytest.mark.parametrize("size", [1, 2, 5, 64, 100000])
+    def test_matches_in_memory_lookup(self, indent, size):
+        chunks = chunked(json.dumps(DOC, indent=indent), size)
+        assert list(iter_json_items(chunks, ["prefixes"])) == DOC["prefixes"]
+        assert list(iter_json_items(chunks, ["nested.values"])) == DOC["nested"]["values"]
+        assert list(iter_json_items(chunks, ["syncToken"])) == ["1700000000"]
+
+    def test_multiple_selectors_in_document_order(self):
+        chunks = chunked(json.dumps(DOC), 7)
+        items = list(iter_json_items(chunks, ["ipv6_prefixes", "prefixes"]))
+        assert items == DOC["prefixes"] + DOC["ipv6_prefixes"]
+
+    def test_missing_selector(self):
+        with pytest.raises(KeyError):
+            list(iter_json_items([json.dumps(DOC)], ["prefixes", "missing"]))
+
+    def test_truncated_document(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_items([json.dumps(DOC)[:40]], ["prefixes"]))
+
+    def test_memory_bounded_by_item(self):
+        doc = {"prefixes": [{"ip_prefix": f"10.{i // 256 % 256}.{i % 256}.0/24",
+                             "region": "us-east-1", "service": "AMAZON"}
+                            for i in range(20000)],
+               "ipv6_prefixes": [{"ipv6_prefix": "2600::/32"}] * 20000}
+        text = json.dumps(doc)
+
+        def chunks():
+            for i in range(0, len(text), 65536):
+                yield text[i:i + 65536]
+
+        tracemalloc.start()
+        count = sum(1 for _ in iter_json_items(chunks(), ["prefixes"]))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert count == 20000
+        assert len(text) > 2_000_000
+        assert peak < 512 * 1024
+
+
+class TestStreamedBuild:
+    @responses.activate
+    def test_json_stream_list(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("build")
+        url = "http://example.com/ip-ranges.json"
+        responses.add(responses.GET, url, body=json.dumps(DOC), content_type="application/json")
+        build({"aws": {"url": url, "json_stream": True,
+                       "json_selector": ["prefixes", "ipv6_prefixes"],
+                       "json_value_keys": ["ip_prefix", "ipv6_prefix"]}}, workers=1)
+        with open("build/aws-v4.txt") as f:
+            assert f.read() == "3.5.140.0/22\n13.34.37.64/27\n"
+        with open("build/aws-v6.txt") as f:
+            assert f.read() == "2600:1f14::/35\n"
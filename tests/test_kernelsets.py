@@ -0,0 +1,111 @@
+"""Tests for the nft interval-set and ipset restore outputs."""
+import sys
+from ipaddress import ip_network
+from pathlib import Path
+
+import pytest
+import yaml
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import write_ipset_files
+from trusted_lists.ipset import set_options, temporary_name, write_ipset_restore
+from trusted_lists.nft import write_nft
+
+
+class TestNft:
+    def test_script_replaces_set_in_one_transaction(self, tmp_path):
+        path = tmp_path / "a.nft"
+        write_nft(path, "a", 4, [(0x01020300, 0x010203FF), (0x05000000, 0x05000002)], "A")
+        assert path.read_text() == (
+            "# A\n"
+            "table inet trusted_lists {\n}\n"
+            "add set inet trusted_lists a { type ipv4_addr; flags interval; auto-merge; }\n"
+            "flush set inet trusted_lists a\n"
+            "add element inet trusted_lists a {\n"
+            "    1.2.3.0/24, 5.0.0.0-5.0.0.2\n"
+            "}\n"
+        )
+
+    def test_ipv6_and_line_wrapping(self, tmp_path):
+        path = tmp_path / "a-v6.nft"
+        start = 0x20010db8 << 96
+        size = 1 << 80
+        intervals = [(start + i * size, start + (i + 1) * size - 1) for i in range(0, 20, 2)]
+        write_nft(path, "a-v6", 6, intervals)
+        text = path.read_text()
+        assert "type ipv6_addr;" in text
+        assert "    2001:db8::/48, 2001:db8:2::/48," in text
+        assert "\n    2001:db8:10::/48, 2001:db8:12::/48\n}\n" in text
+
+
+class TestSetOptions:
+    def test_small_set(self):
+        assert set_options(10) == {"hashsize": 64, "maxelem": 65536}
+
+    def test_hashsize_fits_entries_and_headroom(self):
+        assert set_options(1000) == {"hashsize": 2048, "maxelem": 65536}
+        assert set_options(1000, 0) == {"hashsize": 1024, "maxelem": 65536}
+        assert set_options(1025, 0)["hashsize"] == 2048
+
+    def test_maxelem_grows_past_kernel_default(self):
+        assert set_options(80000) == {"hashsize": 131072, "maxelem": 100000}
+
+    def test_negative_headroom(self):
+        with pytest.raises(ValueError):
+            set_options(10, -0.5)
+
+
+class TestIpsetRestore:
+    def test_load_into_temporary_set_and_swap(self, tmp_path):
+        path = tmp_path / "a.ipset"
+        write_ipset_restore(path, "a", "inet", ["1.2.3.0/24", "5.6.7.8/32"], set_options(2))
+        assert path.read_text() == (
+            "create a-tmp-646b93 hash:net family inet hashsize 64 maxelem 65536 -exist\n"
+            "flush a-tmp-646b93\n"
+            "add a-tmp-646b93 1.2.3.0/24\n"
+            "add a-tmp-646b93 5.6.7.8/32\n"
+            "swap a-tmp-646b93 a\n"
+            "destroy a-tmp-646b93\n"
+        )
+
+    def test_maxelem_fits_entries(self, tmp_path):
+        path = tmp_path / "big.ipset"
+        write_ipset_restore(path, "big", "inet6", [], set_options(100000, 0))
+        assert path.read_text().startswith(
+            "create big-tmp-097405 hash:net family inet6 hashsize 131072 maxelem 100000 -exist\n")
+
+    def test_temporary_name_length(self):
+        name = temporary_name("x" * 40, "inet", set_options(10))
+        assert len(name) == 31 and name.startswith("x" * 20 + "-tmp-")
+
+    def test_temporary_name_follows_set_type(self):
+        # A set left by an aborted load with other options is never reused
+        names = {temporary_name("a", "inet", set_options(10)),
+                 temporary_name("a", "inet", set_options(1000)),
+                 temporary_name("a", "inet6", set_options(10))}
+        assert len(names) == 3
+        assert temporary_name("a", "inet", set_options(10)) == temporary_name(
+            "a", "inet", set_options(11))
+
+
+class TestWriteIpsetFiles:
+    def test_outputs_written(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        networks = [ip_network("10.0.0.0/25"), ip_network("10.0.0.128/25")]
+        write_ipset_files("acl", networks, "inet", "ACL", {})
+        assert "    10.0.0.0/24\n" in (tmp_path / "build" / "acl.nft").read_text()
+        assert "add acl-tmp-646b93 10.0.0.0/24\n" in (tmp_path / "build" / "acl.ipset").read_text()
+
+    def test_sizing_in_xml_and_yml(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        networks = [ip_network(f"10.0.{i}.0/24") for i in range(0, 200, 2)]
+        write_ipset_files("acl", networks, "inet", "ACL", {'ipset_headroom': 1})
+        xml = (tmp_path / "build" / "acl.xml").read_text()
+        assert '<option name="hashsize" value="256"/>' in xml
+        assert '<option name="maxelem" value="65536"/>' in xml
+        yml = yaml.safe_load((tmp_path / "build" / "acl.yml").read_text())
+        assert (yml["hashsize"], yml["maxelem"], yml["ipset_headroom"]) == (256, 65536, 1)
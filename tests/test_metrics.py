@@ -0,0 +1,78 @@
+"""Tests for run metrics and their exports."""
+import json
+import os
+import sys
+from pathlib import Path
+
+import responses
+import yaml
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import main
+from trusted_lists.metrics import NullMetrics, RunMetrics, get_metrics
+
+URL = "http://example.com/ips.txt"
+
+
+class TestRunMetrics:
+    def test_stage_accumulates(self):
+        metrics = RunMetrics()
+        with metrics.stage("a", "parse"):
+            pass
+        with metrics.stage("a", "parse"):
+            pass
+        assert metrics.sources["a"]["parse_seconds"] >= 0
+
+    def test_counts_only_for_active_source(self):
+        metrics = RunMetrics()
+        metrics.count_parse(5, 1)
+        metrics.begin_source("a")
+        metrics.count_parse(5, 2)
+        metrics.end_source()
+        assert metrics.sources["a"]["tokens"] == 5
+        assert metrics.sources["a"]["networks"] == 2
+
+    def test_prometheus_escaping(self):
+        metrics = RunMetrics()
+        metrics.record_fetch(['we"ird'], 0.5, 200, 10)
+        lines = metrics.prometheus_lines()
+        assert 'trusted_lists_fetch_seconds{list="we\\"ird"} 0.5' in lines
+
+    def test_disabled_by_default(self):
+        assert isinstance(get_metrics(), NullMetrics)
+        assert not get_metrics().enabled
+
+
+class TestBuildMetrics:
+    @responses.activate
+    def test_build_writes_reports(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("build")
+        with open("trusted.yml", "w") as f:
+            yaml.dump({"example": {"url": URL}}, f)
+        responses.add(responses.GET, URL, body="1.2.3.0/24\njunk\n5.6.7.8\n",
+                      content_type="text/plain")
+
+        assert main(["build", "--no-cache", "--metrics-json", "run.json",
+                     "--metrics-prom", "run.prom"]) == 0
+
+        with open("run.json") as f:
+            report = json.load(f)
+        source = report["sources"]["example"]
+        assert source["status"] == 200
+        assert source["bytes"] == len("1.2.3.0/24\njunk\n5.6.7.8\n")
+        assert source["tokens"] == 3
+        assert source["networks"] == 2
+        output = source["outputs"]["example"]
+        assert output["entries"] == 2
+        assert set(output["write_seconds"]) == {
+            "txt", "xml", "yml", "delta", "idx", "nginx", "nft", "ipset"}
+
+        with open("run.prom") as f:
+            prom = f.read()
+        assert 'trusted_lists_http_status{list="example"} 200' in prom
+        assert 'trusted_lists_output_entries{list="example",output="example"} 2' in prom
+        assert "# TYPE trusted_lists_write_seconds gauge" in prom
+        assert isinstance(get_metrics(), NullMetrics)
@@ -0,0 +1,71 @@
+"""Tests for the NetworkSet container."""
+import random
+import sys
+from ipaddress import IPv4Network, IPv6Network
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from trusted_lists.netset import NetworkSet, range_to_cidrs
+
+
+class TestNetworkSet:
+    def test_dedups_and_sorts(self):
+        networks = NetworkSet(4)
+        for s in ["192.168.0.0/16", "10.0.0.0/8", "10.0.0.0/8", "1.2.3.4/32"]:
+            networks.append(IPv4Network(s))
+        assert len(networks) == 3
+        assert list(networks.cidrs()) == ["1.2.3.4/32", "10.0.0.0/8", "192.168.0.0/16"]
+
+    def test_order_matches_ipaddress(self):
+        rng = random.Random(42)
+        networks = []
+        for _ in range(2000):
+            prefixlen = rng.randint(16, 32)
+            address = rng.getrandbits(32) & (0xffffffff << (32 - prefixlen)) & 0xffffffff
+            networks.append(IPv4Network((address, prefixlen)))
+        # Same start, different sizes
+        networks += [IPv4Network("10.0.0.0/24"), IPv4Network("10.0.0.0/25")]
+        expected = [str(n) for n in sorted(set(networks))]
+        assert list(NetworkSet(4, networks).cidrs()) == expected
+
+    def test_ipv6_rendering_matches_ipaddress(self):
+        strings = ["2001:db8::/32", "::ffff:0:0/96", "fe80::/10", "2001:db8:0:1::/64", "::/0"]
+        networks = [IPv6Network(s) for s in strings]
+        expected = [str(n) for n in sorted(networks)]
+        assert list(NetworkSet(6, networks).cidrs()) == expected
+
+    def test_iter_yields_network_objects(self):
+        networks = NetworkSet(6, [IPv6Network("2001:db8::/32")])
+        assert list(networks) == [IPv6Network("2001:db8::/32")]
+
+    def test_wrong_family_rejected(self):
+        with pytest.raises(ValueError):
+            NetworkSet(4).append(IPv6Network("::/0"))
+
+    def test_host_bits_rejected(self):
+        with pytest.raises(ValueError):
+            NetworkSet(4).add_prefix(0x0a000001, 24)
+
+    def test_compact_storage(self):
+        networks = NetworkSet(4)
+        for i in range(1000):
+            networks.add_prefix(i << 8, 24)
+        assert len(networks._buf) == 8000
+
+    def test_for_family(self):
+        assert NetworkSet.for_family("inet6").version == 6
+
+
+class TestRangeToCidrs:
+    def test_aligned_range(self):
+        assert list(range_to_cidrs(0x0a000000, 0x0a0000ff, 32)) == [(0x0a000000, 24)]
+
+    def test_unaligned_range(self):
+        assert list(range_to_cidrs(1, 6, 32)) == [(1, 32), (2, 31), (4, 31), (6, 32)]
+
+    def test_whole_space(self):
+        assert list(range_to_cidrs(0, 2 ** 32 - 1, 32)) == [(0, 0)]
@@ -0,0 +1,93 @@
+"""Tests for the nginx geo and realip outputs."""
+import sys
+from ipaddress import ip_network
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import write_ipset_files
+from trusted_lists.nginx import variable_name, write_combined_geo, write_geo, write_realip
+
+
+class TestVariableName:
+    def test_dashes_become_underscores(self):
+        assert variable_name("googlebot-v4") == "trusted_googlebot_v4"
+        assert variable_name("openai.gptbot") == "trusted_openai_gptbot"
+
+
+class TestGeo:
+    def test_ipv4_ranges(self, tmp_path):
+        path = tmp_path / "a.geo.conf"
+        write_geo(path, "a", 4, [(0x01020300, 0x010204FF), (0x08080808, 0x08080808)], "A list")
+        assert path.read_text() == (
+            "# A list\n"
+            "geo $trusted_a {\n"
+            "    ranges;\n"
+            "    default 0;\n"
+            "    1.2.3.0-1.2.4.255 1;\n"
+            "    8.8.8.8-8.8.8.8 1;\n"
+            "}\n"
+        )
+
+    def test_ipv6_cidrs(self, tmp_path):
+        path = tmp_path / "a-v6.geo.conf"
+        start = 0x20010db8 << 96
+        write_geo(path, "a-v6", 6, [(start, start + (1 << 80) * 3 - 1)])
+        assert path.read_text() == (
+            "geo $trusted_a_v6 {\n"
+            "    default 0;\n"
+            "    2001:db8::/47 1;\n"
+            "    2001:db8:2::/48 1;\n"
+            "}\n"
+        )
+
+    def test_realip(self, tmp_path):
+        path = tmp_path / "cdn.realip.conf"
+        write_realip(path, ["173.245.48.0/20", "2400:cb00::/32"])
+        assert path.read_text() == ("set_real_ip_from 173.245.48.0/20;\n"
+                                    "set_real_ip_from 2400:cb00::/32;\n")
+
+
+class TestWriteIpsetFiles:
+    def test_geo_written_for_every_list(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        networks = [ip_network(n) for n in ("10.0.0.0/25", "10.0.0.128/25", "10.0.2.0/24")]
+        write_ipset_files("acl", networks, "inet", "ACL", {})
+        geo = (tmp_path / "build" / "acl.geo.conf").read_text()
+        assert "    10.0.0.0-10.0.0.255 1;\n    10.0.2.0-10.0.2.255 1;\n" in geo
+        assert not (tmp_path / "build" / "acl.realip.conf").exists()
+
+    def test_realip_for_cdn_lists(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        write_ipset_files("cdn", [ip_network("173.245.48.0/20")], "inet", "CDN",
+                          {'nginx_realip': True})
+        assert (tmp_path / "build" / "cdn.realip.conf").read_text() == (
+            "# CDN\nset_real_ip_from 173.245.48.0/20;\n")
+
+
+class TestCombinedGeo:
+    def test_overlapping_lists_yield_all_names(self, tmp_path):
+        (tmp_path / "a.txt").write_text("10.0.0.0/24\n2001:db8::/32\n")
+        (tmp_path / "b.txt").write_text("10.0.0.128/25\n10.0.1.0/24\n")
+        path = write_combined_geo(str(tmp_path))
+        assert Path(path).read_text() == (
+            "geo $trusted_lists_v4 {\n"
+            "    ranges;\n"
+            '    default "";\n'
+            '    10.0.0.0-10.0.0.127 "a";\n'
+            '    10.0.0.128-10.0.0.255 "a,b";\n'
+            '    10.0.1.0-10.0.1.255 "b";\n'
+            "}\n"
+            "geo $trusted_lists_v6 {\n"
+            '    default "";\n'
+            '    2001:db8::/32 "a";\n'
+            "}\n"
+        )
+
+    def test_segment_up_to_last_address(self, tmp_path):
+        (tmp_path / "all.txt").write_text("255.255.255.0/24\n")
+        path = write_combined_geo(str(tmp_path))
+        assert '    255.255.255.0-255.255.255.255 "all";\n' in Path(path).read_text()
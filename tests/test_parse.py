@@ -0,0 +1,75 @@
+"""Tests for the fast-path network parser."""
+import random
+import sys
+from ipaddress import IPv4Network, IPv6Network
+from pathlib import Path
+
+import pytest
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from trusted_lists.netset import NetworkSet
+from trusted_lists.parse import add_networks, parse_network, parse_networks
+
+
+def reference_parse(token):
+    """Acceptance rules of the original try_add_ip_or_range."""
+    if not token or not token.strip():
+        return None
+    token = token.strip()
+    for cls in (IPv4Network, IPv6Network):
+        try:
+            network = cls(token)
+        except ValueError:
+            continue
+        return network.version, int(network.network_address), network.prefixlen
+    return None
+
+
+TOKENS = [
+    "1.2.3.4", "1.2.3.4/32", "1.2.3.0/24", "1.2.3.4/24", "10.0.0.0/8", "0.0.0.0/0",
+    "255.255.255.255", "256.1.1.1", "1.2.3", "1.2.3.4.5", "01.2.3.4", "1.2.3.04",
+    "1.2.3.0/", "1.2.3.0//24", "1.2.3.0/33", "1.2.3.0/024", "1.2.3.0/255.255.255.0",
+    "1.2.3.0/0.0.0.255", "1.2.3.0/255.0.255.0", "1..2.3", ".1.2.3", "1.2.3.4/ 24",
+    "  1.2.3.4  ", "1.2.3.4\t", "", "   ", "12345", "/24", "...",
+    "2001:db8::/32", "2001:db8::1/32", "::1", "::", "::/0", "fe80::1%eth0",
+    "::ffff:1.2.3.4", "::ffff:1.2.3.0/120", "2001:DB8::/32", "2001:db8:::/32",
+    "Note:", "https://example.com", "gggg::1", "1:2:3:4:5:6:7:8:9", "::1/129",
+    "IPv4", "Server IPs: 1.2.3.4", "١.٢.٣.٤", "1.2.3.4/3２",
+]
+
+
+class TestParseNetwork:
+    @pytest.mark.parametrize("token", TOKENS)
+    def test_matches_ipaddress(self, token):
+        assert parse_network(token) == reference_parse(token)
+
+    def test_random_tokens_match_ipaddress(self):
+        rng = random.Random(7)
+        alphabet = "0123456789./:abcdefx "
+        for _ in range(5000):
+            token = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 16)))
+            assert parse_network(token) == reference_parse(token), token
+
+    def test_none(self):
+        assert parse_network(None) is None
+
+
+class TestBatchApi:
+    def test_parse_networks_skips_junk(self):
+        parsed = list(parse_networks(["junk", "1.2.3.0/24", "::1"]))
+        assert parsed == [(4, 0x01020300, 24), (6, 1, 128)]
+
+    def test_add_networks_to_networksets(self):
+        ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+        count = add_networks(["1.2.3.0/24", "x", "2001:db8::/32"], ipv4, ipv6)
+        assert count == 2
+        assert list(ipv4.cidrs()) == ["1.2.3.0/24"]
+        assert list(ipv6.cidrs()) == ["2001:db8::/32"]
+
+    def test_add_networks_to_lists(self):
+        ipv4, ipv6 = [], []
+        add_networks(["1.2.3.0/24", "2001:db8::/32"], ipv4, ipv6)
+        assert ipv4 == [IPv4Network("1.2.3.0/24")]
+        assert ipv6 == [IPv6Network("2001:db8::/32")]
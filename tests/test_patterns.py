@@ -0,0 +1,95 @@
+"""Tests for regex extraction with named and cached patterns."""
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import extract_from_response, extract_with_regex
+from trusted_lists.netset import NetworkSet
+from trusted_lists.patterns import compile_pattern, iter_matches
+
+YANDEX_PAGE = """<html><body><h1>Yandex IP addresses</h1>
+<p>Our robots use 5.45.192.0/18, 77.88.0.0/18 and 2a02:6b8::/29.</p>
+<p>Also 2001:db8:0:0:1::/80; not 1.2.3.4, 300.1.1.1.1/24, v1.2.3.4/8 or deadbeef/12.</p>
+</body></html>"""
+
+OLD_YANDEX_REGEX = r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}/\d{1,2}|[0-9a-fA-F:]+::/\d{1,3})'
+
+
+class Response:
+    def __init__(self, text, content_type='text/html'):
+        self.text = text
+        self.headers = {'content-type': content_type}
+
+
+class TestNamedPatterns:
+    def test_ipv4_cidr(self):
+        # "v1.2.3.4/8" is a candidate; the parser rejects it for its host bits
+        assert list(iter_matches(YANDEX_PAGE, 'ipv4-cidr')) == ['5.45.192.0/18', '77.88.0.0/18',
+                                                               '1.2.3.4/8']
+
+    def test_ipv6_cidr(self):
+        assert list(iter_matches(YANDEX_PAGE, 'ipv6-cidr')) == ['2a02:6b8::/29',
+                                                               '2001:db8:0:0:1::/80']
+
+    def test_any_cidr_extracts_both_families(self):
+        ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+        extract_with_regex(YANDEX_PAGE, 'any-cidr', ipv4, ipv6)
+        assert list(ipv4.cidrs()) == ['5.45.192.0/18', '77.88.0.0/18']
+        assert list(ipv6.cidrs()) == ['2001:db8:0:0:1::/80', '2a02:6b8::/29']
+
+    def test_any_cidr_finds_what_the_old_yandex_regex_found(self):
+        text = ("and:5.45.192.0/18 abc77.88.0.0/18 x/37.9.64.0/18,87.250.224.0/19;"
+                "\nIPv6 2a02:6b8::/29 (2a0e:fd80::/29)")
+
+        def networks(regex):
+            ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+            extract_with_regex(text, regex, ipv4, ipv6)
+            return list(ipv4.cidrs()) + list(ipv6.cidrs())
+
+        old = networks(OLD_YANDEX_REGEX)
+        assert old == ['5.45.192.0/18', '37.9.64.0/18', '77.88.0.0/18', '87.250.224.0/19',
+                       '2a02:6b8::/29', '2a0e:fd80::/29']
+        assert networks('any-cidr') == old
+
+    def test_no_catastrophic_backtracking(self):
+        text = "a:" * 50000 + "1." * 50000
+        start = time.perf_counter()
+        for name in ('ipv4-cidr', 'ipv6-cidr', 'any-cidr'):
+            assert list(iter_matches(text, name)) == []
+        assert time.perf_counter() - start < 1
+
+
+class TestCustomPatterns:
+    def test_whole_match_without_groups(self):
+        assert list(iter_matches("a 1.2.3.4 b", r'\d+\.\d+\.\d+\.\d+')) == ['1.2.3.4']
+
+    def test_single_group(self):
+        assert list(iter_matches("ip=1.2.3.4;", r'ip=([\d.]+)')) == ['1.2.3.4']
+
+    def test_several_groups_give_one_token_each(self):
+        pattern = r'v4=([\d./]+)|v6=([0-9a-f:/]+)'
+        assert list(iter_matches("v4=1.2.3.0/24 v6=2001:db8::/32", pattern)) == [
+            '1.2.3.0/24', '2001:db8::/32']
+
+    def test_compiled_once(self):
+        assert compile_pattern(r'(\d+)') is compile_pattern(r'(\d+)')
+        assert compile_pattern('any-cidr').pattern != 'any-cidr'
+
+
+class TestHtmlSelector:
+    def test_elements_scanned_in_one_pass(self):
+        page = "<ul><li>1.2.3.0/24</li><li>5.6.7.0/24</li></ul><p>9.9.9.0/24</p>"
+        ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+        extract_from_response({'regex': 'ipv4-cidr', 'html_selector': 'li'}, Response(page),
+                              ipv4, ipv6)
+        assert list(ipv4.cidrs()) == ['1.2.3.0/24', '5.6.7.0/24']
+
+    def test_matches_do_not_span_elements(self):
+        page = "<ul><li>1.2.3.0</li><li>/24</li></ul>"
+        ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+        extract_from_response({'regex': 'ipv4-cidr', 'html_selector': 'li'}, Response(page),
+                              ipv4, ipv6)
+        assert not ipv4
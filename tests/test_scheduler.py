@@ -0,0 +1,129 @@
+"""Tests for the refresh scheduler and daemon cycles."""
+import random
+import sys
+from pathlib import Path
+
+import pytest
+import responses
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import daemon_cycle, run_publish_hook
+from trusted_lists.scheduler import (
+    RETRY_INTERVAL,
+    Scheduler,
+    changed_outputs,
+    output_digests,
+    parse_interval,
+)
+
+
+class TestParseInterval:
+    def test_units(self):
+        assert parse_interval(90) == 90
+        assert parse_interval("90") == 90
+        assert parse_interval("15m") == 900
+        assert parse_interval("1.5h") == 5400
+        assert parse_interval("1d") == 86400
+
+    @pytest.mark.parametrize("value", ["", "soon", "10w", 0, "-5m", True])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError):
+            parse_interval(value)
+
+
+class TestScheduler:
+    lists = {"fast": {"refresh": "15m"}, "slow": {"refresh": "1d"}, "default": {}}
+
+    def test_everything_due_on_start(self):
+        scheduler = Scheduler(self.lists, default_refresh="6h")
+        assert scheduler.due(0) == ["fast", "slow", "default"]
+
+    def test_each_list_on_its_own_interval(self):
+        scheduler = Scheduler(self.lists, default_refresh="6h", jitter=0)
+        for name in scheduler.due(0):
+            scheduler.schedule(name, 0)
+        assert scheduler.due(899) == []
+        assert scheduler.due(900) == ["fast"]
+        assert scheduler.due(6 * 3600) == ["fast", "default"]
+        assert scheduler.next_due() == 900
+
+    def test_jitter_spreads_runs(self):
+        scheduler = Scheduler(self.lists, jitter=0.1, rng=random.Random(1))
+        scheduler.schedule("slow", 0)
+        assert 0.9 * 86400 <= scheduler.next_run["slow"] <= 1.1 * 86400
+        assert scheduler.next_run["slow"] != 86400
+
+    def test_failed_list_retried_sooner(self):
+        scheduler = Scheduler(dict(self.lists, rapid={"refresh": "2m"}), jitter=0)
+        scheduler.schedule("slow", 0, failed=True)
+        scheduler.schedule("rapid", 0, failed=True)
+        assert scheduler.next_run["slow"] == RETRY_INTERVAL
+        assert scheduler.next_run["rapid"] == 120
+
+
+class TestChangedOutputs:
+    def test_changes_additions_and_removals(self, tmp_path):
+        (tmp_path / "a.txt").write_text("192.0.2.0/24\n")
+        (tmp_path / "b.txt").write_text("198.51.100.0/24\n")
+        before = output_digests(str(tmp_path))
+        (tmp_path / "a.txt").write_text("192.0.2.0/25\n")
+        (tmp_path / "b.txt").write_text("198.51.100.0/24\n")
+        (tmp_path / "c.txt").write_text("203.0.113.0/24\n")
+        assert changed_outputs(before, output_digests(str(tmp_path))) == ["a", "c"]
+
+
+class TestDaemonCycle:
+    @responses.activate
+    def test_only_due_lists_rebuilt_and_changes_reported(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        responses.add(responses.GET, "http://example.com/fast.txt", body="192.0.2.0/24\n",
+                      content_type="text/plain")
+        responses.add(responses.GET, "http://example.com/slow.txt", body="198.51.100.0/24\n",
+                      content_type="text/plain")
+        lists = {"fast": {"url": "http://example.com/fast.txt", "refresh": "15m"},
+                 "slow": {"url": "http://example.com/slow.txt", "refresh": "1d"}}
+        scheduler = Scheduler(lists, jitter=0)
+
+        assert daemon_cycle(lists, scheduler, 0) == ["fast", "slow"]
+        assert daemon_cycle(lists, scheduler, 60) == []
+        assert len(responses.calls) == 2
+        # Due again, but the upstream did not change
+        assert daemon_cycle(lists, scheduler, 900) == []
+        assert [call.request.url for call in responses.calls[2:]] == [
+            "http://example.com/fast.txt"]
+
+        responses.replace(responses.GET, "http://example.com/fast.txt",
+                          body="192.0.2.0/25\n", content_type="text/plain")
+        assert daemon_cycle(lists, scheduler, 1800) == ["fast"]
+
+
+class TestPublishHook:
+    def test_changed_outputs_in_environment(self, tmp_path):
+        log = tmp_path / "hook.log"
+        assert run_publish_hook(f'echo "$TRUSTED_LISTS_CHANGED" > {log}', ["a", "b-v6"])
+        assert log.read_text() == "a,b-v6\n"
+
+    def test_failure_reported(self):
+        assert not run_publish_hook("exit 3", ["a"])
+
+    @responses.activate
+    def test_parse_error_keeps_daemon_running(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "build").mkdir()
+        (tmp_path / "build" / "broken.txt").write_text("192.0.2.0/24\n")
+        responses.add(responses.GET, "http://example.com/broken.json", json={"renamed": []})
+        responses.add(responses.GET, "http://example.com/ok.txt", body="198.51.100.0/24\n",
+                      content_type="text/plain")
+        lists = {"broken": {"url": "http://example.com/broken.json",
+                            "json_selector": "prefixes", "refresh": "1d"},
+                 "ok": {"url": "http://example.com/ok.txt", "refresh": "1d"}}
+        scheduler = Scheduler(lists, jitter=0)
+
+        assert daemon_cycle(lists, scheduler, 0) == ["ok"]
+        assert "Failed: broken (KeyError: 'prefixes')" in capsys.readouterr().err
+        assert (tmp_path / "build" / "broken.txt").read_text() == "192.0.2.0/24\n"
+        assert (tmp_path / "build" / "trusted-lists.idx").exists()
+        assert scheduler.next_run == {"broken": RETRY_INTERVAL, "ok": 86400}
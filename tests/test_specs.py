@@ -0,0 +1,74 @@
+"""Tests for batch RPM spec rendering."""
+import sys
+from pathlib import Path
+
+import yaml
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from generate import main
+from trusted_lists.specs import render_specs, spec_version
+
+TEMPLATE = str(Path(__file__).parent.parent / "src" / "ipset.spec.j2")
+
+
+def write_list(build_dir, name, xml, description="A list"):
+    (build_dir / f"{name}.xml").write_text(xml)
+    (build_dir / f"{name}.added").write_text("# base sha256:none\n")
+    (build_dir / f"{name}.removed").write_text("# base sha256:none\n")
+    with open(build_dir / f"{name}.yml", "w") as f:
+        yaml.dump({"name": name, "description": description,
+                   "url": "https://example.com/ips.txt"}, f)
+
+
+class TestRenderSpecs:
+    def setup_dirs(self, tmp_path):
+        build_dir, out_dir = tmp_path / "build", tmp_path / "specs"
+        build_dir.mkdir()
+        out_dir.mkdir()
+        write_list(build_dir, "a", "<ipset>a</ipset>\n")
+        write_list(build_dir, "b", "<ipset>b</ipset>\n")
+        return build_dir, out_dir
+
+    def render(self, build_dir, out_dir, version):
+        return render_specs(str(build_dir), str(out_dir), version, TEMPLATE)
+
+    def test_first_render(self, tmp_path):
+        build_dir, out_dir = self.setup_dirs(tmp_path)
+        packages = self.render(build_dir, out_dir, "20250101")
+        assert packages == ["firewalld-ipset-a", "firewalld-ipset-b"]
+        spec = (out_dir / "firewalld-ipset-a.spec").read_text()
+        assert "%global ipset_name a\n" in spec
+        assert spec_version(spec) == "20250101"
+        assert spec.endswith("# no changelog\n")
+        assert (out_dir / "a.xml").read_text() == "<ipset>a</ipset>\n"
+        assert (out_dir / "a.removed").exists()
+        assert "%dir %{_datadir}/%{name}\n" in spec
+
+    def test_unchanged_lists_are_skipped(self, tmp_path):
+        build_dir, out_dir = self.setup_dirs(tmp_path)
+        self.render(build_dir, out_dir, "20250101")
+        assert self.render(build_dir, out_dir, "20250102") == []
+        assert spec_version((out_dir / "firewalld-ipset-a.spec").read_text()) == "20250101"
+
+    def test_changed_xml(self, tmp_path):
+        build_dir, out_dir = self.setup_dirs(tmp_path)
+        self.render(build_dir, out_dir, "20250101")
+        (build_dir / "b.xml").write_text("<ipset>b2</ipset>\n")
+        assert self.render(build_dir, out_dir, "20250102") == ["firewalld-ipset-b"]
+        assert spec_version((out_dir / "firewalld-ipset-b.spec").read_text()) == "20250102"
+        assert (out_dir / "b.xml").read_text() == "<ipset>b2</ipset>\n"
+
+    def test_changed_metadata(self, tmp_path):
+        build_dir, out_dir = self.setup_dirs(tmp_path)
+        self.render(build_dir, out_dir, "20250101")
+        write_list(build_dir, "a", "<ipset>a</ipset>\n", description="Renamed")
+        assert self.render(build_dir, out_dir, "20250102") == ["firewalld-ipset-a"]
+        assert "Summary:        Renamed\n" in (out_dir / "firewalld-ipset-a.spec").read_text()
+
+    def test_command_prints_packages(self, tmp_path, capsys):
+        build_dir, out_dir = self.setup_dirs(tmp_path)
+        assert main(["render-specs", "--build-dir", str(build_dir), "-o", str(out_dir),
+                     "--version", "1", "--template", TEMPLATE]) == 0
+        assert capsys.readouterr().out == "firewalld-ipset-a\nfirewalld-ipset-b\n"
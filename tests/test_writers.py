@@ -0,0 +1,81 @@
+"""Tests for the streaming output writers."""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+from lxml import etree
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from trusted_lists.files import atomic_open
+from trusted_lists.writers import write_outputs
+
+
+def tree_based_outputs(base_path, items, family, description, list_data):
+    """The former write_ipset_files serialization, used as reference."""
+    with open(f"{base_path}.txt", 'w') as f:
+        for item in items:
+            f.write(item + "\n")
+    root = etree.Element('ipset')
+    root.set('type', 'hash:net')
+    etree.SubElement(root, 'option').set('name', 'family')
+    root.find('option').set('value', family)
+    etree.SubElement(root, 'description').text = description
+    for item in items:
+        etree.SubElement(root, 'entry').text = item
+    root.getroottree().write(f"{base_path}.xml", xml_declaration=True, encoding="utf-8",
+                             pretty_print=True)
+    list_data = dict(list_data, items=list(items))
+    with open(f"{base_path}.yml", 'w') as f:
+        yaml.dump(list_data, f)
+
+
+CASES = [
+    (["10.0.0.0/8", "192.168.0.0/16"], "inet", "Plain & <simple> \"list\" é",
+     {"url": "http://example.com", "name": "a", "family": "inet"}),
+    (["::/0", "::1/128", "::ffff:0:0/96", "2001:db8::/32"], "inet6", "IPv6",
+     {"url": "http://example.com", "name": "b", "family": "inet6",
+      "json_selector": "prefixes", "json_value_keys": ["ipv6Prefix"]}),
+    (["1.2.3.4/32"], "inet", "Only after",
+     {"zz": "last", "name": "c", "family": "inet", "description": "D: x"}),
+]
+
+
+class TestWriteOutputs:
+    @pytest.mark.parametrize("items,family,description,list_data", CASES)
+    def test_byte_identical_to_tree_writer(self, tmp_path, items, family, description,
+                                           list_data):
+        write_outputs(str(tmp_path / "new"), iter(items), family, description, list_data)
+        tree_based_outputs(str(tmp_path / "old"), items, family, description, list_data)
+        for ext in ("txt", "xml", "yml"):
+            assert (tmp_path / f"new.{ext}").read_bytes() == \
+                (tmp_path / f"old.{ext}").read_bytes(), ext
+
+    def test_ipset_options(self, tmp_path):
+        write_outputs(str(tmp_path / "x"), iter(["1.2.3.4/32"]), "inet", "X", {"name": "x"},
+                      {"hashsize": 64, "maxelem": 65536})
+        assert (tmp_path / "x.xml").read_text().splitlines()[2:6] == [
+            '  <option name="family" value="inet"/>',
+            '  <option name="hashsize" value="64"/>',
+            '  <option name="maxelem" value="65536"/>',
+            '  <description>X</description>',
+        ]
+
+    def test_no_temp_files_left(self, tmp_path):
+        write_outputs(str(tmp_path / "x"), iter(["1.2.3.4/32"]), "inet", "X", {"name": "x"})
+        assert sorted(os.listdir(tmp_path)) == ["x.txt", "x.xml", "x.yml"]
+
+
+class TestAtomicOpen:
+    def test_failure_keeps_previous_file(self, tmp_path):
+        path = tmp_path / "out.txt"
+        path.write_text("old\n")
+        with pytest.raises(RuntimeError):
+            with atomic_open(str(path)) as f:
+                f.write("partial")
+                raise RuntimeError
+        assert path.read_text() == "old\n"
+        assert os.listdir(tmp_path) == ["out.txt"]
@@ -0,0 +1 @@
+"""Support modules for the trusted-lists generator (generate.py)."""
@@ -0,0 +1,86 @@
+"""CIDR aggregation of build outputs."""
+from trusted_lists.netset import NetworkSet, range_to_cidrs
+
+
+def merge_intervals(intervals):
+    """Merge sorted ``(start, end)`` pairs that overlap or touch."""
+    current_start = current_end = None
+    for start, end in intervals:
+        if current_end is not None and start <= current_end + 1:
+            if end > current_end:
+                current_end = end
+            continue
+        if current_end is not None:
+            yield current_start, current_end
+        current_start, current_end = start, end
+    if current_end is not None:
+        yield current_start, current_end
+
+
+def aggregate_networks(networks):
+    """Collapse a NetworkSet into the minimal equivalent set of CIDRs.
+
+    Overlapping and contained networks are dropped and adjacent ones merged,
+    so the result covers exactly the same addresses.
+    """
+    result = NetworkSet(networks.version)
+    for start, end in merge_intervals(networks.intervals()):
+        for network, prefixlen in range_to_cidrs(start, end, networks.bits):
+            result.add_prefix(network, prefixlen)
+    return result
+
+
+def prefix_histogram(networks):
+    """Return ``{prefixlen: count}`` of the CIDRs of a NetworkSet."""
+    histogram = {}
+    for _, prefixlen in networks.prefixes():
+        histogram[prefixlen] = histogram.get(prefixlen, 0) + 1
+    return dict(sorted(histogram.items()))
+
+
+def format_histogram(histogram):
+    """Render a prefix histogram as ``/19:2 /24:10``."""
+    return " ".join(f"/{prefixlen}:{count}" for prefixlen, count in histogram.items())
+
+
+def reduce_prefix_lengths(networks, growth_percent):
+    """Re-express a NetworkSet with fewer distinct prefix lengths.
+
+    The kernel's hash:net probes every distinct prefix length of a set on
+    each lookup, so fewer lengths mean fewer probes per packet. A /l CIDR
+    is replaced by ``2**(p - l)`` CIDRs of a longer allowed length p, which
+    covers exactly the same addresses. Like ``iprange --ipset-reduce``,
+    lengths are dropped greedily (cheapest first) while the entry count
+    stays within ``growth_percent`` percent of the original.
+
+    Returns the new set and the prefix histogram it has.
+    """
+    if growth_percent < 0:
+        raise ValueError(f"ipset_reduce must not be negative, got {growth_percent!r}")
+    histogram = prefix_histogram(networks)
+    total = sum(histogram.values())
+    budget = total + total * growth_percent // 100
+    counts = dict(histogram)
+    while len(counts) > 1:
+        lengths = list(counts)
+        # Cost of folding each length into the next longer one still allowed
+        cost, prefixlen = min((counts[length] * ((1 << (longer - length)) - 1), length)
+                              for length, longer in zip(lengths, lengths[1:]))
+        if total + cost > budget:
+            break
+        longer = lengths[lengths.index(prefixlen) + 1]
+        counts[longer] += counts.pop(prefixlen) << (longer - prefixlen)
+        total += cost
+
+    allowed = list(counts)
+    target = {}
+    for length in histogram:
+        target[length] = next(p for p in allowed if p >= length)
+    result = NetworkSet(networks.version)
+    bits = networks.bits
+    for network, prefixlen in networks.prefixes():
+        new_length = target[prefixlen]
+        step = 1 << (bits - new_length)
+        for i in range(1 << (new_length - prefixlen)):
+            result.add_prefix(network + i * step, new_length)
+    return result, counts
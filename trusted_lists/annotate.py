@@ -0,0 +1,165 @@
+"""Streaming access-log annotation by trusted-list membership.
+
+Log lines are processed as bytes, in fixed-size batches, so memory use does
+not depend on the size of the log and lines pass through unchanged even if
+they are not valid UTF-8. The client IP is taken from a whitespace-separated
+field (the first one in nginx/Apache common and combined formats) and looked
+up in a :class:`~trusted_lists.index.TrustedIndex` built from ``build/``.
+"""
+import fnmatch
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+from itertools import islice
+from multiprocessing import Pool
+
+from trusted_lists.index import TrustedIndex
+
+DEFAULT_BATCH_SIZE = 10000
+# Lookups are memoized per IP; the memo is cleared when it grows past this
+LOOKUP_CACHE_SIZE = 100000
+
+
+def open_log(path):
+    """Open a log file (``-`` for stdin, ``.gz`` decompressed) for binary reading."""
+    if path == '-':
+        return sys.stdin.buffer
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+class LogAnnotator:
+    """Annotate or filter log lines by the lists containing their client IP.
+
+    Without ``match``/``exclude`` patterns every line gets a TAB and the
+    comma-separated list names (``-`` if none) appended. With patterns
+    (shell-style, e.g. ``googlebot*``), lines are passed through unchanged
+    when one of their lists matches ``match`` and none matches ``exclude``.
+    """
+
+    def __init__(self, index, field=0, match=None, exclude=None,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        self.index = index
+        self.field = field
+        self.match = list(match or [])
+        self.exclude = list(exclude or [])
+        self.batch_size = batch_size
+        self.lines_in = 0
+        self.lines_out = 0
+        self._lookups = {}
+        self._decisions = {}
+
+    @property
+    def filtering(self):
+        return bool(self.match or self.exclude)
+
+    def _label(self, line):
+        fields = line.split(None, self.field + 1)
+        if len(fields) <= self.field:
+            return ""
+        ip = fields[self.field]
+        label = self._lookups.get(ip)
+        if label is None:
+            if len(self._lookups) >= LOOKUP_CACHE_SIZE:
+                self._lookups.clear()
+            label = self.index.lookup(ip.decode('ascii', 'replace')) or ""
+            self._lookups[ip] = label
+        return label
+
+    def _keep(self, label):
+        keep = self._decisions.get(label)
+        if keep is None:
+            names = label.split(",") if label else []
+
+            def matches(patterns):
+                return any(fnmatch.fnmatchcase(name, pattern)
+                           for name in names for pattern in patterns)
+
+            keep = (not self.match or matches(self.match)) and not matches(self.exclude)
+            self._decisions[label] = keep
+        return keep
+
+    def process_batch(self, lines):
+        """Return the output lines for one batch of input lines."""
+        label_of = self._label
+        if self.filtering:
+            keep = self._keep
+            out = [line for line in lines if keep(label_of(line))]
+        else:
+            out = []
+            for line in lines:
+                label = label_of(line) or "-"
+                out.append(b"%s\t%s\n" % (line.rstrip(b"\r\n"), label.encode()))
+        self.lines_in += len(lines)
+        self.lines_out += len(out)
+        return out
+
+    def process(self, stream, out):
+        """Annotate every line of a binary stream into a binary output."""
+        while True:
+            batch = list(islice(stream, self.batch_size))
+            if not batch:
+                break
+            out.writelines(self.process_batch(batch))
+
+
+_worker = None
+
+
+def _init_worker(build_dir, options):
+    global _worker
+    _worker = LogAnnotator(TrustedIndex.from_build_dir(build_dir), **options)
+
+
+def _annotate_to_tempfile(path):
+    """Pool task: annotate one log file into a temporary file."""
+    _worker.lines_in = _worker.lines_out = 0
+    fd, out_path = tempfile.mkstemp(prefix="trusted-annotate-")
+    with os.fdopen(fd, 'wb') as out, open_log(path) as stream:
+        _worker.process(stream, out)
+    return out_path, _worker.lines_in, _worker.lines_out
+
+
+def annotate_logs(paths, out, build_dir="build", jobs=1, **options):
+    """Annotate log files into ``out`` and return ``(lines_in, lines_out)``.
+
+    With ``jobs > 1`` and several inputs, files are decompressed and
+    annotated in parallel worker processes; their results are spooled to
+    temporary files and copied to ``out`` in input order.
+    """
+    if jobs > 1 and len(paths) > 1 and '-' not in paths:
+        lines_in = lines_out = 0
+        with Pool(min(jobs, len(paths)), _init_worker, (build_dir, options)) as pool:
+            for out_path, file_in, file_out in pool.imap(_annotate_to_tempfile, paths):
+                with open(out_path, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+                os.remove(out_path)
+                lines_in += file_in
+                lines_out += file_out
+        return lines_in, lines_out
+
+    annotator = LogAnnotator(TrustedIndex.from_build_dir(build_dir), **options)
+    for path in paths:
+        stream = open_log(path)
+        try:
+            annotator.process(stream, out)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+    return annotator.lines_in, annotator.lines_out
+
+
+def run(paths, build_dir="build", jobs=1, **options):
+    """Annotate logs to stdout and report throughput on stderr."""
+    start = time.perf_counter()
+    lines_in, lines_out = annotate_logs(paths or ['-'], sys.stdout.buffer,
+                                        build_dir, jobs, **options)
+    sys.stdout.buffer.flush()
+    elapsed = time.perf_counter() - start
+    rate = lines_in / elapsed if elapsed else 0
+    print(f"{lines_in} lines in, {lines_out} lines out, {elapsed:.2f}s "
+          f"({rate:,.0f} lines/s)", file=sys.stderr)
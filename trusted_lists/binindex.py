@@ -0,0 +1,171 @@
+"""Memory-mappable binary index of trusted lists.
+
+A ``.idx`` file holds one or more sections, each a sorted array of merged,
+non-overlapping ``(start, end)`` intervals of one list and family, so
+consumers can ``mmap`` it and search it in place without parsing text::
+
+    header   '>4sHH'        magic b"TLIX", format version, section count
+    section  '>H'           length of the list name in bytes,
+             name           followed by the name itself (UTF-8),
+             '>BII'         IP version (4 or 6), interval count, byte offset
+                            of the records
+    records  '>II'          IPv4 start, end
+             '>QQQQ'        IPv6 start, end as high/low 64-bit halves
+
+All integers are big-endian and record arrays are 8-byte aligned.
+"""
+import glob
+import mmap
+import os
+import socket
+import struct
+
+from trusted_lists.files import atomic_open
+
+MAGIC = b"TLIX"
+FORMAT_VERSION = 1
+COMBINED_NAME = "trusted-lists"
+
+_HEADER = struct.Struct('>4sHH')
+_NAME_LENGTH = struct.Struct('>H')
+_SECTION = struct.Struct('>BII')
+_RECORD = {4: struct.Struct('>II'), 6: struct.Struct('>QQQQ')}
+_LOW64 = (1 << 64) - 1
+
+
+def _pack_record(version, start, end):
+    if version == 4:
+        return _RECORD[4].pack(start, end)
+    return _RECORD[6].pack(start >> 64, start & _LOW64, end >> 64, end & _LOW64)
+
+
+def write_index(path, sections):
+    """Write ``(name, version, intervals)`` sections to an index file.
+
+    ``intervals`` must be sorted, non-overlapping ``(start, end)`` pairs.
+    """
+    sections = [(name.encode(), version, intervals) for name, version, intervals in sections]
+    records = []
+    table = []
+    offset = _HEADER.size + sum(_NAME_LENGTH.size + len(name) + _SECTION.size
+                                for name, _, _ in sections)
+    offset += -offset % 8
+    for name, version, intervals in sections:
+        data = b"".join(_pack_record(version, start, end) for start, end in intervals)
+        table.append(_NAME_LENGTH.pack(len(name)) + name
+                     + _SECTION.pack(version, len(data) // _RECORD[version].size, offset))
+        records.append(data)
+        offset += len(data)
+
+    with atomic_open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(sections)))
+        f.writelines(table)
+        f.write(b"\0" * (-f.tell() % 8))
+        f.writelines(records)
+
+
+class Section:
+    """One list/family inside a mapped index; searched directly on the buffer."""
+
+    __slots__ = ('name', 'version', 'count', 'offset', '_buf', '_record')
+
+    def __init__(self, buf, name, version, count, offset):
+        self._buf = buf
+        self.name = name
+        self.version = version
+        self.count = count
+        self.offset = offset
+        self._record = _RECORD[version]
+
+    def _read(self, i):
+        values = self._record.unpack_from(self._buf, self.offset + i * self._record.size)
+        if self.version == 4:
+            return values
+        return values[0] << 64 | values[1], values[2] << 64 | values[3]
+
+    def intervals(self):
+        """Yield the ``(start, end)`` intervals of the section."""
+        for i in range(self.count):
+            yield self._read(i)
+
+    def __contains__(self, address):
+        """Check whether an integer address falls in one of the intervals."""
+        lo, hi = 0, self.count
+        # Find the last interval starting at or before the address
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._read(mid)[0] <= address:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo > 0 and self._read(lo - 1)[1] >= address
+
+    def __repr__(self):
+        return f"<Section {self.name} IPv{self.version}: {self.count} intervals>"
+
+
+class MappedIndex:
+    """Read-only ``mmap`` view of an index file.
+
+    Only the header and section table are decoded when opening; lookups
+    read the records straight from the mapping, so processes opening the
+    same file share one copy in the page cache.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a trusted-lists index")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported index format version {version}")
+        self.sections = []
+        position = _HEADER.size
+        for _ in range(count):
+            [length] = _NAME_LENGTH.unpack_from(self._mm, position)
+            position += _NAME_LENGTH.size
+            name = self._mm[position:position + length]
+            ip_version, records, offset = _SECTION.unpack_from(self._mm, position + length)
+            position += length + _SECTION.size
+            self.sections.append(Section(self._mm, name.decode(), ip_version, records, offset))
+
+    def close(self):
+        self.sections = []
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def lists_containing(self, ip):
+        """Return the names of the lists containing an IP address string."""
+        if ':' in ip:
+            version, address = 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+        else:
+            version, address = 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+        return [section.name for section in self.sections
+                if section.version == version and address in section]
+
+
+def write_combined_index(build_dir="build"):
+    """Combine every per-list ``<name>.idx`` in ``build_dir`` into one file."""
+    combined_path = os.path.join(build_dir, f"{COMBINED_NAME}.idx")
+    sections = []
+    indexes = []
+    for path in sorted(glob.glob(os.path.join(build_dir, "*.idx"))):
+        if path == combined_path:
+            continue
+        index = MappedIndex(path)
+        indexes.append(index)
+        sections.extend((s.name, s.version, s.intervals()) for s in index.sections)
+    if not sections:
+        return None
+    try:
+        write_index(combined_path, sections)
+    finally:
+        for index in indexes:
+            index.close()
+    return combined_path
@@ -0,0 +1,142 @@
+"""On-disk HTTP validator cache for upstream sources.
+
+For every fetched URL the cache keeps the ``ETag``/``Last-Modified``
+validators, a digest of the body and, per list using that URL, a hash of
+the list config together with the build outputs it produced.  When all of
+that still holds, the next run sends a conditional request and an upstream
+answering ``304 Not Modified`` (or returning an identical body) lets the
+generator skip parsing and reuse the files already in ``build/``.
+"""
+import hashlib
+import json
+import os
+
+DEFAULT_CACHE_PATH = "state/http-cache.yml"
+BUILD_DIR = "build"
+OUTPUT_EXTENSIONS = ("txt", "xml", "yml", "idx", "geo.conf", "nft", "ipset",
+                     "added", "removed")
+
+
+def config_digest(list_config):
+    """Return a short stable hash of a list config."""
+    dump = json.dumps(list_config, sort_keys=True, default=str)
+    return hashlib.sha256(dump.encode()).hexdigest()[:8]
+
+
+def body_digest(content):
+    """Return the hex digest of a response body."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class ValidatorCache:
+    """ETag/Last-Modified cache keyed by source URL."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, build_dir=BUILD_DIR):
+        self.path = path
+        self.build_dir = build_dir
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(path):
+            import yaml
+
+            with open(path) as f:
+                self.entries = yaml.safe_load(f) or {}
+
+    def _outputs_exist(self, outputs):
+        return all(
+            os.path.exists(os.path.join(self.build_dir, f"{output}.{ext}"))
+            for output in outputs for ext in OUTPUT_EXTENSIONS
+        )
+
+    def is_reusable(self, url, list_names, trusted_lists):
+        """Check that previous outputs of every list sharing ``url`` are still valid."""
+        entry = self.entries.get(url)
+        if not entry:
+            return False
+        lists = entry.get('lists', {})
+        for list_name in list_names:
+            list_entry = lists.get(list_name)
+            if not list_entry:
+                return False
+            if list_entry.get('config') != config_digest(trusted_lists[list_name]):
+                return False
+            if not self._outputs_exist(list_entry.get('outputs', [])):
+                return False
+        return True
+
+    def conditional_headers(self, url, list_names, trusted_lists):
+        """Return If-None-Match/If-Modified-Since headers for a request."""
+        if not self.is_reusable(url, list_names, trusted_lists):
+            return {}
+        entry = self.entries[url]
+        headers = {}
+        if entry.get('etag'):
+            headers['if-none-match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['if-modified-since'] = entry['last_modified']
+        return headers
+
+    def is_unchanged(self, url, list_names, trusted_lists, response, check_body=True,
+                     digest=None):
+        """Check whether a response lets us reuse the previous build outputs.
+
+        With ``check_body`` false (streamed bodies) only a 304 counts, unless
+        the ``digest`` of the body, once streamed, is given.
+        """
+        if not self.is_reusable(url, list_names, trusted_lists):
+            return False
+        if response.status_code == 304:
+            return True
+        if digest is not None:
+            return self.entries[url].get('digest') == digest
+        if not check_body:
+            return False
+        return self.entries[url].get('digest') == body_digest(response.content)
+
+    def previous_outputs(self, url, list_name):
+        """Output names recorded for a list by the previous build."""
+        return list(self.entries[url]['lists'][list_name]['outputs'])
+
+    def refresh(self, url, response):
+        """Store new validators for an unchanged body returned with 200."""
+        entry = self.entries[url]
+        for header, key in (('etag', 'etag'), ('last-modified', 'last_modified')):
+            value = response.headers.get(header)
+            if value and entry.get(key) != value:
+                entry[key] = value
+                self.dirty = True
+
+    def update(self, url, response, outputs_by_list, trusted_lists, digest=None):
+        """Record validators of a processed response and the outputs it produced.
+
+        ``digest`` must be given for streamed responses, whose body is gone.
+        """
+        digest = digest or body_digest(response.content)
+        previous = self.entries.get(url, {})
+        # Lists fetched separately from the same URL keep their entries
+        lists = dict(previous.get('lists', {})) if previous.get('digest') == digest else {}
+        for list_name, outputs in outputs_by_list.items():
+            lists[list_name] = {
+                'config': config_digest(trusted_lists[list_name]),
+                'outputs': list(outputs),
+            }
+        entry = {'digest': digest, 'lists': lists}
+        etag = response.headers.get('etag')
+        if etag:
+            entry['etag'] = etag
+        last_modified = response.headers.get('last-modified')
+        if last_modified:
+            entry['last_modified'] = last_modified
+        self.entries[url] = entry
+        self.dirty = True
+
+    def save(self):
+        """Write the cache back to disk if anything changed."""
+        if not self.dirty:
+            return
+        import yaml
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'w') as f:
+            yaml.dump(self.entries, f)
+        self.dirty = False
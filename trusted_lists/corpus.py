@@ -0,0 +1,99 @@
+"""Recorded HTTP responses for offline, repeatable builds.
+
+``build --record DIR`` saves every upstream response into ``DIR``, one
+gzip file per request: a JSON line with the URL, status and headers,
+followed by the (decoded) body. ``build --replay DIR`` answers the same
+requests from those files without touching the network. Replayed
+responses are real :class:`requests.Response` objects, streamed or not,
+so they go through exactly the same extraction code as live ones.
+
+Requests are keyed by URL and request headers; the conditional headers
+added by the validator cache are left out, as recording and replaying
+always fetch full bodies.
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import zlib
+
+from trusted_lists.fetch import FetchError
+
+DEFAULT_CORPUS_DIR = "http-corpus"
+CONDITIONAL_HEADERS = frozenset(('if-none-match', 'if-modified-since'))
+# The stored body is already decoded and its length may differ
+DROPPED_HEADERS = frozenset(('content-encoding', 'content-length', 'transfer-encoding'))
+
+
+def request_key(url, headers):
+    """File name stem of a request in the corpus."""
+    headers = sorted((name.lower(), value) for name, value in (headers or {}).items()
+                     if name.lower() not in CONDITIONAL_HEADERS)
+    dump = json.dumps([url, headers])
+    return hashlib.sha256(dump.encode()).hexdigest()[:16]
+
+
+def _path(corpus_dir, url, headers):
+    return os.path.join(corpus_dir, f"{request_key(url, headers)}.http.gz")
+
+
+class RecordingSession:
+    """Session wrapper saving each response it receives into a corpus."""
+
+    def __init__(self, session, corpus_dir=DEFAULT_CORPUS_DIR):
+        self.session = session
+        self.corpus_dir = corpus_dir
+        os.makedirs(corpus_dir, exist_ok=True)
+
+    def get(self, url, headers=None, **kwargs):
+        response = self.session.get(url, headers=headers, **kwargs)
+        # Reading .content keeps the body available to iter_content()
+        body = response.content
+        meta = {
+            'url': url,
+            'status': response.status_code,
+            'headers': {name: value for name, value in response.headers.items()
+                        if name.lower() not in DROPPED_HEADERS},
+        }
+        path = _path(self.corpus_dir, url, headers)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(json.dumps(meta, sort_keys=True).encode() + b"\n")
+            f.write(body)
+        os.replace(tmp_path, path)
+        return response
+
+
+class ReplaySession:
+    """Session answering requests from a recorded corpus only."""
+
+    def __init__(self, corpus_dir=DEFAULT_CORPUS_DIR):
+        self.corpus_dir = corpus_dir
+
+    def get(self, url, headers=None, stream=False, **kwargs):
+        import requests
+        from requests.structures import CaseInsensitiveDict
+        from requests.utils import get_encoding_from_headers
+
+        path = _path(self.corpus_dir, url, headers)
+        try:
+            with gzip.open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+            response_url, status = meta['url'], meta['status']
+            response_headers = CaseInsensitiveDict(meta['headers'])
+        except FileNotFoundError:
+            raise FetchError(f"no recorded response in {self.corpus_dir}") from None
+        except (OSError, EOFError, zlib.error, ValueError, KeyError, TypeError) as exc:
+            # A truncated or corrupt file only fails the lists of this request
+            raise FetchError(f"unreadable recorded response {path}: {exc}") from exc
+        response = requests.Response()
+        response.url = response_url
+        response.status_code = status
+        response.headers = response_headers
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(body)
+        if not stream:
+            response._content = body
+        return response
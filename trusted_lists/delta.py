@@ -0,0 +1,93 @@
+"""Delta artifacts between two builds of a list.
+
+``<name>.added`` and ``<name>.removed`` hold the entries that changed
+since the previous ``<name>.txt``, one per line, in the format read by
+``firewall-cmd --ipset=<name> --add-entries-from-file`` and
+``--remove-entries-from-file``. Both start with comment lines (ignored by
+firewall-cmd) holding the SHA-256 of the previous and of the new entries.
+Each digest is taken over the entries sorted bytewise with one per line,
+so the spec's %post scriptlet can check that the running ipset still
+holds the previous build before applying the delta.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from trusted_lists.files import atomic_open
+
+NO_BASE = "none"
+# Added entries are spooled to disk beyond this size (a first build adds everything)
+SPOOL_SIZE = 1 << 20
+
+
+def read_entries(path):
+    """Set of the entries of a previous ``<name>.txt``, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        entries = {line.strip() for line in f}
+    entries.discard("")
+    return entries
+
+
+def entries_digest(entries):
+    """SHA-256 of the entries as ``LC_ALL=C sort | sha256sum`` computes it."""
+    sha = hashlib.sha256()
+    for entry in sorted(entries):
+        sha.update(f"{entry}\n".encode())
+    return sha.hexdigest()
+
+
+class DeltaWriter:
+    """Delta of a build, taken while its entries stream into the other outputs.
+
+    ``previous`` is None when the list has not been built before; all its
+    entries are then "added" and the base digest is ``none``. A set passed
+    as ``previous`` (see :func:`read_entries`) is consumed.
+    """
+
+    def __init__(self, base_path, previous):
+        self.base_path = base_path
+        self.base = NO_BASE if previous is None else entries_digest(previous)
+        self._unseen = previous if isinstance(previous, set) else set(previous or ())
+        # The target digest sorts the new entries, so only their strings are kept
+        self._entries = []
+        self._added = tempfile.SpooledTemporaryFile(SPOOL_SIZE, mode='w+')
+        self.added = 0
+
+    def track(self, entries):
+        """Yield ``entries`` unchanged, recording each of them."""
+        for entry in entries:
+            self.write(entry)
+            yield entry
+
+    def write(self, entry):
+        self._entries.append(entry)
+        if entry in self._unseen:
+            self._unseen.discard(entry)
+        else:
+            self._added.write(f"{entry}\n")
+            self.added += 1
+
+    def close(self):
+        """Write ``<base_path>.added`` and ``.removed``; return their entry counts."""
+        removed = sorted(self._unseen)
+        header = f"# base sha256:{self.base}\n# target sha256:{entries_digest(self._entries)}\n"
+        self._entries = []
+        with self._added, atomic_open(f"{self.base_path}.added") as f:
+            f.write(header)
+            self._added.seek(0)
+            shutil.copyfileobj(self._added, f)
+        with atomic_open(f"{self.base_path}.removed") as f:
+            f.write(header)
+            f.writelines(f"{entry}\n" for entry in removed)
+        return self.added, len(removed)
+
+
+def write_delta(base_path, previous, current):
+    """Write ``<base_path>.added`` and ``.removed``; return their entry counts."""
+    delta = DeltaWriter(base_path, previous)
+    for entry in current:
+        delta.write(entry)
+    return delta.close()
@@ -0,0 +1,366 @@
+"""Concurrent download of trusted.yml sources.
+
+All remote lists are fetched through one shared :class:`requests.Session`
+so connections to the same host are pooled, and identical requests
+(same URL and headers) are only made once no matter how many lists use them.
+requests itself is only imported once there is something to download.
+
+Every request has connect/read timeouts (``connect_timeout`` and
+``read_timeout`` in trusted.yml) and is retried up to ``retries`` times,
+after a jittered exponential backoff, on connection errors, timeouts, 429
+and 5xx answers. An optional :class:`Deadline` bounds the whole run: the
+timeouts are clipped to the time it has left and a source not done by
+then fails with :class:`FetchError`.
+"""
+import codecs
+import hashlib
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as WaitTimeout
+
+from trusted_lists.metrics import get_metrics
+
+DEFAULT_WORKERS = 8
+CHUNK_SIZE = 64 * 1024
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 30
+# Smallest timeout handed to requests (urllib3 refuses 0)
+MIN_TIMEOUT = 0.001
+DEFAULT_RETRIES = 2
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# Config keys selecting a parser other than line-wise text/plain
+PARSER_KEYS = ('regex', 'html_selector', 'json_selector', 'json_value_keys', 'json_stream')
+
+SIMPLE_HEADERS = {
+    'user-agent': 'Mozilla/5.0 (compatible; trusted-lists/1.0)',
+}
+
+BROWSER_HEADERS = {
+    'accept': 'text/html,application/xhtml+xml,application/xml;'
+              'q=0.9,image/avif,image/webp,image/apng,*/*;'
+              'q=0.8,application/signed-exchange;v=b3;q=0.9',
+    'user-agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+                  '(KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
+}
+
+
+def build_headers(list_config):
+    """Return the request headers to use for a list config."""
+    if list_config.get('simple_headers'):
+        headers = dict(SIMPLE_HEADERS)
+    else:
+        headers = dict(BROWSER_HEADERS)
+    if 'paypal.com' in list_config['url']:
+        headers['cookie'] = 'enforce_policy=ccpa; LANG=en_US%3BUS; tsrce=smarthelpnodeweb'
+    return headers
+
+
+class FetchError(Exception):
+    """A source could not be downloaded within its timeouts, retries or the deadline."""
+
+    def __init__(self, reason, list_names=()):
+        super().__init__(reason)
+        self.reason = reason
+        self.list_names = list(list_names)
+
+
+class Deadline:
+    """Wall-clock budget shared by every request of a run (None: unlimited)."""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        """Seconds left, or None without a budget."""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.remaining() == 0
+
+    def clip(self, timeout):
+        """Shorten a timeout so it ends no later than the deadline.
+
+        The result stays positive, as urllib3 rejects a zero timeout: a
+        deadline running out right after it was checked lets the request
+        time out instead.
+        """
+        remaining = self.remaining()
+        return timeout if remaining is None else max(MIN_TIMEOUT, min(timeout, remaining))
+
+
+def request_policy(list_configs):
+    """Return ``((connect, read), retries)`` for lists sharing one request.
+
+    The most patient setting of the lists wins, so no list gets less time
+    than it asked for.
+    """
+    connect = max(c.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT) for c in list_configs)
+    read = max(c.get('read_timeout', DEFAULT_READ_TIMEOUT) for c in list_configs)
+    retries = max(c.get('retries', DEFAULT_RETRIES) for c in list_configs)
+    return (connect, read), retries
+
+
+def max_body_size(list_configs):
+    """Return the ``max_body_size`` enforced on a body shared by several lists.
+
+    The smallest limit set by any of the lists wins, None if none sets one.
+    """
+    return min((c['max_body_size'] for c in list_configs if 'max_body_size' in c),
+               default=None)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full-jitter exponential backoff before retry number ``attempt + 1``."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def create_session(workers=DEFAULT_WORKERS):
+    """Create a session whose per-host connection pool fits all workers."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def is_line_streamed(list_config):
+    """Whether a list is parsed line by line if its source turns out to be text/plain.
+
+    These are the lists without a parser of their own (regex, selectors);
+    a text/html or JSON body of such a list is still read as a whole.
+    """
+    return not any(key in list_config for key in PARSER_KEYS)
+
+
+def is_streamed(list_config):
+    """Whether a list consumes its response body incrementally."""
+    return bool(list_config.get('json_stream')) or is_line_streamed(list_config)
+
+
+def group_requests(trusted_lists):
+    """Group remote lists that would issue an identical request.
+
+    Returns a dict mapping ``(url, headers, stream)`` to the list names
+    sharing it. Lists backed by a ``static_file`` are skipped. A streamed
+    JSON body is parsed per list, so ``json_stream`` lists get a request of
+    their own (``stream`` is then the list name). ``stream`` is True for
+    other streamed requests and None for the rest.
+    """
+    groups = {}
+    for list_name, list_config in trusted_lists.items():
+        if 'static_file' in list_config:
+            continue
+        headers = build_headers(list_config)
+        if list_config.get('json_stream'):
+            stream = list_name
+        else:
+            stream = True if is_streamed(list_config) else None
+        key = (list_config['url'], tuple(sorted(headers.items())), stream)
+        groups.setdefault(key, []).append(list_name)
+    return groups
+
+
+class BodyStream:
+    """Iterate over a streamed response body, hashing it on the way.
+
+    With ``max_size`` (bytes), a body announced or found to be larger
+    raises :class:`FetchError` instead of being read any further.
+    """
+
+    def __init__(self, response, chunk_size=CHUNK_SIZE, deadline=None, max_size=None):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.deadline = deadline
+        self.max_size = max_size
+        self.size = 0
+        self.started = False
+        self._sha = hashlib.sha256()
+
+    def _check_size(self, size):
+        if self.max_size is not None and size > self.max_size:
+            raise FetchError(f"body larger than max_body_size ({self.max_size} bytes)")
+
+    def __iter__(self):
+        """Yield the body in chunks; read errors, size and deadline raise FetchError."""
+        self.started = True
+        length = self.response.headers.get('content-length')
+        if length and length.isdigit():
+            self._check_size(int(length))
+        chunks = self.response.iter_content(self.chunk_size)
+        while True:
+            if self.deadline is not None and self.deadline.expired():
+                raise FetchError("deadline exceeded while reading the body")
+            try:
+                chunk = next(chunks, None)
+            except OSError as exc:
+                # requests' exceptions derive from IOError
+                raise FetchError(f"reading the body failed: {exc}") from exc
+            if chunk is None:
+                return
+            self._check_size(self.size + len(chunk))
+            self._sha.update(chunk)
+            self.size += len(chunk)
+            yield chunk
+
+    def iter_text(self):
+        """Yield the body decoded incrementally (UTF-8 unless a charset is given)."""
+        decoder = codecs.getincrementaldecoder(self.response.encoding or 'utf-8')('replace')
+        for chunk in self:
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+
+    def iter_lines(self):
+        """Yield the lines of the decoded body as chunks arrive (like str.splitlines)."""
+        tail = ""
+        for text in self.iter_text():
+            lines = (tail + text).splitlines()
+            # The last line may continue in the next chunk
+            tail = lines.pop() if lines and not text.endswith(("\n", "\r")) else ""
+            yield from lines
+        if tail:
+            yield tail
+
+    def read(self):
+        """Read the whole body, after which the response's .text and .json() work."""
+        # What Response.content would have read
+        self.response._content = b"".join(self)
+        self.response._content_consumed = True
+        return self.response._content
+
+    def hexdigest(self):
+        """Digest of the body read so far (all of it once iteration finished)."""
+        return self._sha.hexdigest()
+
+
+def _read_body(response, deadline, list_names):
+    """Download a whole body in chunks, giving up when the deadline expires.
+
+    requests' read timeout applies to each socket read, so a body that
+    trickles in would otherwise keep a request going indefinitely.
+    """
+    chunks = []
+    for chunk in response.iter_content(CHUNK_SIZE):
+        if deadline.expired():
+            response.close()
+            raise FetchError("deadline exceeded while reading the body", list_names)
+        chunks.append(chunk)
+    # What Response.content would have read, so .text and .json() work as usual
+    response._content = b"".join(chunks)
+    response._content_consumed = True
+
+
+def _close_late_response(future):
+    """Close the response of a request that finished after it was given up."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _get(session, url, headers, stream, list_names, timeouts, retries, deadline):
+    """Make one request, retrying transient failures within the deadline.
+
+    Bodies are always requested as a stream; unless ``stream`` is set, the
+    body is read here in chunks so the deadline also bounds the download.
+    """
+    import requests
+
+    metrics = get_metrics()
+    connect, read = timeouts
+    attempt = 0
+    while True:
+        if deadline.expired():
+            raise FetchError("deadline exceeded", list_names)
+        start = time.perf_counter()
+        try:
+            response = session.get(url, headers=headers, stream=True,
+                                   timeout=(deadline.clip(connect), deadline.clip(read)))
+            if response.status_code not in RETRY_STATUSES and not stream:
+                _read_body(response, deadline, list_names)
+        except requests.RequestException as exc:
+            error = str(exc)
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                if metrics.enabled:
+                    # A streamed body is only downloaded while it is parsed
+                    size = None if stream else len(response.content)
+                    metrics.record_fetch(list_names, time.perf_counter() - start,
+                                         response.status_code, size)
+                return response
+            error = f"HTTP {response.status_code}"
+            response.close()
+        if attempt >= retries:
+            raise FetchError(f"{error} (attempts: {attempt + 1})", list_names)
+        delay = backoff_delay(attempt)
+        remaining = deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            raise FetchError(f"{error} (no time left to retry)", list_names)
+        time.sleep(delay)
+        attempt += 1
+
+
+def fetch_all(trusted_lists, workers=DEFAULT_WORKERS, session=None, cache=None, deadline=None):
+    """Fetch every remote list concurrently.
+
+    Yields ``(list_names, response)`` tuples in completion order, so callers
+    can parse and write whichever source finished first. A source that
+    failed (see :func:`_get`) or was still pending when the
+    :class:`Deadline` expired is yielded with a :class:`FetchError` in
+    place of the response. Responses of streamed lists (see
+    :func:`is_streamed`) are returned with the body still unread, to be
+    consumed through a :class:`BodyStream`. With a
+    :class:`~trusted_lists.cache.ValidatorCache`, requests are made
+    conditional on the validators stored for their URL.
+    """
+    groups = group_requests(trusted_lists)
+    if not groups:
+        return
+    if deadline is None:
+        deadline = Deadline()
+    workers = max(1, min(workers, len(groups)))
+    if session is None:
+        session = create_session(workers)
+    # Not a with block: leaving it would wait for requests still running
+    # after the deadline
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {}
+    pending = set()
+    try:
+        for (url, headers, stream), list_names in groups.items():
+            headers = dict(headers)
+            if cache is not None:
+                headers.update(cache.conditional_headers(url, list_names, trusted_lists))
+            timeouts, retries = request_policy([trusted_lists[name] for name in list_names])
+            future = executor.submit(_get, session, url, headers, stream is not None,
+                                     list_names, timeouts, retries, deadline)
+            futures[future] = list_names
+        pending.update(futures)
+        try:
+            for future in as_completed(futures, timeout=deadline.remaining()):
+                pending.discard(future)
+                try:
+                    response = future.result()
+                except FetchError as exc:
+                    yield futures[future], exc
+                    continue
+                except Exception as exc:
+                    # Only the lists of this request fail, whatever went wrong
+                    list_names = futures[future]
+                    yield list_names, FetchError(f"{type(exc).__name__}: {exc}", list_names)
+                    continue
+                yield futures[future], response
+        except WaitTimeout:
+            for future in list(pending):
+                list_names = futures[future]
+                yield list_names, FetchError("deadline exceeded", list_names)
+    finally:
+        for future in pending:
+            future.add_done_callback(_close_late_response)
+        executor.shutdown(wait=False, cancel_futures=True)
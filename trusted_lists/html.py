@@ -0,0 +1,150 @@
+"""HTML extraction engines.
+
+``bs4`` (the default) parses with BeautifulSoup's pure-Python html.parser.
+``lxml`` uses libxml2 through lxml.html with compiled CSS selectors: for a
+plain tag selector such as ``li`` the document is parsed incrementally and
+only the matching elements are kept (like a SoupStrainer), anything else is
+matched with a cached ``CSSSelector`` on the parsed tree.  When lxml cannot
+parse the markup, or does not support the selector, the BeautifulSoup
+engine is used instead.  Like BeautifulSoup, both engines leave the content
+of ``<script>``, ``<style>`` and ``<template>`` elements out of the text.
+
+The engine is chosen with ``build --html-engine`` or per list with
+``html_engine`` in trusted.yml.
+"""
+import io
+import re
+from functools import lru_cache
+
+ENGINES = ('bs4', 'lxml')
+DEFAULT_ENGINE = 'bs4'
+
+_TAG_SELECTOR = re.compile(r'[A-Za-z][A-Za-z0-9]*\Z')
+# bs4 >= 4.11 does not count their content as text
+_NON_TEXT_TAGS = frozenset(('script', 'style', 'template'))
+
+
+class LxmlUnavailable(Exception):
+    """lxml could not handle the markup or selector; use BeautifulSoup."""
+
+
+def engine_for(list_config, default=DEFAULT_ENGINE):
+    """Return the HTML engine configured for a list."""
+    engine = list_config.get('html_engine', default)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown html_engine {engine!r} (expected one of {', '.join(ENGINES)})")
+    return engine
+
+
+def select_texts(markup, selector, engine=DEFAULT_ENGINE):
+    """Return the text of every element of ``markup`` matching a CSS selector."""
+    if engine == 'lxml':
+        try:
+            return _lxml_select_texts(markup, selector)
+        except LxmlUnavailable:
+            pass
+    return [elem.text for elem in _soup(markup).select(selector)]
+
+
+def page_lines(markup, engine=DEFAULT_ENGINE):
+    """Return the text content of a whole page, split into lines."""
+    if engine == 'lxml':
+        try:
+            return _element_text(_lxml_parse(markup)).splitlines()
+        except LxmlUnavailable:
+            pass
+    return _soup(markup).text.splitlines()
+
+
+def _soup(markup):
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(markup, 'html.parser')
+
+
+def _encode(markup):
+    # lxml refuses str input carrying an encoding declaration, so parse bytes
+    return markup.encode('utf-8', 'surrogatepass') if isinstance(markup, str) else markup
+
+
+def _lxml_parse(markup):
+    from lxml import etree
+    from lxml.html import HTMLParser
+
+    try:
+        root = etree.fromstring(_encode(markup), HTMLParser(encoding='utf-8'))
+    except (etree.ParserError, etree.XMLSyntaxError, ValueError) as exc:
+        raise LxmlUnavailable(exc) from exc
+    if root is None:
+        raise LxmlUnavailable("empty document")
+    return root
+
+
+@lru_cache(maxsize=None)
+def _compile(selector):
+    from cssselect import SelectorError
+    from cssselect.xpath import ExpressionError
+    from lxml.cssselect import CSSSelector
+
+    try:
+        return CSSSelector(selector, translator='html')
+    except (SelectorError, ExpressionError) as exc:
+        raise LxmlUnavailable(exc) from exc
+
+
+def _lxml_select_texts(markup, selector):
+    selector = selector.strip()
+    if _TAG_SELECTOR.match(selector):
+        return _iter_tag_texts(markup, selector.lower())
+    return [_element_text(elem) for elem in _compile(selector)(_lxml_parse(markup))]
+
+
+def _element_text(elem):
+    """Text of an element, without comments and nested non-text elements."""
+    parts = [elem.text or '']
+    # (children still to visit, tail of their parent); iterative for deep documents
+    stack = [(iter(elem), '')]
+    while stack:
+        children, tail = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            parts.append(tail)
+        elif isinstance(child.tag, str) and child.tag not in _NON_TEXT_TAGS:
+            parts.append(child.text or '')
+            stack.append((iter(child), child.tail or ''))
+        else:
+            parts.append(child.tail or '')
+    return "".join(parts)
+
+
+def _iter_tag_texts(markup, tag):
+    """Texts of all ``tag`` elements, dropping every element once it has ended.
+
+    Only the open ancestors of the element being parsed are kept, plus the
+    content of ``tag`` elements until their text has been read.
+    """
+    from lxml import etree
+
+    texts = []
+    open_matches = 0
+    try:
+        for event, elem in etree.iterparse(io.BytesIO(_encode(markup)), events=('start', 'end'),
+                                           html=True, encoding='utf-8'):
+            if elem.tag == tag:
+                if event == 'start':
+                    open_matches += 1
+                    continue
+                texts.append(_element_text(elem))
+                open_matches -= 1
+            elif event == 'start':
+                continue
+            # A matching ancestor still needs this element's text
+            parent = elem.getparent()
+            if not open_matches and parent is not None:
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del parent[0]
+    except etree.XMLSyntaxError as exc:
+        raise LxmlUnavailable(exc) from exc
+    return texts
@@ -0,0 +1,134 @@
+"""Sorted-interval index answering "which lists contain this IP?".
+
+All lists of one family are flattened into elementary, non-overlapping
+segments. Each segment knows the comma-separated names of the lists covering
+it, so a query is a single binary search over the segment start addresses.
+A network query is answered with the lists covering every segment it spans.
+"""
+import glob
+import os
+import socket
+from array import array
+from bisect import bisect_right
+
+from trusted_lists.aggregate import merge_intervals
+from trusted_lists.netset import NetworkSet
+from trusted_lists.parse import add_networks, parse_network
+
+
+def load_build_lists(build_dir="build"):
+    """Read every ``<build_dir>/*.txt`` into ``{name: (ipv4_set, ipv6_set)}``."""
+    lists = {}
+    for path in sorted(glob.glob(os.path.join(build_dir, "*.txt"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        ipv4, ipv6 = NetworkSet(4), NetworkSet(6)
+        with open(path) as f:
+            add_networks(f, ipv4, ipv6)
+        lists[name] = (ipv4, ipv6)
+    return lists
+
+
+class FamilyIndex:
+    """Segment index over the lists of one IP version."""
+
+    __slots__ = ('version', 'starts', 'labels')
+
+    def __init__(self, version, named_sets):
+        self.version = version
+        events = []
+        for name, networks in named_sets:
+            for start, end in merge_intervals(networks.intervals()):
+                events.append((start, 1, name))
+                events.append((end + 1, -1, name))
+        events.sort()
+
+        starts = [0]
+        labels = [""]
+        active = {}
+        label_cache = {}
+        i = 0
+        while i < len(events):
+            position = events[i][0]
+            while i < len(events) and events[i][0] == position:
+                _, delta, name = events[i]
+                active[name] = active.get(name, 0) + delta
+                if not active[name]:
+                    del active[name]
+                i += 1
+            key = tuple(sorted(active))
+            label = label_cache.setdefault(key, ",".join(key))
+            if label == labels[-1]:
+                continue
+            if starts[-1] == position:
+                labels[-1] = label
+            else:
+                starts.append(position)
+                labels.append(label)
+        # IPv4 boundaries fit in a compact array; IPv6 ones need Python ints
+        self.starts = array('Q', starts) if version == 4 else starts
+        self.labels = labels
+
+    def lookup(self, address, end=None):
+        """Return the comma-separated names of the lists containing ``address``.
+
+        With ``end``, only the lists containing the whole ``[address, end]``
+        range are returned.
+        """
+        first = bisect_right(self.starts, address) - 1
+        if end is None:
+            return self.labels[first]
+        last = bisect_right(self.starts, end) - 1
+        if first == last:
+            return self.labels[first]
+        names = set(self.labels[first].split(","))
+        for label in self.labels[first + 1:last + 1]:
+            if not label:
+                return ""
+            names.intersection_update(label.split(","))
+        return ",".join(sorted(names))
+
+
+class TrustedIndex:
+    """Per-family segment indexes over a set of named lists."""
+
+    def __init__(self, lists):
+        self.families = {
+            4: FamilyIndex(4, ((name, sets[0]) for name, sets in lists.items())),
+            6: FamilyIndex(6, ((name, sets[1]) for name, sets in lists.items())),
+        }
+        self._ipv4_starts = self.families[4].starts
+        self._ipv4_labels = self.families[4].labels
+
+    @classmethod
+    def from_build_dir(cls, build_dir="build"):
+        return cls(load_build_lists(build_dir))
+
+    def lookup(self, ip):
+        """Return the comma-separated list names containing ``ip`` ("" if none).
+
+        ``ip`` must not have surrounding whitespace; a network is only
+        contained in lists covering all of it. Returns None when it is not a
+        valid address or network.
+        """
+        if ':' not in ip and '/' not in ip:
+            # Plain IPv4 address: parse and search in C
+            try:
+                address = int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+            except OSError:
+                return None
+            return self._ipv4_labels[bisect_right(self._ipv4_starts, address) - 1]
+        parsed = parse_network(ip)
+        if parsed is None:
+            return None
+        version, address, prefixlen = parsed
+        end = address | ((1 << ((32 if version == 4 else 128) - prefixlen)) - 1)
+        return self.families[version].lookup(address, end)
+
+    def lookup_lines(self, lines):
+        """Yield ``ip<TAB>list1,list2`` output lines for input lines of IPs."""
+        lookup = self.lookup
+        for line in lines:
+            ip = line.strip()
+            if not ip:
+                continue
+            yield f"{ip}\t{lookup(ip) or ''}\n"
@@ -0,0 +1,65 @@
+"""Kernel ipset sizing and ``ipset restore`` output.
+
+:func:`set_options` sizes a ``hash:net`` set for its entry count plus a
+headroom fraction (``ipset_headroom`` in trusted.yml, 25% by default).
+``hashsize`` is the next power of two above that, so the hash never has
+to grow while the set is loaded, and small sets do not allocate the
+kernel's default 1024 buckets. ``maxelem`` never goes below the kernel
+default of 65536, and lists larger than that still load.
+
+``<name>.ipset`` fills a temporary ``hash:net`` set and swaps it with the
+live set of the same name, which firewalld creates from ``<name>.xml`` when
+it runs with its iptables backend (with the nftables backend, firewalld
+keeps its ipsets in nftables and there is no kernel set to swap with).
+``ipset restore < build/<name>.ipset`` loads every entry in one netlink
+batch, and the swap exchanges the two sets atomically. The temporary set
+is named after its options: ``create -exist`` fails on a set of the same
+name with another hashsize or maxelem, e.g. one left by an aborted load.
+"""
+import hashlib
+import math
+
+from trusted_lists.files import atomic_open
+
+# ipset names are limited to 31 characters
+MAX_NAME_LENGTH = 31
+TMP_SUFFIX = "-tmp"
+DEFAULT_HEADROOM = 0.25
+MIN_HASHSIZE = 64
+DEFAULT_MAXELEM = 65536
+
+
+def set_options(count, headroom=DEFAULT_HEADROOM):
+    """Return ``{"hashsize": ..., "maxelem": ...}`` for ``count`` entries."""
+    if headroom < 0:
+        raise ValueError(f"ipset_headroom must not be negative, got {headroom!r}")
+    capacity = math.ceil(count * (1 + headroom))
+    hashsize = max(MIN_HASHSIZE, 1 << max(capacity - 1, 0).bit_length())
+    return {"hashsize": hashsize, "maxelem": max(DEFAULT_MAXELEM, capacity)}
+
+
+def temporary_name(set_name, family, options):
+    """Name of the set the entries are loaded into before the swap.
+
+    It ends in a digest of the set type, so a leftover set of the same name
+    always has the options the batch creates it with.
+    """
+    spec = f"{family} {options['hashsize']} {options['maxelem']}"
+    suffix = f"{TMP_SUFFIX}-{hashlib.sha256(spec.encode()).hexdigest()[:6]}"
+    return set_name[:MAX_NAME_LENGTH - len(suffix)] + suffix
+
+
+def write_ipset_restore(path, set_name, family, cidrs, options):
+    """Write an ``ipset restore`` script swapping in a freshly loaded set.
+
+    ``options`` are the :func:`set_options` of the set.
+    """
+    tmp_name = temporary_name(set_name, family, options)
+    with atomic_open(path) as f:
+        f.write(f"create {tmp_name} hash:net family {family} "
+                f"hashsize {options['hashsize']} maxelem {options['maxelem']} -exist\n")
+        f.write(f"flush {tmp_name}\n")
+        for cidr in cidrs:
+            f.write(f"add {tmp_name} {cidr}\n")
+        f.write(f"swap {tmp_name} {set_name}\n")
+        f.write(f"destroy {tmp_name}\n")
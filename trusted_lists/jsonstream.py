@@ -0,0 +1,161 @@
+"""Incremental extraction of the items under JSON selector paths.
+
+The document is read from an iterable of text chunks (e.g. a response body
+as it downloads). Objects on the way to a selector are walked key by key,
+everything else is skipped structurally, and only the elements of the
+selected arrays are decoded, one at a time, with the standard JSON decoder.
+Peak memory is therefore bounded by the largest single item (plus one
+chunk) instead of the whole document.
+"""
+import json
+import re
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Numbers and literals are only complete once a delimiter follows them
+_SCALAR_END = re.compile(r'[,\]} \t\n\r]')
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """Pull reader over a stream of text chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        for chunk in self._chunks:
+            if chunk:
+                self.buf = self.buf[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.eof = True
+        return False
+
+    def error(self, message):
+        return json.JSONDecodeError(message, self.buf, self.pos)
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise self.error("Unexpected end of JSON data")
+
+    def take(self, expected):
+        """Consume the next character, which must be one of ``expected``."""
+        char = self.peek()
+        if char not in expected:
+            raise self.error(f"Expected one of {expected!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the complete JSON value at the current position."""
+        if self.peek() not in '"{[':
+            while not _SCALAR_END.search(self.buf, self.pos) and self._grow():
+                pass
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._grow():
+                    raise
+                continue
+            self.pos = end
+            return obj
+
+    def _grow(self):
+        """Read at least as much data again as is buffered; False at EOF."""
+        wanted = 2 * (len(self.buf) - self.pos)
+        grown = False
+        while self._fill():
+            grown = True
+            if len(self.buf) >= wanted:
+                break
+        return grown
+
+
+def _members(reader, close):
+    """Advance over the separators of an object/array; True while members remain."""
+    if reader.peek() == close:
+        reader.pos += 1
+        return False
+    return True
+
+
+def _skip(reader):
+    """Skip one value without decoding containers as a whole."""
+    char = reader.peek()
+    if char == '{':
+        reader.pos += 1
+        more = _members(reader, '}')
+        while more:
+            reader.value()
+            reader.take(':')
+            _skip(reader)
+            more = reader.take(',}') == ','
+    elif char == '[':
+        reader.pos += 1
+        more = _members(reader, ']')
+        while more:
+            _skip(reader)
+            more = reader.take(',]') == ','
+    else:
+        reader.value()
+
+
+def _emit(reader):
+    """Yield each element of an array, or a non-array value itself."""
+    if reader.peek() != '[':
+        yield reader.value()
+        return
+    reader.pos += 1
+    more = _members(reader, ']')
+    while more:
+        yield reader.value()
+        more = reader.take(',]') == ','
+
+
+def _walk(reader, paths, found):
+    """Yield items for ``(selector, remaining_keys)`` paths at the current value."""
+    targets = [selector for selector, keys in paths if not keys]
+    if targets:
+        found.update(targets)
+        yield from _emit(reader)
+        return
+    if reader.peek() != '{':
+        _skip(reader)
+        return
+    reader.pos += 1
+    more = _members(reader, '}')
+    while more:
+        key = reader.value()
+        reader.take(':')
+        matching = [(selector, keys[1:]) for selector, keys in paths if keys[0] == key]
+        if matching:
+            yield from _walk(reader, matching, found)
+        else:
+            _skip(reader)
+        more = reader.take(',}') == ','
+
+
+def iter_json_items(chunks, selectors):
+    """Yield the items under dot-separated ``selectors`` from JSON text chunks.
+
+    For a selector pointing at an array each element is yielded; any other
+    value is yielded as a whole. Items are produced in document order.
+    Raises KeyError for a selector missing from the document, like the
+    in-memory path lookup does.
+    """
+    paths = [(selector, tuple(selector.split('.'))) for selector in selectors]
+    found = set()
+    reader = _Reader(chunks)
+    yield from _walk(reader, paths, found)
+    for selector, _ in paths:
+        if selector not in found:
+            raise KeyError(selector)
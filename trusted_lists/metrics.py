@@ -0,0 +1,204 @@
+"""Per-source run metrics, exported as a JSON report and a Prometheus textfile.
+
+Instrumented code asks for the active collector with :func:`get_metrics`.
+Unless a :class:`RunMetrics` has been activated, that is a
+:class:`NullMetrics` whose methods do nothing, so a run without metrics
+only pays for a few no-op calls per source.
+"""
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+from trusted_lists.files import atomic_open
+
+PREFIX = "trusted_lists"
+
+
+class NullMetrics:
+    """Metrics collector that records nothing."""
+
+    enabled = False
+
+    def stage(self, list_name, stage):
+        return nullcontext()
+
+    def begin_source(self, list_name):
+        pass
+
+    def end_source(self):
+        pass
+
+    def record_fetch(self, list_names, seconds, status, size=None):
+        pass
+
+    def record_bytes(self, list_names, size):
+        pass
+
+    def record_failure(self, list_names, reason):
+        pass
+
+    def count_parse(self, tokens, networks):
+        pass
+
+    def record_write(self, output_name, fmt, seconds, entries):
+        pass
+
+
+class RunMetrics(NullMetrics):
+    """Collects fetch, parse and write metrics for every source of a run."""
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished = None
+        self.sources = {}
+        self.active = None
+
+    def source(self, list_name):
+        return self.sources.setdefault(list_name, {
+            'status': None, 'bytes': 0, 'fetch_seconds': 0.0, 'parse_seconds': 0.0,
+            'tokens': 0, 'networks': 0, 'outputs': {}, 'error': None,
+        })
+
+    @contextmanager
+    def stage(self, list_name, stage):
+        """Add the time spent in the block to ``<stage>_seconds`` of a source."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            source = self.source(list_name)
+            key = f"{stage}_seconds"
+            source[key] = source.get(key, 0.0) + time.perf_counter() - start
+
+    def begin_source(self, list_name):
+        """Attribute parse and write metrics to ``list_name`` until end_source()."""
+        self.active = list_name
+        self.source(list_name)
+
+    def end_source(self):
+        self.active = None
+
+    def record_fetch(self, list_names, seconds, status, size=None):
+        """Record download time, HTTP status and (if known) body size of a request."""
+        for list_name in list_names:
+            source = self.source(list_name)
+            source['status'] = status
+            source['fetch_seconds'] = seconds
+            if size is not None:
+                source['bytes'] = size
+
+    def record_bytes(self, list_names, size):
+        """Record the size of a body that was streamed after the fetch."""
+        for list_name in list_names:
+            self.source(list_name)['bytes'] = size
+
+    def record_failure(self, list_names, reason):
+        """Record why sources kept their previous build outputs."""
+        for list_name in list_names:
+            self.source(list_name)['error'] = reason
+
+    def count_parse(self, tokens, networks):
+        """Count tokens seen and networks accepted for the active source."""
+        if self.active is not None:
+            source = self.source(self.active)
+            source['tokens'] += tokens
+            source['networks'] += networks
+
+    def record_write(self, output_name, fmt, seconds, entries):
+        """Record the time spent writing one format of an output."""
+        if self.active is None:
+            return
+        output = self.source(self.active)['outputs'].setdefault(
+            output_name, {'entries': entries, 'write_seconds': {}})
+        output['entries'] = entries
+        output['write_seconds'][fmt] = output['write_seconds'].get(fmt, 0.0) + seconds
+
+    def finish(self):
+        self.finished = time.time()
+
+    def report(self):
+        """Return the run report as a JSON-serializable dict."""
+        finished = self.finished or time.time()
+        return {
+            'started': self.started,
+            'finished': finished,
+            'duration_seconds': finished - self.started,
+            'sources': self.sources,
+        }
+
+    def write_json(self, path):
+        with atomic_open(path) as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    def prometheus_lines(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        report = self.report()
+        metrics = {}
+
+        def add(name, help_text, labels, value):
+            metric = metrics.setdefault(name, (help_text, []))
+            label_s = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            metric[1].append(f"{PREFIX}_{name}{{{label_s}}} {value}")
+
+        for list_name, source in sorted(report['sources'].items()):
+            labels = {'list': list_name}
+            if source['status'] is not None:
+                add('http_status', "HTTP status of the last fetch.", labels, source['status'])
+            add('fetch_seconds', "Time spent downloading the source.", labels,
+                source['fetch_seconds'])
+            add('response_bytes', "Size of the downloaded body.", labels, source['bytes'])
+            add('fetch_failed', "1 if the source failed and kept its previous outputs.",
+                labels, int(source['error'] is not None))
+            add('parse_seconds', "Time spent extracting networks.", labels,
+                source['parse_seconds'])
+            add('tokens_total', "Candidate tokens seen by the parser.", labels,
+                source['tokens'])
+            add('networks_total', "Networks accepted by the parser.", labels,
+                source['networks'])
+            for output_name, output in sorted(source['outputs'].items()):
+                output_labels = dict(labels, output=output_name)
+                add('output_entries', "Entries written to an output.", output_labels,
+                    output['entries'])
+                for fmt, seconds in sorted(output['write_seconds'].items()):
+                    add('write_seconds', "Time spent writing an output format.",
+                        dict(output_labels, format=fmt), seconds)
+
+        lines = []
+        for name, (help_text, samples) in metrics.items():
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            lines.extend(samples)
+        lines.append(f"# HELP {PREFIX}_run_duration_seconds Duration of the generator run.")
+        lines.append(f"# TYPE {PREFIX}_run_duration_seconds gauge")
+        lines.append(f"{PREFIX}_run_duration_seconds {report['duration_seconds']}")
+        lines.append(f"# HELP {PREFIX}_last_run_timestamp_seconds End of the generator run.")
+        lines.append(f"# TYPE {PREFIX}_last_run_timestamp_seconds gauge")
+        lines.append(f"{PREFIX}_last_run_timestamp_seconds {report['finished']}")
+        return lines
+
+    def write_prometheus(self, path):
+        """Write a node_exporter textfile collector file (atomically)."""
+        with atomic_open(path) as f:
+            f.write("\n".join(self.prometheus_lines()) + "\n")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics = NullMetrics()
+
+
+def get_metrics():
+    """Return the active metrics collector."""
+    return _metrics
+
+
+def activate(metrics):
+    """Make ``metrics`` the active collector; returns the previous one."""
+    global _metrics
+    previous, _metrics = _metrics, metrics
+    return previous
@@ -0,0 +1,175 @@
+"""Compact container for the networks of one address family.
+
+A :class:`NetworkSet` keeps every network as a fixed-width big-endian
+``(start, end)`` record in a single :class:`bytearray` instead of a list of
+:mod:`ipaddress` objects: 8 bytes per IPv4 network, 32 per IPv6 network.
+Sorting and deduplication then work on plain ``bytes`` records, which
+compare in C, and CIDR strings are only rendered when an output is written.
+"""
+import struct
+import sys
+from array import array
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+
+FAMILIES = {4: "inet", 6: "inet6"}
+VERSIONS = {"inet": 4, "inet6": 6}
+
+
+def range_to_cidrs(start, end, bits):
+    """Split the inclusive range ``start..end`` into ``(network, prefixlen)`` CIDRs."""
+    while start <= end:
+        size = start & -start if start else 1 << bits
+        while start + size - 1 > end:
+            size >>= 1
+        yield start, bits - size.bit_length() + 1
+        start += size
+
+
+def format_ipv4(address):
+    """Render an IPv4 address integer in dotted-quad notation."""
+    return '%d.%d.%d.%d' % (address >> 24, address >> 16 & 255, address >> 8 & 255,
+                            address & 255)
+
+
+def format_ipv6(address):
+    """Render an IPv6 address integer in compressed notation."""
+    return IPv6Address(address).compressed
+
+
+class NetworkSet:
+    """Sorted, deduplicated set of networks of one IP version.
+
+    Records are stored as ``start`` followed by the bitwise complement of
+    ``end``, so a plain byte-wise sort orders them by start address and, for
+    equal starts, larger networks first -- the same order as sorting
+    :mod:`ipaddress` network objects. Inserts are buffered and the records
+    are sorted and deduplicated once, on the first read that needs it.
+    """
+
+    __slots__ = ('version', '_size', '_mask', '_buf', '_normalized')
+
+    def __init__(self, version=4, networks=()):
+        if version not in FAMILIES:
+            raise ValueError(f"Unsupported IP version: {version}")
+        self.version = version
+        self._size = 4 if version == 4 else 16
+        self._mask = (1 << self.bits) - 1
+        self._buf = bytearray()
+        self._normalized = True
+        self.extend(networks)
+
+    @classmethod
+    def for_family(cls, family, networks=()):
+        """Create a set for an ipset family name ("inet" or "inet6")."""
+        return cls(VERSIONS[family], networks)
+
+    @property
+    def bits(self):
+        return self._size * 8
+
+    @property
+    def family(self):
+        return FAMILIES[self.version]
+
+    def add_range(self, start, end):
+        """Add the inclusive address range ``start..end``."""
+        if not 0 <= start <= end <= self._mask:
+            raise ValueError(f"Invalid IPv{self.version} range: {start}-{end}")
+        self._buf += start.to_bytes(self._size, 'big')
+        self._buf += (self._mask ^ end).to_bytes(self._size, 'big')
+        self._normalized = False
+
+    def add_prefix(self, network, prefixlen):
+        """Add the CIDR ``network/prefixlen`` given as integers."""
+        hostmask = self._mask >> prefixlen
+        if network & hostmask:
+            raise ValueError(f"Host bits set in IPv{self.version} network")
+        self.add_range(network, network | hostmask)
+
+    def append(self, network):
+        """Add an :mod:`ipaddress` network object (list-compatible)."""
+        if network.version != self.version:
+            raise ValueError(f"Expected IPv{self.version} network, got {network}")
+        self.add_prefix(int(network.network_address), network.prefixlen)
+
+    def extend(self, networks):
+        """Add an iterable of :mod:`ipaddress` network objects."""
+        for network in networks:
+            self.append(network)
+
+    def update(self, other):
+        """Add all networks of another set of the same version."""
+        if other.version != self.version:
+            raise ValueError("Cannot merge sets of different IP versions")
+        self._buf += other._buf
+        self._normalized = self._normalized and not other._buf
+
+    def _normalize(self):
+        if self._normalized:
+            return
+        if self.version == 4:
+            # Each 8-byte record is one big-endian 64-bit word, so it sorts as an int
+            words = array('Q')
+            words.frombytes(self._buf)
+            if sys.byteorder == 'little':
+                words.byteswap()
+            words = array('Q', sorted(set(words)))
+            if sys.byteorder == 'little':
+                words.byteswap()
+            self._buf = bytearray(words.tobytes())
+            self._normalized = True
+            return
+        width = self._size * 2
+        data = bytes(self._buf)
+        offsets = range(0, len(data), width)
+        records = set(map(data.__getitem__, map(slice, offsets, range(width, len(data) + width,
+                                                                      width))))
+        self._buf = bytearray(b''.join(sorted(records)))
+        self._normalized = True
+
+    def __len__(self):
+        self._normalize()
+        return len(self._buf) // (self._size * 2)
+
+    def __bool__(self):
+        return bool(self._buf)
+
+    def __eq__(self, other):
+        if not isinstance(other, NetworkSet):
+            return NotImplemented
+        self._normalize()
+        other._normalize()
+        return self.version == other.version and self._buf == other._buf
+
+    def __repr__(self):
+        return f"<NetworkSet IPv{self.version}: {len(self)} networks>"
+
+    def intervals(self):
+        """Yield ``(start, end)`` integer pairs in sorted order."""
+        self._normalize()
+        mask = self._mask
+        if self.version == 4:
+            for start, inverted_end in struct.iter_unpack('>II', self._buf):
+                yield start, mask ^ inverted_end
+        else:
+            for s_hi, s_lo, e_hi, e_lo in struct.iter_unpack('>QQQQ', self._buf):
+                yield s_hi << 64 | s_lo, mask ^ (e_hi << 64 | e_lo)
+
+    def prefixes(self):
+        """Yield ``(network, prefixlen)`` pairs, splitting non-CIDR ranges."""
+        bits = self.bits
+        for start, end in self.intervals():
+            yield from range_to_cidrs(start, end, bits)
+
+    def cidrs(self):
+        """Yield each network rendered as a CIDR string."""
+        fmt = format_ipv4 if self.version == 4 else format_ipv6
+        for network, prefixlen in self.prefixes():
+            yield f"{fmt(network)}/{prefixlen}"
+
+    def __iter__(self):
+        """Yield :mod:`ipaddress` network objects, created on demand."""
+        cls = IPv4Network if self.version == 4 else IPv6Network
+        address_cls = IPv4Address if self.version == 4 else IPv6Address
+        for network, prefixlen in self.prefixes():
+            yield cls((address_cls(network), prefixlen))
@@ -0,0 +1,44 @@
+"""nftables interval-set output.
+
+``<name>.nft`` is an ``nft -f`` script that (re)defines ``set <name>`` in
+``table inet trusted_lists``. It flushes the set and adds all elements in
+the same script, and nft applies a script as one transaction: rule sets
+see either the old or the new elements, never a partial set. Elements
+are the merged start-end intervals, written as a CIDR when the interval
+is one and as a range otherwise.
+"""
+from trusted_lists.files import atomic_open
+from trusted_lists.netset import format_ipv4, format_ipv6, range_to_cidrs
+
+TABLE = "inet trusted_lists"
+ELEMENTS_PER_LINE = 8
+
+
+def _elements(version, intervals):
+    bits, fmt = (32, format_ipv4) if version == 4 else (128, format_ipv6)
+    for start, end in intervals:
+        cidrs = range_to_cidrs(start, end, bits)
+        network, prefixlen = next(cidrs)
+        if next(cidrs, None) is None:
+            yield f"{fmt(network)}/{prefixlen}"
+        else:
+            yield f"{fmt(start)}-{fmt(end)}"
+
+
+def write_nft(path, set_name, version, intervals, description=None):
+    """Write an ``nft -f`` script replacing the elements of one interval set."""
+    set_type = "ipv4_addr" if version == 4 else "ipv6_addr"
+    with atomic_open(path) as f:
+        if description:
+            f.write(f"# {description}\n")
+        f.write(f"table {TABLE} {{\n}}\n")
+        f.write(f"add set {TABLE} {set_name} "
+                f"{{ type {set_type}; flags interval; auto-merge; }}\n")
+        f.write(f"flush set {TABLE} {set_name}\n")
+        f.write(f"add element {TABLE} {set_name} {{")
+        separator = "\n    "
+        for i, element in enumerate(_elements(version, intervals)):
+            if i:
+                separator = ",\n    " if i % ELEMENTS_PER_LINE == 0 else ", "
+            f.write(separator + element)
+        f.write("\n}\n")
@@ -0,0 +1,89 @@
+"""nginx configuration outputs.
+
+``<name>.geo.conf`` defines ``geo $trusted_<name>``, 1 for addresses in the
+list and 0 otherwise. IPv4 lists use ``ranges`` mode over the merged
+start-end intervals, so nginx binary-searches a flat sorted array instead
+of walking a radix tree of CIDRs. nginx only supports IPv4 ranges, so
+IPv6 lists are written as CIDRs.
+
+Lists with ``nginx_realip: true`` (CDNs such as Cloudflare) also get a
+``<name>.realip.conf`` of ``set_real_ip_from`` directives.
+
+``trusted-lists.geo.conf`` combines every built list: ``$trusted_lists_v4``
+and ``$trusted_lists_v6`` hold the comma-separated names of the lists
+containing the client address, or "" if there are none.
+"""
+import os
+import re
+
+from trusted_lists.binindex import COMBINED_NAME
+from trusted_lists.files import atomic_open
+from trusted_lists.index import TrustedIndex
+from trusted_lists.netset import format_ipv4, format_ipv6, range_to_cidrs
+
+_INVALID_VARIABLE_CHARS = re.compile(r'[^A-Za-z0-9_]')
+
+
+def variable_name(list_name):
+    """nginx variable (without ``$``) of a list, e.g. trusted_googlebot_v4."""
+    return "trusted_" + _INVALID_VARIABLE_CHARS.sub("_", list_name)
+
+
+def _ipv4_range_lines(segments):
+    for start, end, value in segments:
+        yield f"    {format_ipv4(start)}-{format_ipv4(end)} {value};\n"
+
+
+def _ipv6_cidr_lines(segments):
+    for start, end, value in segments:
+        for network, prefixlen in range_to_cidrs(start, end, 128):
+            yield f"    {format_ipv6(network)}/{prefixlen} {value};\n"
+
+
+def _write_geo_block(f, variable, version, segments, default):
+    f.write(f"geo ${variable} {{\n")
+    if version == 4:
+        f.write("    ranges;\n")
+    f.write(f"    default {default};\n")
+    lines = _ipv4_range_lines if version == 4 else _ipv6_cidr_lines
+    f.writelines(lines(segments))
+    f.write("}\n")
+
+
+def write_geo(path, list_name, version, intervals, description=None):
+    """Write the ``geo`` block of one list from sorted, merged intervals."""
+    with atomic_open(path) as f:
+        if description:
+            f.write(f"# {description}\n")
+        _write_geo_block(f, variable_name(list_name), version,
+                         ((start, end, 1) for start, end in intervals), 0)
+
+
+def write_realip(path, cidrs, description=None):
+    """Write ``set_real_ip_from`` directives for a CDN's networks."""
+    with atomic_open(path) as f:
+        if description:
+            f.write(f"# {description}\n")
+        for cidr in cidrs:
+            f.write(f"set_real_ip_from {cidr};\n")
+
+
+def _labelled_segments(family_index):
+    """Yield ``(start, end, "list1,list2")`` for segments covered by a list."""
+    starts, labels = family_index.starts, family_index.labels
+    last = (1 << (32 if family_index.version == 4 else 128)) - 1
+    for i, label in enumerate(labels):
+        if label:
+            end = starts[i + 1] - 1 if i + 1 < len(starts) else last
+            yield starts[i], end, f'"{label}"'
+
+
+def write_combined_geo(build_dir="build"):
+    """Write a geo map of every ``<build_dir>/*.txt`` list yielding list names."""
+    index = TrustedIndex.from_build_dir(build_dir)
+    path = os.path.join(build_dir, f"{COMBINED_NAME}.geo.conf")
+    with atomic_open(path) as f:
+        for version in (4, 6):
+            _write_geo_block(f, f"trusted_lists_v{version}", version,
+                             _labelled_segments(index.families[version]), '""')
+    return path
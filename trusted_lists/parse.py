@@ -0,0 +1,115 @@
+"""Fast IP network parser with the acceptance rules of :mod:`ipaddress`.
+
+Extractors feed this module every token they find, and on text-heavy pages
+most tokens are not addresses at all. Instead of trying ``IPv4Network`` and
+then ``IPv6Network`` and paying for two exceptions per junk token, the
+family is picked from the characters of the token, anything that cannot be
+an address is rejected without raising, and the common ``a.b.c.d[/len]``
+form is parsed directly into integers. Less common spellings (netmask
+prefixes, IPv6, scope ids) go through :mod:`ipaddress` itself, so the set of
+accepted strings -- including the rejection of host bits set -- is exactly
+the one of ``IPv4Network(s)`` / ``IPv6Network(s)``.
+"""
+from ipaddress import IPv4Network, IPv6Network, ip_network
+
+from trusted_lists.metrics import get_metrics
+
+_IPV4_CHARS = '0123456789./'
+_IPV6_CHARS = '0123456789abcdefABCDEF:./'
+
+
+def _parse_ipv4(token):
+    address, sep, prefix = token.partition('/')
+    octets = address.split('.')
+    if len(octets) != 4:
+        return None
+    value = 0
+    for octet in octets:
+        if not octet or len(octet) > 3 or (octet[0] == '0' and len(octet) > 1):
+            return None
+        octet = int(octet)
+        if octet > 255:
+            return None
+        value = value << 8 | octet
+    if not sep:
+        return 4, value, 32
+    if '.' in prefix:
+        # Netmask or hostmask notation
+        return _parse_fallback(IPv4Network, token)
+    if not prefix or '/' in prefix:
+        return None
+    prefixlen = int(prefix)
+    if prefixlen > 32 or value & (0xffffffff >> prefixlen):
+        return None
+    return 4, value, prefixlen
+
+
+def _parse_fallback(cls, token):
+    try:
+        network = cls(token)
+    except ValueError:
+        return None
+    return network.version, int(network.network_address), network.prefixlen
+
+
+def parse_network(token):
+    """Parse one token into ``(version, network, prefixlen)`` or return None.
+
+    Surrounding whitespace is ignored, like in ``try_add_ip_or_range``.
+    """
+    if not token:
+        return None
+    token = token.strip()
+    if not token:
+        return None
+    if ':' in token:
+        # str.strip() with a character set leaves something behind
+        # as soon as one character is outside of that set
+        if '%' not in token and token.strip(_IPV6_CHARS):
+            return None
+        return _parse_fallback(IPv6Network, token)
+    if token.strip(_IPV4_CHARS):
+        return None
+    return _parse_ipv4(token)
+
+
+def parse_networks(tokens):
+    """Parse an iterable of tokens, yielding only the valid networks."""
+    for token in tokens:
+        parsed = parse_network(token)
+        if parsed is not None:
+            yield parsed
+
+
+def _adder(container):
+    """Return a ``(network, prefixlen)`` callable adding to a container."""
+    add_prefix = getattr(container, 'add_prefix', None)
+    if add_prefix is not None:
+        return add_prefix
+    return lambda network, prefixlen: container.append(ip_network((network, prefixlen)))
+
+
+def _counted(tokens, seen):
+    for token in tokens:
+        seen[0] += 1
+        yield token
+
+
+def add_networks(tokens, ipv4_networks, ipv6_networks):
+    """Parse tokens and add the networks to the container of their family.
+
+    Containers are NetworkSet instances or plain lists, which receive
+    ipaddress network objects. Returns the number of networks added.
+    """
+    adders = {4: _adder(ipv4_networks), 6: _adder(ipv6_networks)}
+    metrics = get_metrics()
+    seen = [0]
+    if metrics.enabled:
+        tokens = _counted(tokens, seen)
+    count = 0
+    for version, network, prefixlen in parse_networks(tokens):
+        adders[version](network, prefixlen)
+        count += 1
+    if metrics.enabled:
+        metrics.count_parse(seen[0], count)
+    return count
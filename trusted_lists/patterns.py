@@ -0,0 +1,48 @@
+"""Regex extraction: compiled-pattern cache, named patterns, streamed matches.
+
+The ``regex`` of a list is either a pattern of its own or one of the
+built-in NAMED_PATTERNS.  Patterns are compiled once per run and matches
+are yielded one by one (``finditer``) instead of being collected first.
+
+Custom patterns keep ``re.findall`` semantics: without groups the whole
+match is used, with one group that group.  With several groups, each
+group that took part in the match is a token of its own (``findall``
+would return tuples, which are not addresses).
+"""
+import re
+from functools import lru_cache
+
+# Anchored on the left so a scan never restarts inside a number or an
+# address, and bounded so a failed match backtracks a few steps at most.
+# An IPv4 address glued to a preceding word ("abc5.45.192.0/18") is still
+# found. IPv6 candidates need two colons, so "and:5.45.192.0/18" is left
+# to the IPv4 branch instead of becoming the token "d:5.45.192.0/18".
+# The parser decides on the final family and drops hex words such as
+# "dead:beef/12".
+_IPV4_CIDR = r'(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}/\d{1,2}(?!\d)'
+_IPV6_CIDR = (r'(?<![0-9A-Fa-f:.])(?=[0-9A-Fa-f.]{0,44}:[0-9A-Fa-f.]{0,44}:)'
+              r'[0-9A-Fa-f:.]{2,45}/\d{1,3}(?!\d)')
+_ANY_CIDR = f'{_IPV4_CIDR}|{_IPV6_CIDR}'
+
+NAMED_PATTERNS = {
+    'ipv4-cidr': _IPV4_CIDR,
+    'ipv6-cidr': _IPV6_CIDR,
+    'any-cidr': _ANY_CIDR,
+}
+
+
+@lru_cache(maxsize=None)
+def compile_pattern(pattern):
+    """Compile a trusted.yml ``regex`` (or the name of a built-in one) once."""
+    return re.compile(NAMED_PATTERNS.get(pattern, pattern))
+
+
+def iter_matches(text, pattern):
+    """Yield the tokens matched in ``text``, without building a list first."""
+    compiled = compile_pattern(pattern)
+    groups = compiled.groups
+    if groups == 0:
+        return (match.group() for match in compiled.finditer(text))
+    if groups == 1:
+        return (match.group(1) or '' for match in compiled.finditer(text))
+    return (group for match in compiled.finditer(text) for group in match.groups() if group)
@@ -0,0 +1,82 @@
+"""Per-list refresh scheduling for ``generate.py daemon``.
+
+Every list is rebuilt on its own ``refresh`` interval from trusted.yml
+(seconds, or a number with an ``s``/``m``/``h``/``d`` suffix such as
+``15m``), spread by a random jitter so lists sharing an interval do not
+all hit their upstreams at the same moment. A list that failed is tried
+again after ``RETRY_INTERVAL`` if that is sooner.
+
+Whether a rebuild changed anything is decided from the digests of the
+``build/<name>.txt`` outputs before and after it.
+"""
+import glob
+import os
+import random
+import re
+
+from trusted_lists.specs import file_digest
+
+DEFAULT_REFRESH = 6 * 3600
+DEFAULT_JITTER = 0.1
+RETRY_INTERVAL = 300
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_INTERVAL = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$')
+
+
+def parse_interval(value):
+    """Return seconds for ``3600``, ``"90s"``, ``"15m"``, ``"6h"`` or ``"1d"``."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = float(value)
+    else:
+        match = _INTERVAL.match(str(value))
+        if not match:
+            raise ValueError(f"Invalid refresh interval: {value!r}")
+        seconds = float(match.group(1)) * _UNITS[match.group(2) or 's']
+    if seconds <= 0:
+        raise ValueError(f"Refresh interval must be positive, got {value!r}")
+    return seconds
+
+
+class Scheduler:
+    """Tracks when each list is due for its next rebuild."""
+
+    def __init__(self, trusted_lists, default_refresh=DEFAULT_REFRESH, jitter=DEFAULT_JITTER,
+                 rng=None):
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.intervals = {
+            list_name: parse_interval(list_config.get('refresh', default_refresh))
+            for list_name, list_config in trusted_lists.items()
+        }
+        # Everything is built once on start
+        self.next_run = dict.fromkeys(self.intervals, 0.0)
+
+    def due(self, now):
+        """Names of the lists whose rebuild is due at ``now``, in config order."""
+        return [name for name, when in self.next_run.items() if when <= now]
+
+    def next_due(self):
+        """Time of the earliest scheduled rebuild."""
+        return min(self.next_run.values())
+
+    def schedule(self, list_name, now, failed=False):
+        """Schedule the next rebuild of a list that was just built at ``now``."""
+        interval = self.intervals[list_name]
+        if failed:
+            interval = min(interval, RETRY_INTERVAL)
+        spread = 1 + self.rng.uniform(-self.jitter, self.jitter)
+        self.next_run[list_name] = now + interval * spread
+
+
+def output_digests(build_dir="build"):
+    """Map every ``<build_dir>/<output>.txt`` to the digest of its content."""
+    return {
+        os.path.basename(path)[:-len(".txt")]: file_digest(path)
+        for path in glob.glob(os.path.join(build_dir, "*.txt"))
+    }
+
+
+def changed_outputs(before, after):
+    """Output names added, removed or rewritten with a different content."""
+    return sorted(name for name in before.keys() | after.keys()
+                  if before.get(name) != after.get(name))
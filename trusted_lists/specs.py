@@ -0,0 +1,97 @@
+"""RPM spec rendering for the per-list firewalld-ipset packages.
+
+``render_specs`` renders ``src/ipset.spec.j2`` for every ``<build_dir>/<name>.yml``
+in one process, compiling the template once. A package needs a rebuild,
+and its spec is rendered with the new version, when its XML content differs
+from the copy published next to the spec, or when its spec would change
+other than by version (an edited template or list metadata). The XML and
+delta files of rebuilt packages are copied next to their specs.
+"""
+import glob
+import hashlib
+import os
+import re
+import shutil
+import time
+
+from trusted_lists.files import atomic_open
+
+DEFAULT_TEMPLATE = os.path.join("src", "ipset.spec.j2")
+PACKAGE_PREFIX = "firewalld-ipset-"
+SOURCE_EXTENSIONS = ("xml", "added", "removed")
+
+_VERSION_LINE = re.compile(r'^Version:\s*(\S+)\s*$', re.MULTILINE)
+
+
+def default_version():
+    """Package version of a build made now, e.g. 20250131 (UTC)."""
+    return time.strftime("%Y%m%d", time.gmtime())
+
+
+def file_digest(path):
+    """Return the sha256 hex digest of a file, or None if it does not exist."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def spec_version(spec):
+    """Return the ``Version:`` of rendered spec text, or None."""
+    match = _VERSION_LINE.search(spec)
+    return match.group(1) if match else None
+
+
+def load_template(path=DEFAULT_TEMPLATE):
+    """Compile the spec template once for rendering every list."""
+    import jinja2
+
+    directory, name = os.path.split(os.path.abspath(path))
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(directory),
+                             keep_trailing_newline=True)
+    return env.get_template(name)
+
+
+def _read_spec(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def render_specs(build_dir="build", output_dir=".", version=None, template_path=DEFAULT_TEMPLATE):
+    """Render the specs of lists whose package changed.
+
+    Returns the names of the packages that need a rebuild, sorted.
+    """
+    import yaml
+
+    if version is None:
+        version = default_version()
+    template = load_template(template_path)
+    rebuild = []
+    for yml_path in sorted(glob.glob(os.path.join(build_dir, "*.yml"))):
+        name = os.path.basename(yml_path)[:-len(".yml")]
+        xml_path = os.path.join(build_dir, f"{name}.xml")
+        if not os.path.exists(xml_path):
+            continue
+        with open(yml_path) as f:
+            data = yaml.safe_load(f) or {}
+        package = PACKAGE_PREFIX + name
+        spec_path = os.path.join(output_dir, f"{package}.spec")
+        current = _read_spec(spec_path)
+        xml_changed = file_digest(xml_path) != file_digest(os.path.join(output_dir, f"{name}.xml"))
+        if (current is not None and not xml_changed
+                and template.render(data, version=spec_version(current)) == current):
+            continue
+
+        with atomic_open(spec_path) as f:
+            f.write(template.render(data, version=version))
+        for extension in SOURCE_EXTENSIONS:
+            source = os.path.join(build_dir, f"{name}.{extension}")
+            if os.path.exists(source):
+                shutil.copyfile(source, os.path.join(output_dir, f"{name}.{extension}"))
+        rebuild.append(package)
+    return rebuild